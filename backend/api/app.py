@@ -1,48 +1,178 @@
-import asyncio, logging, json, uuid, re
+import asyncio, hmac, logging, os, time, uuid
 from datetime import datetime
 from typing import Dict, Any, List
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager, AsyncExitStack
 
 from ..config.settings import settings
-from ..db.database import SessionLocal, engine
-from ..db.models import Base, Thread, Message, Lead
-from ..services.ghl import forward_lead_webhook, upsert_contact_rest
-from ..services.redis_cache import cache_get, cache_setex
+from ..db.database import engine, get_db, replica_engine, SessionLocal
+from ..db.read_routing import mark_written, read_session, replica_health
+from ..db.models import Base
+from ..db.repository import Turn, persist_turn, history_page
+from ..db.retention import ensure_partitions
+from ..db.write_behind import TurnWriter
+from ..services.ghl import init_http_client, close_http_client
+from ..services.lead_queue import lead_queue
+from ..services.lead_state import merge_thread_lead, save_thread_lead
+from ..services import response_cache
+from ..services.embeddings import EmbeddingPipeline, get_embedder
+from ..services.redis_cache import cache_get, cache_setex, init_redis, close_redis, breaker
+from ..services.thread_cache import load_window, record_turn
+from ..services.thread_locks import ThreadBusy, thread_lock
+from ..services.thread_versions import (
+    ThreadVersion, get_version, invalidate_version, record_version,
+)
+from ..services.rate_limit import admission, check_batch_rate_limit, check_rate_limits
+from ..services.idempotency import (
+    COALESCED, IdempotencyConflict, get_completed, request_hash, run_turn, scoped_key,
+    store_completed,
+)
 from ..core.build_graph import create_brax_chat_graph
+from ..core.checkpointer import open_checkpointer
 from ..core.state import AgentState
+from ..core import codec
+from ..core.lead_parser import LeadStreamParser, has_contact, normalize_lead
+from ..core.replay import ReplayStats, replay
+from ..core.prompts import prompt_registry
+from ..core.tracing import (
+    TraceMiddleware, configure_logging, current_trace_id, span, DB_POOL_CHECKED_OUT, DB_POOL_SIZE,
+    CACHE_EVENTS, STARTUP_SECONDS,
+)
 from langchain_core.messages import HumanMessage, AIMessage
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+from .drain import Draining, drain
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+configure_logging(settings.log_format, span_logs=settings.span_logs)
 log = logging.getLogger("brax_api")
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
 # Initialize the conversation graph
 chat_graph = None
+batch_graph = None
+checkpointer = None
+turn_writer: TurnWriter | None = None
+embedding_pipeline: EmbeddingPipeline | None = None
+# Streamed turns still running (kept so they are not collected if their client disconnects)
+_stream_turns: set[asyncio.Task] = set()
+
+# History bodies are flushed to the client in chunks of about this size
+HISTORY_CHUNK_BYTES = 16384
+
+# Set by backend.api.serve for multi-worker runs; each worker writes its own metric files
+PROMETHEUS_MULTIPROC = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+def graph_config(thread_id: str) -> Dict[str, Any]:
+    """Per-invocation config; with a checkpointer, selects the thread's saved state."""
+    return {"configurable": {"thread_id": thread_id}}
+
+WARMUP_THREAD_ID = "warmup"
+
+async def warmup_graph():
+    """Run one throwaway turn so the first real request does not pay for lazy imports and caches.
+
+    Every worker uses the same thread id and deletes its checkpoints afterwards, so
+    restarts leave nothing behind in the checkpointer.
+    """
+    state: AgentState = {
+        "messages": [HumanMessage(content="What can you help me with?")],
+        "user_id": "warmup",
+        "thread_id": WARMUP_THREAD_ID,
+    }
+    try:
+        await chat_graph.ainvoke(state, graph_config(WARMUP_THREAD_ID))
+    finally:
+        if checkpointer:
+            await checkpointer.adelete_thread(WARMUP_THREAD_ID)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global chat_graph
+    global chat_graph, batch_graph, checkpointer, turn_writer, embedding_pipeline
+    started = time.perf_counter()
+    # Schema is owned by `python -m backend.db.migrate`; DB_AUTO_CREATE is for local SQLite runs
+    if settings.db_auto_create:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    if engine.dialect.name == "postgresql":
+        # Months ahead of `now` exist even if the retention job has stopped running
+        try:
+            await ensure_partitions(settings.partition_months_ahead)
+        except Exception as e:
+            log.warning(f"Creating message partitions failed: {str(e)}")
     log.info("Initializing Brax Chat Graph...")
-    chat_graph = create_brax_chat_graph()
+    resources = AsyncExitStack()
+    checkpointer = await resources.enter_async_context(open_checkpointer())
+    with span("startup.graph"):
+        chat_graph = create_brax_chat_graph(checkpointer)
+        # Replays carry their own history and must not touch live threads' checkpoints
+        batch_graph = create_brax_chat_graph() if checkpointer else chat_graph
     log.info("Chat graph initialized successfully")
+    init_redis()
+    init_http_client()
+    if replica_engine is not None:
+        # An unreachable replica must not hold up startup: reads go to the primary until it answers
+        await replica_health.check_in_time()
+        replica_health.start()
+    lead_queue.start()
+    prompt_registry.start_watching(settings.prompt_reload_interval)
+    if settings.embedding_pipeline_enabled and get_embedder():
+        embedding_pipeline = EmbeddingPipeline(
+            get_embedder(),
+            batch_size=settings.embedding_batch_size,
+            interval=settings.embedding_poll_interval,
+        )
+        embedding_pipeline.start()
+    if settings.db_write_behind:
+        turn_writer = TurnWriter(
+            SessionLocal,
+            max_batch=settings.db_write_batch_size,
+            max_delay=settings.db_write_max_delay_ms / 1000,
+        )
+        turn_writer.start()
+    if settings.graph_warmup:
+        try:
+            with span("startup.warmup"):
+                await warmup_graph()
+        except Exception as e:
+            log.warning(f"Graph warmup failed: {str(e)}")
+    STARTUP_SECONDS.set(time.perf_counter() - started)
+    log.info(f"Worker {os.getpid()} ready in {(time.perf_counter() - started) * 1000:.0f} ms")
     yield
     log.info("Shutting down...")
+    # Let in-flight turns finish (and enqueue their leads) before stopping what they depend on
+    await drain.wait(settings.shutdown_drain_timeout)
+    if turn_writer:
+        await turn_writer.stop()
+        turn_writer = None
+    if embedding_pipeline:
+        await embedding_pipeline.stop()
+        embedding_pipeline = None
+    await prompt_registry.stop_watching()
+    await lead_queue.stop()
+    await close_http_client()
+    await replica_health.stop()
+    await close_redis()
+    await resources.aclose()
+    checkpointer = None
+    await engine.dispose()
+    if PROMETHEUS_MULTIPROC:
+        multiprocess.mark_process_dead(os.getpid())
 
 app = FastAPI(
     title="Brax AI Concierge API",
     description="HTTP chatbot API for Brax Fine Jewelers",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Per-request trace_id and latency histogram
+app.add_middleware(TraceMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -52,19 +182,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Pydantic models
 class ChatMessage(BaseModel):
     message: str = Field(..., min_length=1, max_length=2000)
     thread_id: str | None = None
     user_id: str | None = None
+    idempotency_key: str | None = Field(None, max_length=128)
 
 class ChatResponse(BaseModel):
     response: str
@@ -76,164 +199,490 @@ class ChatResponse(BaseModel):
 class ThreadHistory(BaseModel):
     thread_id: str
     messages: List[Dict[str, Any]]
+    has_more: bool = False
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "service": "brax-chat-api"}
+    """Health check endpoint (503 while the worker drains for shutdown)."""
+    if drain.draining:
+        return ORJSONResponse(status_code=503, content={"status": "draining", "service": "brax-chat-api"})
+    return {
+        "status": "healthy",
+        "service": "brax-chat-api",
+        "redis": "disabled" if not settings.redis_url else ("degraded" if breaker.is_open else "ok"),
+        "replica": "disabled" if replica_engine is None else ("ok" if replica_health.healthy else "degraded"),
+        "response_cache": response_cache.stats(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency, request latency, cache outcomes, DB pool usage."""
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_SIZE.set(pool.checkedin() + pool.checkedout())
+    if PROMETHEUS_MULTIPROC:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(message: ChatMessage, db: Session = Depends(get_db)):
-    """Main chat endpoint."""
+async def chat_endpoint(
+    message: ChatMessage,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=128),
+):
+    """Main chat endpoint.
+
+    Turns on the same thread are serialized; a retry carrying the same idempotency key
+    (body field or Idempotency-Key header) gets the original ChatResponse back, and the
+    key reused with a different body gets 422. Over the rate limit: 429; no concurrency
+    slot within the admission timeout: 503.
+    """
+    key, digest = idempotency_scope(message, idempotency_key)
+
+    async def run() -> ChatResponse:
+        async with drain.track(), admission.slot():
+            state, window, cached = await prepare_turn(message, db)
+            
+            with span("graph.invoke"):
+                result = await chat_graph.ainvoke(state, graph_config(state["thread_id"]))
+            
+            # Get the AI response
+            ai_response = result["messages"][-1].content
+            return await finalize_turn(db, message, state, window, cached, ai_response)
+
     try:
-        # Generate thread ID if not provided
-        thread_id = message.thread_id or str(uuid.uuid4())
-        user_id = message.user_id or "anonymous"
-        
-        # Ensure thread exists
-        thread = db.query(Thread).filter(Thread.id == thread_id).first()
-        if not thread:
-            thread = Thread(id=thread_id, user_id=user_id)
-            db.add(thread)
-            db.commit()
-        
-        # Save user message
-        user_msg = Message(
-            thread_id=thread_id,
-            role="user",
-            content=message.message
-        )
-        db.add(user_msg)
-        db.commit()
-        
-        # Get conversation history
-        messages = db.query(Message).filter(Message.thread_id == thread_id).order_by(Message.created_at).all()
-        
-        # Convert to LangChain format
-        lc_messages = []
-        for msg in messages:
-            if msg.role == "user":
-                lc_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant":
-                lc_messages.append(AIMessage(content=msg.content))
-        
-        # Process through the graph
-        state = AgentState(
-            messages=lc_messages,
-            user_id=user_id,
-            thread_id=thread_id
-        )
-        
-        result = await chat_graph.ainvoke(state)
-        
-        # Get the AI response
-        ai_response = result["messages"][-1].content
-        
-        # Save AI response
-        ai_msg = Message(
-            thread_id=thread_id,
-            role="assistant", 
-            content=ai_response
-        )
-        db.add(ai_msg)
-        db.commit()
-        
-        # Check for lead data and process
-        lead_captured = await process_lead_capture(ai_response, thread_id, db)
-        
-        return ChatResponse(
-            response=ai_response,
-            thread_id=thread_id,
-            message_id=ai_msg.id,
-            timestamp=ai_msg.created_at,
-            lead_captured=lead_captured
-        )
+        # Replaying a finished turn is not charged, so a client's retry never gets 429
+        completed = key and await get_completed(key, digest, ChatResponse)
+        if completed:
+            COALESCED.labels("completed").inc()
+            return completed
+        await check_rate_limits(client_ip(request), message.user_id)
+        return await run_turn(key, digest, turn_lock_name(message, key), ChatResponse, run)
         
+    except IdempotencyConflict:
+        raise idempotency_conflict()
+    except ThreadBusy:
+        raise HTTPException(status_code=409, detail="Another message on this thread is still being processed")
+    except Draining:
+        raise HTTPException(status_code=503, detail="Server is restarting", headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Chat endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.get("/thread/{thread_id}/history", response_model=ThreadHistory)
-async def get_thread_history(thread_id: str, db: Session = Depends(get_db)):
-    """Get conversation history for a thread."""
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    message: ChatMessage,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(None, max_length=128),
+):
+    """Chat endpoint streaming the reply as Server-Sent Events.
+
+    Emits `token` events ({"delta": ...}) as the agent generates, then a single `done`
+    event carrying the ChatResponse once the turn is persisted (or `error`). The turn runs
+    to completion and holds the thread lock until it is persisted, even if the client
+    disconnects; a completed idempotent retry is replayed.
+    """
+    key, digest = idempotency_scope(message, idempotency_key)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    lock = AsyncExitStack()
     try:
-        messages = db.query(Message).filter(Message.thread_id == thread_id).order_by(Message.created_at).all()
-        
-        return ThreadHistory(
-            thread_id=thread_id,
-            messages=[
-                {
-                    "id": msg.id,
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.created_at.isoformat()
-                }
-                for msg in messages
-            ]
-        )
-        
+        completed = key and await get_completed(key, digest, ChatResponse)
+        if not completed:
+            await check_rate_limits(client_ip(request), message.user_id)
+            await lock.enter_async_context(drain.track())
+            await lock.enter_async_context(thread_lock(turn_lock_name(message, key)))
+            await lock.enter_async_context(admission.slot())
+            completed = key and await get_completed(key, digest, ChatResponse)
+        if completed:
+            await lock.aclose()
+            COALESCED.labels("completed").inc()
+            return StreamingResponse(replay_chat(completed), media_type="text/event-stream", headers=headers)
+        state, window, cached = await prepare_turn(message, db)
+    except IdempotencyConflict:
+        await lock.aclose()
+        raise idempotency_conflict()
+    except ThreadBusy:
+        await lock.aclose()
+        raise HTTPException(status_code=409, detail="Another message on this thread is still being processed")
+    except Draining:
+        raise HTTPException(status_code=503, detail="Server is restarting", headers={"Retry-After": "1"})
+    except HTTPException:
+        await lock.aclose()
+        raise
     except Exception as e:
-        log.error(f"History endpoint error: {str(e)}")
+        await lock.aclose()
+        log.error(f"Chat stream endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
+    # The turn runs in its own task so a client that goes away mid-stream does not cancel it
+    events: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(
+        run_stream_turn(message, state, window, cached, lock, key, digest, events)
+    )
+    _stream_turns.add(task)
+    task.add_done_callback(_stream_turns.discard)
+    return StreamingResponse(stream_events(events), media_type="text/event-stream", headers=headers)
 
-async def process_lead_capture(response: str, thread_id: str, db: Session) -> bool:
-    """Extract and process lead data from agent response."""
+@app.post("/chat/batch")
+async def chat_batch_endpoint(
+    request: Request,
+    concurrency: int = Query(8, ge=1),
+    authorization: str | None = Header(None),
+):
+    """Replay a JSONL body of threads through the graph (see backend.core.replay).
+
+    Streams one JSON result per thread as it finishes, then a final {"summary": ...} line
+    with throughput. Nothing is persisted and no leads are forwarded. Needs the
+    BATCH_API_KEY bearer token; each turn in flight takes an admission slot.
+    """
+    if drain.draining:
+        raise HTTPException(status_code=503, detail="Server is restarting", headers={"Retry-After": "1"})
+    check_batch_key(authorization)
+    body = await read_body(request, settings.batch_max_bytes)
     try:
-        # Extract lead JSON from response
-        pattern = r"```lead\s*\n(.*?)\n```"
-        match = re.search(pattern, response, re.DOTALL)
-        
-        if not match:
-            return False
-        
-        lead_json = match.group(1).strip()
-        lead_data = json.loads(lead_json)
-        
-        # Save to database
-        lead = Lead(
-            thread_id=thread_id,
-            name=lead_data.get("name"),
-            email=lead_data.get("email"), 
-            phone=lead_data.get("phone"),
-            intent=lead_data.get("intent"),
-            notes=lead_data.get("notes"),
-            raw=json.dumps(lead_data)
+        lines = body.decode("utf-8").splitlines()
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8: {str(e)}")
+    if len(lines) > settings.batch_max_threads:
+        raise HTTPException(status_code=413, detail=f"At most {settings.batch_max_threads} threads per batch")
+    await check_batch_rate_limit(client_ip(request), sum(1 for line in lines if line.strip()))
+    concurrency = min(concurrency, settings.batch_max_concurrency)
+    return StreamingResponse(stream_batch(lines, concurrency), media_type="application/x-ndjson")
+
+def check_batch_key(authorization: str | None):
+    if not settings.batch_api_key:
+        raise HTTPException(status_code=403, detail="Batch replay is disabled")
+    expected = f"Bearer {settings.batch_api_key}".encode()
+    if not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(
+            status_code=401, detail="Invalid batch API key", headers={"WWW-Authenticate": "Bearer"}
         )
-        db.add(lead)
-        db.commit()
-        
-        # Forward to GHL
-        asyncio.create_task(forward_to_ghl(lead_data, thread_id))
-        
-        return True
-        
+
+async def read_body(request: Request, limit: int) -> bytes:
+    """The request body, or 413 as soon as it exceeds `limit` bytes."""
+    too_large = HTTPException(status_code=413, detail=f"Body larger than {limit} bytes")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+async def stream_batch(lines: List[str], concurrency: int):
+    stats = ReplayStats()
+    try:
+        async with drain.track():
+            async for result in replay(batch_graph, lines, concurrency, stats, admission.slot):
+                yield codec.dumpb(result) + b"\n"
     except Exception as e:
-        log.error(f"Lead capture error: {str(e)}")
-        return False
+        log.error(f"Batch replay error: {str(e)}")
+        yield codec.dumpb({"error": "Internal server error"}) + b"\n"
+    yield codec.dumpb({"summary": stats.summary()}) + b"\n"
+
+def client_ip(request: Request) -> str | None:
+    """Peer address (uvicorn applies X-Forwarded-For from FORWARDED_ALLOW_IPS proxies)."""
+    return request.client.host if request.client else None
+
+def idempotency_scope(message: ChatMessage, header_key: str | None) -> tuple[str | None, str]:
+    """(scoped idempotency key or None, hash of the request the key must keep answering)."""
+    key = message.idempotency_key or header_key
+    digest = request_hash(message.model_dump(exclude={"idempotency_key"}))
+    return (scoped_key(key, message.user_id, message.thread_id) if key else None), digest
+
+def idempotency_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=422, detail="Idempotency key was already used for a different request"
+    )
+
+def turn_lock_name(message: ChatMessage, key: str | None) -> str:
+    """Serialize on the thread; a first message (no thread yet) serializes on its idempotency key."""
+    return message.thread_id or f"idem:{key or uuid.uuid4()}"
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {codec.dumps(data)}\n\n"
 
-async def forward_to_ghl(lead_data: Dict[str, Any], thread_id: str):
-    """Forward lead to GoHighLevel."""
+async def replay_chat(response: ChatResponse):
+    """SSE body for a turn that already completed."""
+    yield sse_event("token", {"delta": response.response})
+    yield sse_event("done", response.model_dump(mode="json"))
+
+async def stream_events(events: asyncio.Queue):
+    """SSE body fed by run_stream_turn; ends after its `done` or `error` event."""
+    while (event := await events.get()) is not None:
+        yield event
+
+async def run_stream_turn(
+    message: ChatMessage,
+    state: AgentState,
+    window: List[Dict[str, str]],
+    cached: bool,
+    lock: AsyncExitStack,
+    key: str | None,
+    digest: str,
+    events: asyncio.Queue,
+):
+    """Run the graph with token streaming, then persist and report the finished turn.
+
+    Events go to `events` whether or not anyone still reads them: the graph is always
+    consumed to the end and the turn persisted before the lock is released.
+    """
     try:
-        # Add metadata
-        enhanced_lead = {
-            **lead_data,
-            "source": "Brax AI Concierge",
-            "thread_id": thread_id,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        final_state = None
+        lead_parser, streamed = LeadStreamParser(), 0
+        with span("graph.stream"):
+            async for mode, chunk in chat_graph.astream(
+                state, graph_config(state["thread_id"]), stream_mode=["custom", "values"]
+            ):
+                if mode == "custom" and "token" in chunk:
+                    lead_parser.feed(chunk["token"])
+                    streamed += len(chunk["token"])
+                    events.put_nowait(sse_event("token", {"delta": chunk["token"]}))
+                elif mode == "values":
+                    final_state = chunk
         
-        # Try webhook first
-        webhook_result = await forward_lead_webhook(enhanced_lead)
-        log.info(f"Webhook result: {webhook_result}")
+        ai_response = final_state["messages"][-1].content
+        async with SessionLocal() as db:
+            # Reuse the streamed parse unless the final message differs from the tokens sent
+            response = await finalize_turn(
+                db, message, state, window, cached, ai_response,
+                lead_parser if streamed == len(ai_response) else None,
+            )
+        if key:
+            await store_completed(key, digest, response)
+        events.put_nowait(sse_event("done", response.model_dump(mode="json")))
         
-        # Try REST API if configured
-        if settings.ghl_api_key:
-            rest_result = await upsert_contact_rest(enhanced_lead)
-            log.info(f"REST result: {rest_result}")
-            
     except Exception as e:
-        log.error(f"GHL forwarding error: {str(e)}")
+        log.error(f"Chat stream error: {str(e)}")
+        events.put_nowait(sse_event("error", {"detail": "Internal server error"}))
+    finally:
+        events.put_nowait(None)
+        await lock.aclose()
+
+async def prepare_turn(message: ChatMessage, db: AsyncSession) -> tuple[AgentState, List[Dict[str, str]], bool]:
+    """Build the graph input for a turn from the thread's recent history window.
+
+    With a checkpointer the graph already holds the thread's messages, so the input is just
+    the new message; threads that predate checkpointing are seeded once from the window.
+    """
+    # Generate thread ID if not provided
+    thread_id = message.thread_id or str(uuid.uuid4())
+    user_id = message.user_id or "anonymous"
+    
+    # Get the recent history window (a freshly generated thread has none)
+    window, cached = [], False
+    checkpointed = False
+    if checkpointer and message.thread_id:
+        with span("checkpoint.load"):
+            checkpointed = await checkpointer.aget_tuple(graph_config(thread_id)) is not None
+        # record_turn then only appends to a Redis window that is already there
+        cached = checkpointed
+    if message.thread_id and not checkpointed:
+        with span("history.load") as attrs:
+            window, cached = await load_window(thread_id)
+            attrs.update(messages=len(window), cached=cached)
+    # Release the connection while the graph runs
+    await db.close()
+    
+    # Convert to LangChain format
+    with span("history.to_langchain"):
+        lc_messages = []
+        for msg in window:
+            if msg["role"] == "user":
+                lc_messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                lc_messages.append(AIMessage(content=msg["content"]))
+        lc_messages.append(HumanMessage(content=message.message))
+    
+    state = AgentState(
+        messages=lc_messages,
+        user_id=user_id,
+        thread_id=thread_id,
+        trace_id=current_trace_id() or ""
+    )
+    return state, window, cached
+
+async def finalize_turn(
+    db: AsyncSession,
+    message: ChatMessage,
+    state: AgentState,
+    window: List[Dict[str, str]],
+    cached: bool,
+    ai_response: str,
+    lead_parser: LeadStreamParser | None = None,
+) -> ChatResponse:
+    """Persist a finished turn, update the history cache and forward any lead.
+
+    `lead_parser` has already seen a streamed response; otherwise the response is parsed
+    here. A lead is persisted only when it changes the thread's merged lead.
+    """
+    thread_id = state["thread_id"]
+    with span("lead.parse"):
+        if lead_parser is None:
+            lead_parser = LeadStreamParser()
+            lead_parser.feed(ai_response)
+        lead_data = await merge_thread_lead(thread_id, normalize_lead(lead_parser.lead))
+    
+    # Persist thread, both messages and any lead in one transaction
+    turn = Turn(
+        thread_id=thread_id,
+        user_id=state["user_id"],
+        user_content=message.message,
+        ai_content=ai_response,
+        lead_data=lead_data,
+    )
+    # Until the new version is recorded, revalidations must not be confirmed from Redis
+    await invalidate_version(thread_id)
+    with span("db.persist_turn", write_behind=bool(turn_writer)):
+        if turn_writer:
+            message_id, created_at = await turn_writer.submit(turn)
+        else:
+            message_id, created_at = await persist_turn(db, turn)
+    await mark_written(thread_id)
+    await record_version(thread_id, message_id, created_at)
+    await record_turn(
+        thread_id,
+        window,
+        cached,
+        [
+            {"role": "user", "content": message.message},
+            {"role": "assistant", "content": ai_response},
+        ],
+    )
+    
+    # Forward committed leads
+    with span("lead.enqueue"):
+        if lead_data:
+            await save_thread_lead(thread_id, lead_data)
+        lead_captured = await process_lead_capture(lead_data, thread_id)
+    
+    return ChatResponse(
+        response=ai_response,
+        thread_id=thread_id,
+        message_id=message_id,
+        timestamp=created_at,
+        lead_captured=lead_captured
+    )
+
+@app.get("/thread/{thread_id}/history", response_model=ThreadHistory)
+async def get_thread_history(
+    thread_id: str,
+    before: int | None = Query(None, description="Return messages older than this message id"),
+    after: int | None = Query(None, description="Return messages newer than this message id"),
+    limit: int = Query(100, ge=1, le=500),
+    if_none_match: str | None = Header(None),
+    if_modified_since: str | None = Header(None),
+):
+    """Get a page of conversation history for a thread.
+
+    Defaults to the newest `limit` messages; page backwards with `before` (the oldest id
+    returned) or forwards with `after`. Rows are streamed as they are read.
+    Responses carry ETag/Last-Modified from the thread's newest message; a matching
+    If-None-Match (or If-Modified-Since) gets 304 without touching the database. A failed
+    read is a 500 marked no-store, so no cache keeps it under a valid ETag.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        with span("history.version"):
+            version = await get_version(thread_id)
+    except Exception as e:
+        log.warning(f"History version lookup failed: {str(e)}")
+        version = None
+    etag = version.etag(before, after, limit) if version else None
+    if version:
+        if version.not_modified(etag, if_none_match, if_modified_since):
+            CACHE_EVENTS.labels("history_etag", "hit").inc()
+            return Response(status_code=304, headers=history_validators(version, etag))
+        CACHE_EVENTS.labels("history_etag", "miss").inc()
+    # Read the first chunk here so a failing query is a 500, not a 200 with an empty page
+    body = stream_thread_history(thread_id, before, after, limit)
+    try:
+        first = await body.__anext__()
+    except Exception as e:
+        log.error(f"History endpoint error: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail="Internal server error", headers={"Cache-Control": "no-store"}
+        )
+    # Validators only go out with a page that was read; without a version nothing is cached
+    headers = history_validators(version, etag) if version else {"Cache-Control": "no-store"}
+    return StreamingResponse(
+        prepend_chunk(first, body),
+        media_type="application/json",
+        headers=headers,
+        # Closes the read session if the client is gone before the body is sent
+        background=BackgroundTask(body.aclose),
+    )
+
+def history_validators(version: ThreadVersion, etag: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": version.last_modified,
+        "Cache-Control": settings.history_cache_control,
+    }
+
+async def prepend_chunk(first: bytes, rest):
+    yield first
+    try:
+        async for chunk in rest:
+            yield chunk
+    except Exception as e:
+        log.error(f"History stream aborted: {str(e)}")
+        raise
+
+async def stream_thread_history(thread_id: str, before: int | None, after: int | None, limit: int):
+    """Yield a ThreadHistory JSON document as rows are read, in chunks of ~HISTORY_CHUNK_BYTES.
+
+    A read error after the first chunk is re-raised, so the server aborts the response
+    instead of ending it as a well-formed but truncated page.
+    """
+    buffer = bytearray(b'{"thread_id":' + codec.dumpb(thread_id) + b',"messages":[')
+    has_more = False
+    # Own session: yield-dependencies are closed before a streamed body is sent
+    async with read_session(thread_id) as db:
+        with span("db.history_page"):
+            rows = await db.stream(history_page(thread_id, before, after, limit))
+        sent = skipped = 0
+        async for row in rows:
+            has_more = row.total > limit
+            if has_more and after is None and skipped < row.total - limit:
+                skipped += 1
+                continue
+            if sent == limit:
+                break
+            msg = {
+                "id": row.id,
+                "role": row.role,
+                "content": row.content,
+                "timestamp": row.created_at
+            }
+            if sent:
+                buffer += b","
+            buffer += codec.dumpb(msg)
+            sent += 1
+            if len(buffer) >= HISTORY_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+    buffer += b'],"has_more":' + codec.dumpb(has_more) + b"}"
+    yield bytes(buffer)
+
+async def process_lead_capture(lead_data: Dict[str, Any] | None, thread_id: str) -> bool:
+    """Forward a lead that has been committed with its turn, if it has contact fields."""
+    if not has_contact(lead_data):
+        return False
+    
+    # Forward to GHL through the durable outbound queue
+    await lead_queue.enqueue(lead_data, thread_id)
+    return True
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host=settings.api_host, port=settings.api_port)
\ No newline at end of file
+    from .serve import main
+    main()
\ No newline at end of file
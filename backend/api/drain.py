@@ -0,0 +1,51 @@
+"""Graceful drain: track in-flight chat turns so shutdown can let them finish.
+
+On SIGTERM uvicorn stops accepting connections and waits up to its graceful timeout
+for open requests; the lifespan shutdown then waits here for turns still running
+(streams, write-behind commits) before lead delivery and the pools are stopped.
+"""
+import asyncio, logging
+from contextlib import asynccontextmanager
+from ..core.tracing import INFLIGHT_CHATS
+
+log = logging.getLogger("drain")
+
+class Draining(Exception):
+    """The worker is shutting down and no longer starts new turns."""
+
+class Drain:
+    def __init__(self):
+        self.active = 0
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @asynccontextmanager
+    async def track(self):
+        """Count a chat turn as in flight for the duration of the block."""
+        if self.draining:
+            raise Draining()
+        self.active += 1
+        self._idle.clear()
+        INFLIGHT_CHATS.inc()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            INFLIGHT_CHATS.dec()
+            if self.active == 0:
+                self._idle.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Refuse new turns and wait for in-flight ones; False if some were still running."""
+        self.draining = True
+        if self.active:
+            log.info(f"Draining {self.active} in-flight chat turns")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            log.warning(f"Drain timed out with {self.active} chat turns still running")
+            return False
+
+drain = Drain()
@@ -0,0 +1,84 @@
+"""Production launcher: migrate once, then run N uvicorn workers.
+
+    python -m backend.api.serve [--workers N] [--skip-migrate]
+
+Workers default to API_WORKERS, or the CPU count when that is 0. uvicorn's own
+multi-process supervisor is used (it works on Windows, unlike gunicorn). SIGTERM/Ctrl+C
+stops accepting connections, gives open requests SHUTDOWN_DRAIN_TIMEOUT seconds, and
+then each worker's lifespan drains in-flight turns and the lead queue.
+"""
+import argparse, asyncio, logging, os, shutil, tempfile, time
+from ..config.settings import settings
+
+log = logging.getLogger("serve")
+
+def prepare_schema():
+    """Bring the schema up to date once, before any worker starts."""
+    if settings.postgres_url.startswith(("postgresql", "postgres://")):
+        from ..core.checkpointer import setup_checkpointer
+        from ..db.database import engine
+        from ..db.migrate import migrate
+        from ..db.retention import ensure_partitions
+
+        async def setup():
+            await setup_checkpointer()
+            # Retention also does this, but must not be the only thing keeping months ahead
+            await ensure_partitions(settings.partition_months_ahead)
+            await engine.dispose()
+
+        names = migrate()
+        log.info(f"DB migrated ({len(names)} applied)")
+        asyncio.run(setup())
+        return
+
+    # SQLite and other dev databases have no SQL migrations; create tables from the models
+    from ..db.database import engine
+    from ..db.models import Base
+
+    async def create_all():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_all())
+
+def prepare_metrics_dir(workers: int):
+    """Give workers a shared, empty PROMETHEUS_MULTIPROC_DIR so /metrics covers all of them."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if workers <= 1 and not path:
+        return
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="brax-metrics-")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=settings.api_workers or os.cpu_count() or 1)
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    parser.add_argument("--skip-migrate", action="store_true", help="schema is managed elsewhere")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    if not args.skip_migrate:
+        prepare_schema()
+    prepare_metrics_dir(args.workers)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    log.info(f"Schema ready in {elapsed_ms:.0f} ms; starting {args.workers} workers")
+
+    import uvicorn
+
+    uvicorn.run(
+        "backend.api.app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=int(settings.shutdown_drain_timeout),
+        log_config=None,
+    )
+
+if __name__ == "__main__":
+    main()
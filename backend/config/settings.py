@@ -1,13 +1,103 @@
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List
 
 class Settings(BaseSettings):
     api_host: str = "0.0.0.0"
     api_port: int = 8080
+    # 0 sizes the worker count to the CPU count (see backend.api.serve)
+    api_workers: int = 0
+    graph_warmup: bool = True
+    shutdown_drain_timeout: float = 20.0
     cors_allow_origins: List[str] = ["*"]
+    log_format: str = "json"
+    span_logs: bool = True
 
     postgres_url: str
+    # Create tables at startup instead of running migrations (local SQLite runs only)
+    db_auto_create: bool = False
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    # Optional streaming replica for read-only work (history pages, history windows)
+    postgres_replica_url: str | None = None
+    # Threads written this recently read from the primary; a replica lagging more is skipped
+    replica_read_your_writes_seconds: float = 5.0
+    replica_health_interval: float = 5.0
+    db_write_behind: bool = False
+    db_write_batch_size: int = 100
+    db_write_max_delay_ms: int = 10
     redis_url: str | None = None
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 0.5
+    redis_op_timeout: float = 0.5
+    redis_health_check_interval: int = 30
+    redis_breaker_threshold: int = 5
+    redis_breaker_cooldown: float = 10.0
+
+    history_max_messages: int = 20
+    history_token_budget: int | None = None
+    thread_cache_ttl: int = 3600
+    # Newest message per thread, for ETag/304 on /thread/{id}/history
+    thread_version_ttl: int = 604800
+    # "no-cache" lets a CDN store history but revalidate each view (a 304 costs no DB query);
+    # add s-maxage=N to serve it from the edge for N seconds without asking the API
+    history_cache_control: str = "public, no-cache"
+    prompt_reload_interval: float = 2.0
+    # Graph state between turns: none (rebuilt from the history window) | memory | postgres
+    graph_checkpointer: str = "none"
+    checkpoint_pool_size: int = 10
+
+    thread_lock_ttl_ms: int = 60000
+    thread_lock_wait_timeout: float = 30.0
+    idempotency_ttl: int = 86400
+    # POST /chat/batch is disabled unless a key is set (sent as "Authorization: Bearer <key>")
+    batch_api_key: str | None = None
+    batch_max_bytes: int = 1048576
+    batch_max_threads: int = 200
+    batch_max_concurrency: int = 8
+    # Intents answered from backend/prompts/intent_<name>.md without calling the agent
+    router_templated_intents: str = "greeting,engagement_ring,jewelry_repair,luxury_watches"
+    # Cosine similarity (0-1) for the embedding intent classifier; unset disables
+    router_classifier_similarity: float | None = None
+
+    rate_limit_enabled: bool = True
+    rate_limit_ip_per_minute: int = 30
+    rate_limit_ip_burst: int = 10
+    rate_limit_user_per_minute: int = 20
+    rate_limit_user_burst: int = 5
+    # /chat/batch is charged one token per thread; a body needing more than the burst is 413
+    rate_limit_batch_per_minute: int = 200
+    rate_limit_batch_burst: int = 200
+    # Per worker: turns running at once, and how many may wait (and for how long) for a slot
+    max_concurrent_turns: int = 32
+    admission_queue_size: int = 64
+    admission_queue_timeout: float = 2.0
+
+    # Archive-and-delete threads idle this long (python -m backend.db.retention)
+    retention_idle_days: int = 90
+    retention_batch_size: int = 500
+    retention_archive_dir: str = "archive"
+    # jsonl (gzip) | parquet (needs pyarrow)
+    retention_format: str = "jsonl"
+    partition_months_ahead: int = 3
+
+    response_cache_enabled: bool = True
+    response_cache_ttl: int = 3600
+    # Cosine similarity (0-1) for embedding matches against past user messages; unset disables
+    response_cache_similarity: float | None = None
+
+    embedder: str = "none"
+    openai_api_key: str | None = None
+    openai_embedding_model: str = "text-embedding-3-small"
+    embedding_pipeline_enabled: bool = False
+    embedding_batch_size: int = 64
+    embedding_poll_interval: float = 5.0
+    embedding_max_chars: int = 8000
+    # Polls after the first look this far behind the oldest unembedded message seen
+    embedding_lookback_seconds: int = 600
+    # Rejections (4xx, bad input) before a message is skipped with a NULL embedding
+    embedding_max_attempts: int = 3
 
     ghl_webhook_url: str | None = None
     ghl_api_key: str | None = None
@@ -17,8 +107,22 @@ class Settings(BaseSettings):
     ghl_pipeline_id: str | None = None
     ghl_stage_id: str | None = None
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    http_timeout: float = 10.0
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 10
+
+    lead_queue_batch_size: int = 20
+    lead_queue_max_attempts: int = 8
+    lead_queue_backoff_base: float = 2.0
+    lead_queue_backoff_max: float = 600.0
+    lead_queue_poll_interval: float = 0.5
+    lead_queue_drain_timeout: float = 10.0
+    # Leads claimed by a worker that has not checked in for this long are requeued
+    lead_queue_worker_timeout: float = 60.0
+    lead_default_country_code: str = "1"
+    lead_state_ttl: int = 604800
+
+    # Other keys in .env (e.g. the frontend's VITE_* variables) are not ours to validate
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
 
 settings = Settings()
\ No newline at end of file
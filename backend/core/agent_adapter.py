@@ -1,6 +1,10 @@
 import logging, inspect, re, json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
+from .intent_router import intent_router
+from .lead_parser import normalize_lead, parse_lead_block
+from .prompts import prompt_registry
+from ..services import embeddings, response_cache
 
 # Import your immutable core as-is. Adjust paths if different.
 # from agents.agentic_mcp.mcp_voice_agent import AgenticMCP
@@ -8,6 +12,11 @@ from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, System
 
 log = logging.getLogger("agent_adapter")
 
+DEFAULT_SYSTEM_PROMPT = "I'm your dedicated jewelry concierge at Brax Fine Jewelers, here to help you find the perfect piece or answer any questions about our collection."
+
+# Split points before each word, so chunks keep their leading whitespace
+_CHUNK_RE = re.compile(r"(?<=\s)(?=\S)")
+
 class AgenticCoreAdapter:
     """Adapter that wraps your immutable AgenticMCP and MemoryManager without modifying them."""
     
@@ -20,12 +29,9 @@ class AgenticCoreAdapter:
     async def process_message(self, thread_id: str, user_message: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Process a user message through the agent and return structured response."""
         try:
-            # Convert to LangChain message format
-            human_msg = HumanMessage(content=user_message)
-            
-            # For demo purposes, we'll simulate the agent response
-            # In production, replace this with actual calls to your AgenticMCP
-            response_content = await self._simulate_agent_response(user_message, context or {})
+            response_content = "".join(
+                [chunk async for chunk in self.astream_message(thread_id, user_message, context)]
+            )
             
             # Extract lead information from response if present
             lead_data = self._extract_lead_data(response_content)
@@ -47,102 +53,54 @@ class AgenticCoreAdapter:
                 "error": str(e)
             }
     
+    async def astream_message(self, thread_id: str, user_message: str, context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """Stream the agent's response as text chunks; joined they equal the full response."""
+        # Convert to LangChain message format
+        human_msg = HumanMessage(content=user_message)
+        
+        # Repeated intent-level questions are answered from the response cache; an answer that
+        # follows earlier turns depends on them, so only a thread's first message is cached
+        prompt_version = f"{prompt_registry.fingerprint}.{intent_router.version}"
+        contextual = bool((context or {}).get("history"))
+        cached = await response_cache.lookup(user_message, prompt_version, contextual)
+        if cached is not None:
+            yield cached
+            return
+        
+        # For demo purposes, we'll simulate the agent response and replay it word by word
+        # In production, replace this with the AgenticMCP token stream
+        response_content = await self._simulate_agent_response(user_message, context or {})
+        for chunk in _CHUNK_RE.split(response_content):
+            if chunk:
+                yield chunk
+        await response_cache.store(user_message, prompt_version, response_content, contextual)
+    
+    async def recall(self, query: str, k: int = 5, thread_id: str | None = None, user_id: str | None = None) -> List[Dict[str, Any]]:
+        """Semantically similar past messages (see services.embeddings.recall)."""
+        return await embeddings.recall(query, k=k, thread_id=thread_id, user_id=user_id)
+    
     async def _simulate_agent_response(self, user_message: str, context: Dict[str, Any]) -> str:
         """Simulate agent response for demo. Replace with actual AgenticMCP integration."""
         
         # Load system prompt from file
         system_prompt = self._load_system_prompt()
         
-        # Simple keyword-based responses for demo
-        message_lower = user_message.lower()
-        
-        if any(word in message_lower for word in ["engagement", "ring", "proposal", "diamond"]):
-            return """I'd be delighted to help you find the perfect engagement ring! At Brax Fine Jewelers, we specialize in creating unforgettable moments with our exquisite diamond collection.
-
-Our engagement rings feature:
-- Certified diamonds with exceptional clarity and brilliance
-- Custom design services to create your unique vision
-- Expert guidance on the 4 C's (Cut, Color, Clarity, Carat)
-- Lifetime warranty and complimentary maintenance
-
-I'd love to learn more about what you're looking for. What's your budget range, and do you have any specific style preferences?
-
-```lead
-{
-  "name": "",
-  "email": "",
-  "phone": "",
-  "intent": "engagement_ring",
-  "notes": "Interested in engagement rings, needs consultation on budget and style preferences"
-}
-```"""
-        
-        elif any(word in message_lower for word in ["repair", "fix", "broken", "maintenance"]):
-            return """I can certainly help you with jewelry repair services! Brax Fine Jewelers offers comprehensive repair and maintenance services to keep your precious pieces looking their best.
-
-Our repair services include:
-- Ring resizing and reshaping
-- Stone replacement and setting repair
-- Chain and clasp repair
-- Cleaning and polishing
-- Antique jewelry restoration
-
-To provide you with an accurate estimate, I'd recommend bringing your piece in for a free evaluation. Would you like me to schedule an appointment for you?
-
-```lead
-{
-  "name": "",
-  "email": "",
-  "phone": "",
-  "intent": "jewelry_repair",
-  "notes": "Needs jewelry repair services, interested in free evaluation appointment"
-}
-```"""
-        
-        elif any(word in message_lower for word in ["watch", "timepiece", "rolex", "omega"]):
-            return """Welcome to our luxury timepiece collection! Brax Fine Jewelers is an authorized dealer for premier watch brands including Rolex, Omega, TAG Heuer, and more.
-
-Whether you're looking for:
-- Classic dress watches for professional settings
-- Sports watches with advanced complications
-- Vintage or limited edition pieces
-- Investment-grade timepieces
-
-Our certified watch specialists can guide you through our collection and help you find the perfect timepiece. Are you looking for a specific brand or style?
-
-```lead
-{
-  "name": "",
-  "email": "",
-  "phone": "",
-  "intent": "luxury_watches",
-  "notes": "Interested in luxury timepieces, needs consultation with watch specialist"
-}
-```"""
+        # Keyword intents answer with their canned template (same matcher as the graph router)
+        intent = intent_router.match(user_message)
+        template = prompt_registry.get(f"intent_{intent}") if intent else None
+        if template:
+            return template
         
-        else:
-            return f"""Thank you for reaching out to Brax Fine Jewelers! I'm here to help you with all your fine jewelry needs.
+        return f"""Thank you for reaching out to Brax Fine Jewelers! I'm here to help you with all your fine jewelry needs.
 
 {system_prompt}
 
 How can I assist you today? Whether you're looking for engagement rings, luxury watches, custom jewelry design, or repair services, I'm here to provide expert guidance."""
     
     def _load_system_prompt(self) -> str:
-        """Load system prompt from prompts/system_prompt.md"""
-        try:
-            with open("backend/prompts/system_prompt.md", "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except FileNotFoundError:
-            return "I'm your dedicated jewelry concierge at Brax Fine Jewelers, here to help you find the perfect piece or answer any questions about our collection."
+        """System prompt from the shared prompt registry (loaded once, hot-reloaded)."""
+        return prompt_registry.get("system_prompt", DEFAULT_SYSTEM_PROMPT)
     
     def _extract_lead_data(self, response: str) -> Dict[str, Any] | None:
-        """Extract lead data from response if present in ```lead blocks."""
-        pattern = r"```lead\s*\n(.*?)\n```"
-        match = re.search(pattern, response, re.DOTALL)
-        if match:
-            try:
-                lead_json = match.group(1).strip()
-                return json.loads(lead_json)
-            except json.JSONDecodeError:
-                log.warning("Failed to parse lead JSON from response")
-        return None
\ No newline at end of file
+        """Normalized lead data from a ```lead block in the response, if any."""
+        return normalize_lead(parse_lead_block(response))
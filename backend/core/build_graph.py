@@ -1,22 +1,63 @@
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import BaseMessage, AIMessage
+from langgraph.config import get_stream_writer
+from langchain_core.messages import BaseMessage, AIMessage, RemoveMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from .state import AgentState
 from .agent_adapter import AgenticCoreAdapter
-import logging
+from .intent_router import ROUTE_DECISIONS, ROUTE_SECONDS, intent_router
+from .tracing import set_trace_id, span
+from ..config.settings import settings
+import logging, time
 
 log = logging.getLogger("build_graph")
 
-def create_brax_chat_graph():
-    """Build the conversation graph for Brax chatbot."""
+def _trim(messages: list[BaseMessage], new: int) -> list[RemoveMessage]:
+    """Removals that keep the checkpointed history at HISTORY_MAX_MESSAGES after `new` are added."""
+    excess = len(messages) + new - settings.history_max_messages
+    return [RemoveMessage(id=m.id) for m in messages[:max(excess, 0)] if m.id]
+
+def create_brax_chat_graph(checkpointer: BaseCheckpointSaver | None = None):
+    """Build the conversation graph for Brax chatbot.
+
+    A router node classifies the new message; templated intents are answered from their
+    prompt template and only the rest reach the agent. With a checkpointer, state persists
+    per `configurable.thread_id` and each turn only needs to send the new message.
+    """
     
     adapter = AgenticCoreAdapter()
     
+    async def router_node(state: AgentState) -> AgentState:
+        """Pick the templated or agent route for the latest user message."""
+        set_trace_id(state.get("trace_id"))
+        messages = state["messages"]
+        if not messages or not isinstance(messages[-1].content, str):
+            return {"route": "agent", "intent": None}
+        with span("router.classify") as attrs:
+            intent, matcher = await intent_router.classify(messages[-1].content)
+            route = "templated" if intent_router.template(intent) else "agent"
+            attrs.update(route=route, intent=intent)
+        ROUTE_DECISIONS.labels(route, intent or "none", matcher).inc()
+        return {"route": route, "intent": intent}
+    
+    async def templated_node(state: AgentState) -> AgentState:
+        """Answer a templated intent without calling the agent."""
+        start = time.perf_counter()
+        messages = state["messages"]
+        text = intent_router.template(state.get("intent"))
+        if text is None:
+            # The template was removed since routing
+            return await agent_node(state)
+        get_stream_writer()({"token": text})
+        ROUTE_SECONDS.labels("templated").observe(time.perf_counter() - start)
+        return {"messages": _trim(messages, 1) + [AIMessage(content=text)]}
+    
     async def agent_node(state: AgentState) -> AgentState:
         """Main agent processing node."""
         try:
             messages = state["messages"]
             user_id = state["user_id"]
             thread_id = state["thread_id"]
+            set_trace_id(state.get("trace_id"))
             
             # Get the latest user message
             if not messages or not isinstance(messages[-1], BaseMessage):
@@ -24,36 +65,41 @@ def create_brax_chat_graph():
             
             last_message = messages[-1].content
             
-            # Process through the adapter
-            result = await adapter.process_message(
-                thread_id=thread_id,
-                user_message=last_message,
-                context={"user_id": user_id}
-            )
+            # Process through the adapter, forwarding chunks to graph.astream(stream_mode="custom")
+            writer = get_stream_writer()
+            chunks = []
+            start = time.perf_counter()
+            with span("adapter.process"):
+                async for chunk in adapter.astream_message(
+                    thread_id=thread_id,
+                    user_message=last_message,
+                    context={"user_id": user_id, "history": messages[:-1]}
+                ):
+                    chunks.append(chunk)
+                    writer({"token": chunk})
+            ROUTE_SECONDS.labels("agent").observe(time.perf_counter() - start)
             
             # Create AI response message
-            ai_message = AIMessage(content=result["response"])
-            
-            # Update state with new message
-            new_messages = messages + [ai_message]
+            ai_message = AIMessage(content="".join(chunks))
             
-            return {
-                **state,
-                "messages": new_messages
-            }
+            # The reducer appends the reply; drop the oldest messages past the window
+            return {"messages": _trim(messages, 1) + [ai_message]}
             
         except Exception as e:
             log.error(f"Agent node error: {str(e)}")
             error_message = AIMessage(content="I apologize for the technical difficulty. Please try again.")
-            return {
-                **state,
-                "messages": state["messages"] + [error_message]
-            }
+            return {"messages": [error_message]}
     
     # Build the graph
     workflow = StateGraph(AgentState)
+    workflow.add_node("router", router_node)
+    workflow.add_node("templated", templated_node)
     workflow.add_node("agent", agent_node)
-    workflow.set_entry_point("agent")
+    workflow.set_entry_point("router")
+    workflow.add_conditional_edges(
+        "router", lambda state: state["route"], {"templated": "templated", "agent": "agent"}
+    )
+    workflow.add_edge("templated", END)
     workflow.add_edge("agent", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""LangGraph checkpointer chosen by GRAPH_CHECKPOINTER: none | memory | postgres.
+
+With a checkpointer the graph keeps each thread's messages between turns (keyed by
+thread_id), so a turn sends only the new HumanMessage. `postgres` needs the
+langgraph-checkpoint-postgres package and its tables (created by backend.api.serve via
+setup_checkpointer); `memory` is per process and only suits a single worker.
+"""
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from ..config.settings import settings
+from ..db.migrate import _libpq_url
+
+log = logging.getLogger("checkpointer")
+
+@asynccontextmanager
+async def _postgres_saver(pool_size: int) -> AsyncIterator[BaseCheckpointSaver]:
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+    pool = AsyncConnectionPool(
+        _libpq_url(settings.postgres_url),
+        max_size=pool_size,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        open=False,
+    )
+    async with pool:
+        yield AsyncPostgresSaver(pool)
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[BaseCheckpointSaver | None]:
+    """Yield the configured checkpointer (None when disabled) for the app's lifetime."""
+    kind = settings.graph_checkpointer
+    if kind == "postgres":
+        async with _postgres_saver(settings.checkpoint_pool_size) as saver:
+            yield saver
+    elif kind == "memory":
+        yield InMemorySaver()
+    else:
+        if kind != "none":
+            log.warning(f"Unknown GRAPH_CHECKPOINTER {kind!r}; checkpointing disabled")
+        yield None
+
+async def setup_checkpointer():
+    """Create or upgrade the Postgres checkpoint tables (run once, before workers start)."""
+    if settings.graph_checkpointer != "postgres":
+        return
+    async with _postgres_saver(1) as saver:
+        await saver.setup()
@@ -0,0 +1,18 @@
+"""JSON encoding for API bodies, Redis values and queued jobs, backed by orjson.
+
+orjson is several times faster than the stdlib json and encodes datetimes natively
+(RFC 3339, identical to isoformat() for the values stored here). dumps() returns str
+because the Redis client runs with decode_responses=True; dumpb() returns bytes for
+response bodies.
+"""
+from typing import Any
+import orjson
+
+def dumpb(obj: Any) -> bytes:
+    return orjson.dumps(obj)
+
+def dumps(obj: Any) -> str:
+    return orjson.dumps(obj).decode("utf-8")
+
+def loads(data: str | bytes) -> Any:
+    return orjson.loads(data)
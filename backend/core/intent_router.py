@@ -0,0 +1,114 @@
+"""Intent routing in front of the agent.
+
+Keywords for every intent are compiled into one regex alternation, so a message is
+classified in a single scan whatever the number of keywords, with the same result as
+scanning each intent's keywords in priority order. Greetings only match when the
+whole message is a greeting. If no keyword matches and ROUTER_CLASSIFIER_SIMILARITY is
+set, the message is compared with a few example utterances per intent through the
+configured embedder. Intents listed in ROUTER_TEMPLATED_INTENTS that have an
+`intent_<name>` prompt are answered from that template; everything else goes to the agent.
+"""
+import hashlib, json, logging, math, re
+from typing import Dict, List, Tuple
+from prometheus_client import Counter, Histogram
+from .prompts import prompt_registry
+from ..config.settings import settings
+from ..services.embeddings import get_embedder
+
+log = logging.getLogger("intent_router")
+
+# In priority order: a message mentioning a ring and a repair is an engagement_ring lead
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "engagement_ring": ["engagement", "ring", "proposal", "diamond"],
+    "jewelry_repair": ["repair", "fix", "broken", "maintenance"],
+    "luxury_watches": ["watch", "timepiece", "rolex", "omega"],
+}
+
+GREETING_RE = re.compile(
+    r"^\W*(?:hi|hello|hey|hiya|howdy|good\s+(?:morning|afternoon|evening)|greetings)"
+    r"(?:\s+there)?\W*$",
+    re.IGNORECASE,
+)
+
+# Example utterances for the optional embedding classifier
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "engagement_ring": ["I want to propose to my girlfriend", "looking for a solitaire for her"],
+    "jewelry_repair": ["my necklace clasp snapped", "can you resize something I own"],
+    "luxury_watches": ["do you sell swiss chronographs", "looking for a dress watch"],
+}
+
+TEMPLATED_INTENTS = {
+    name.strip() for name in settings.router_templated_intents.split(",") if name.strip()
+}
+
+ROUTE_DECISIONS = Counter(
+    "brax_route_total", "Router decisions by route, intent and matcher", ["route", "intent", "matcher"]
+)
+ROUTE_SECONDS = Histogram("brax_route_seconds", "Time to answer a turn by route", ["route"])
+
+class IntentRouter:
+    def __init__(self, keywords: Dict[str, List[str]] = INTENT_KEYWORDS):
+        self._priority = {intent: i for i, intent in enumerate(keywords)}
+        self._intent_of = {word: intent for intent, words in keywords.items() for word in words}
+        # Substring matches on the lowercased message, like the adapter's original any() scans.
+        # The lookahead tries every position, so keywords overlapping an earlier match still
+        # count ("repairing" contains "ring"); at one position the higher-priority keyword wins
+        words = sorted(self._intent_of, key=lambda word: self._priority[self._intent_of[word]])
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(word) for word in words) + "))")
+        self._examples: List[Tuple[str, List[float]]] | None = None
+        # Changes with the keyword table, so answers cached under old routing expire
+        table = json.dumps([keywords, GREETING_RE.pattern]).encode("utf-8")
+        self.version = hashlib.sha256(table).hexdigest()[:12]
+
+    def match(self, message: str) -> str | None:
+        """Highest-priority intent whose keywords appear in the message, else None."""
+        if GREETING_RE.match(message):
+            return "greeting"
+        best = None
+        for m in self._pattern.finditer(message.lower()):
+            intent = self._intent_of[m.group(1)]
+            if best is None or self._priority[intent] < self._priority[best]:
+                best = intent
+                if self._priority[best] == 0:
+                    break
+        return best
+
+    async def classify(self, message: str) -> Tuple[str | None, str]:
+        """(intent, matcher): the keyword match, else the embedding classifier if enabled."""
+        intent = self.match(message)
+        if intent or settings.router_classifier_similarity is None:
+            return intent, "keyword"
+        try:
+            return await self._nearest_example(message), "classifier"
+        except Exception as e:
+            log.warning(f"Intent classifier failed: {str(e)}")
+            return None, "keyword"
+
+    async def _nearest_example(self, message: str) -> str | None:
+        embedder = get_embedder()
+        if embedder is None:
+            return None
+        if self._examples is None:
+            pairs = [(i, text) for i, texts in INTENT_EXAMPLES.items() for text in texts]
+            vectors = await embedder.embed([text for _, text in pairs])
+            self._examples = [(intent, v) for (intent, _), v in zip(pairs, vectors)]
+        vector = (await embedder.embed([message]))[0]
+        best, score = None, settings.router_classifier_similarity
+        for intent, example in self._examples:
+            similarity = _cosine(vector, example)
+            if similarity >= score:
+                best, score = intent, similarity
+        return best
+
+    def template(self, intent: str | None) -> str | None:
+        """The canned reply for a templated intent, or None if it should go to the agent."""
+        if intent not in TEMPLATED_INTENTS:
+            return None
+        return prompt_registry.get(f"intent_{intent}")
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+intent_router = IntentRouter()
@@ -0,0 +1,170 @@
+import json, logging, re
+from typing import Any, Dict
+from .prompts import prompt_registry
+from ..config.settings import settings
+
+log = logging.getLogger("lead_parser")
+
+# ```lead fenced JSON block emitted by the agent
+LEAD_OPEN = "```lead"
+LEAD_CLOSE = "\n```"
+MAX_LEAD_BLOCK_CHARS = 8192
+
+LEAD_FIELDS = ("name", "email", "phone", "intent", "notes")
+# A lead is worth forwarding only if we can reach the customer
+CONTACT_FIELDS = ("email", "phone")
+PERSONAL_FIELDS = ("name", "email", "phone")
+
+_EMAIL_RE = re.compile(r"^[a-z0-9._%+-]+@[a-z0-9-]+(\.[a-z0-9-]+)*\.[a-z]{2,}$")
+_NON_DIGIT_RE = re.compile(r"\D")
+_INTENT_RE = re.compile(r"[^a-z0-9]+")
+_SPACE_RE = re.compile(r"\s+")
+_FIELD_LIMITS = {"name": 200, "intent": 64, "notes": 2000}
+# Template text rather than data: "name if provided", "<email>", "[phone]"
+_PLACEHOLDER_RE = re.compile(r"\bif (?:provided|known|available|any)\b|^[<\[{].*[>\]}]$", re.IGNORECASE)
+_PLACEHOLDER_VALUES = {"n/a", "na", "none", "null", "unknown", "not provided", "tbd", "example"}
+
+class LeadStreamParser:
+    """Finds the first ```lead block in text fed chunk by chunk.
+
+    Outside a block only a marker-sized tail is kept, so feeding a whole streamed reply
+    costs one pass over it; `lead` is set as soon as the closing fence arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+        self._body_start: int | None = None
+        self._scanned = 0
+        self.done = False
+        self.lead: Dict[str, Any] | None = None
+
+    def feed(self, chunk: str):
+        if self.done or not chunk:
+            return
+        self._buffer += chunk
+        if not self._inside:
+            start = self._buffer.find(LEAD_OPEN)
+            # The marker must be followed by whitespace ("```leads" is not a lead block)
+            while start != -1 and len(self._buffer) > start + len(LEAD_OPEN):
+                if self._buffer[start + len(LEAD_OPEN)].isspace():
+                    break
+                start = self._buffer.find(LEAD_OPEN, start + 1)
+            if start == -1:
+                self._buffer = self._buffer[-(len(LEAD_OPEN) - 1):]
+                return
+            if len(self._buffer) == start + len(LEAD_OPEN):
+                self._buffer = self._buffer[start:]
+                return
+            self._buffer = self._buffer[start + len(LEAD_OPEN):]
+            self._inside = True
+        # The body starts on the line after the marker
+        if self._body_start is None:
+            newline = self._buffer.find("\n")
+            self._body_start = None if newline == -1 else newline + 1
+        end = -1
+        if self._body_start is not None:
+            end = self._buffer.find(LEAD_CLOSE, max(self._body_start, self._scanned))
+        if end == -1:
+            # Resume next time just before the tail, where a split fence may start
+            self._scanned = max(0, len(self._buffer) - len(LEAD_CLOSE) + 1)
+            if len(self._buffer) > MAX_LEAD_BLOCK_CHARS:
+                log.warning("Lead block too long; ignoring it")
+                self._finish(None)
+            return
+        self._finish(self._buffer[self._body_start:end])
+
+    def _finish(self, body: str | None):
+        self.done = True
+        self._buffer = ""
+        if body is None:
+            return
+        try:
+            data = json.loads(body.strip())
+        except json.JSONDecodeError:
+            log.warning("Failed to parse lead JSON from response")
+            return
+        self.lead = data if isinstance(data, dict) else None
+
+def parse_lead_block(text: str) -> Dict[str, Any] | None:
+    """Return the JSON object in a ```lead block, or None if absent or malformed."""
+    parser = LeadStreamParser()
+    parser.feed(text)
+    return parser.lead
+
+def normalize_email(value: str) -> str | None:
+    email = value.strip().lower()
+    return email if _EMAIL_RE.match(email) else None
+
+def normalize_phone(value: str) -> str | None:
+    """E.164 (+<digits>); national numbers get LEAD_DEFAULT_COUNTRY_CODE. None if not a phone."""
+    value = value.strip()
+    digits = _NON_DIGIT_RE.sub("", value)
+    country_code = settings.lead_default_country_code
+    if value.startswith("00"):
+        digits = digits[2:]
+    elif not value.startswith("+") and not (digits.startswith(country_code) and len(digits) > 10):
+        digits = country_code + digits.lstrip("0")
+    return f"+{digits}" if 8 <= len(digits) <= 15 else None
+
+_example: tuple[str | None, Dict[str, str]] = (None, {})
+
+def _prompt_example() -> Dict[str, str]:
+    """Field values of the ```lead example in the system prompt, lowercased.
+
+    A reply that quotes the prompt carries this block; its values are never lead data.
+    """
+    global _example
+    version = prompt_registry.version("system_prompt")
+    if version != _example[0]:
+        block = parse_lead_block(prompt_registry.get("system_prompt") or "") or {}
+        values = {k: v.strip().lower() for k, v in block.items() if isinstance(v, str)}
+        _example = (version, values)
+    return _example[1]
+
+def is_placeholder(field: str, value: str) -> bool:
+    text = value.strip().lower()
+    return (
+        text in _PLACEHOLDER_VALUES
+        or _PLACEHOLDER_RE.search(text) is not None
+        or text == _prompt_example().get(field)
+        # An intent listing the choices ("engagement_ring|luxury_watches|...") was not picked
+        or (field == "intent" and "|" in text)
+    )
+
+def normalize_lead(data: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    """Known lead fields, trimmed and validated; empty, invalid or placeholder fields are dropped.
+
+    Returns None when nothing usable is left (e.g. a block of empty strings, or the
+    system prompt's example block).
+    """
+    if not data:
+        return None
+    lead = {}
+    for field in LEAD_FIELDS:
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            continue
+        if is_placeholder(field, value):
+            log.info(f"Dropped placeholder lead {field}")
+            continue
+        if field == "email":
+            value = normalize_email(value)
+        elif field == "phone":
+            value = normalize_phone(value)
+        elif field == "intent":
+            value = _INTENT_RE.sub("_", value.lower()).strip("_")
+        else:
+            value = _SPACE_RE.sub(" ", value).strip()
+        if not value:
+            log.info(f"Dropped invalid lead {field}")
+            continue
+        lead[field] = value[:_FIELD_LIMITS[field]] if field in _FIELD_LIMITS else value
+    return lead or None
+
+def has_contact(lead: Dict[str, Any] | None) -> bool:
+    """True for a normalized lead with a valid email or phone number."""
+    return bool(lead) and any(lead.get(field) for field in CONTACT_FIELDS)
+
+def has_personal_data(lead: Dict[str, Any] | None) -> bool:
+    return bool(lead) and any(lead.get(field) for field in PERSONAL_FIELDS)
@@ -0,0 +1,93 @@
+import asyncio, hashlib, logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+log = logging.getLogger("prompts")
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+PROMPT_SUFFIXES = {".md", ".txt"}
+
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    text: str
+    version: str
+    mtime: float
+
+class PromptRegistry:
+    """Prompts under backend/prompts/, loaded once and keyed by file stem.
+
+    Each prompt carries a content-hash version, and `fingerprint` hashes all of them.
+    watch() polls file mtimes and reloads changed files off the event loop, swapping the
+    whole mapping at once so readers never see a partial update.
+    """
+
+    def __init__(self, directory: Path = PROMPTS_DIR):
+        self.directory = directory
+        self._prompts: Dict[str, Prompt] = {}
+        self.fingerprint = "none"
+        self._task: asyncio.Task | None = None
+        self.reload()
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        prompt = self._prompts.get(name)
+        return prompt.text if prompt else default
+
+    def version(self, name: str) -> str | None:
+        prompt = self._prompts.get(name)
+        return prompt.version if prompt else None
+
+    def _scan(self) -> Dict[str, tuple[Path, float]]:
+        if not self.directory.is_dir():
+            return {}
+        return {
+            path.stem: (path, path.stat().st_mtime)
+            for path in self.directory.iterdir()
+            if path.suffix in PROMPT_SUFFIXES and path.is_file()
+        }
+
+    def reload(self) -> bool:
+        """Re-read prompts whose mtime changed; returns True if anything changed."""
+        files = self._scan()
+        current = self._prompts
+        if {name: mtime for name, (_, mtime) in files.items()} == {
+            name: p.mtime for name, p in current.items()
+        }:
+            return False
+        prompts = {}
+        for name, (path, mtime) in files.items():
+            if name in current and current[name].mtime == mtime:
+                prompts[name] = current[name]
+                continue
+            text = path.read_text(encoding="utf-8").strip()
+            version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+            prompts[name] = Prompt(name=name, text=text, version=version, mtime=mtime)
+            log.info(f"Loaded prompt {name} version {version}")
+        self._prompts = prompts
+        versions = ",".join(f"{name}:{p.version}" for name, p in sorted(prompts.items()))
+        self.fingerprint = hashlib.sha256(versions.encode("utf-8")).hexdigest()[:12]
+        return True
+
+    async def watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                log.warning(f"Prompt reload failed: {str(e)}")
+
+    def start_watching(self, interval: float):
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self.watch(interval))
+
+    async def stop_watching(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,210 @@
+"""Replay conversation logs through the chat graph, concurrently, as JSONL in and out.
+
+    python -m backend.core.replay threads.jsonl -o results.jsonl --concurrency 16
+    python -m backend.core.replay threads.jsonl --processes 4   # CPU-bound adapters
+
+Each input line is one thread:
+
+    {"thread_id": "t1", "user_id": "u1", "messages": ["Hi", {"role": "user", "content": "..."}]}
+
+Messages are strings (user turns) or {"role", "content"} dicts. Logged assistant messages
+are not sent; they are the expected reply to the preceding user turn, and results flag
+turns whose new reply differs. Turns within a thread run in order and threads run
+concurrently. Replies pass through the same adapter, response cache and lead parser as
+/chat. Nothing is written to Postgres and no leads are forwarded.
+"""
+import argparse, asyncio, logging, sys, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Dict, Iterable, List
+from langchain_core.messages import AIMessage, HumanMessage
+from . import codec
+from .lead_parser import normalize_lead, parse_lead_block
+from .state import AgentState
+from .tracing import new_trace_id
+from ..config.settings import settings
+
+log = logging.getLogger("replay")
+
+@dataclass
+class ReplayStats:
+    threads: int = 0
+    turns: int = 0
+    errors: int = 0
+    leads: int = 0
+    changed: int = 0
+    seconds: float = 0.0
+
+    def add(self, result: Dict[str, Any]):
+        self.threads += 1
+        self.errors += bool(result.get("error"))
+        for turn in result["turns"]:
+            self.turns += 1
+            self.leads += turn["lead_data"] is not None
+            self.changed += bool(turn.get("changed"))
+
+    def merge(self, other: "ReplayStats"):
+        for field in ("threads", "turns", "errors", "leads", "changed"):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def summary(self) -> Dict[str, Any]:
+        rate = self.turns / self.seconds if self.seconds else 0.0
+        return {**asdict(self), "seconds": round(self.seconds, 3), "turns_per_second": round(rate, 1)}
+
+def parse_thread(line: str) -> Dict[str, Any]:
+    """Normalize one JSONL line to {"thread_id", "user_id", "turns": [(user, expected)]}."""
+    data = codec.loads(line)
+    turns: List[List[str | None]] = []
+    for msg in data.get("messages") or []:
+        role, content = ("user", msg) if isinstance(msg, str) else (msg.get("role"), msg.get("content"))
+        if not isinstance(content, str) or not content:
+            continue
+        if role == "user":
+            turns.append([content, None])
+        elif role == "assistant" and turns and turns[-1][1] is None:
+            turns[-1][1] = content
+    return {
+        "thread_id": str(data.get("thread_id") or uuid.uuid4()),
+        "user_id": str(data.get("user_id") or "replay"),
+        "turns": turns,
+    }
+
+async def replay_thread(
+    graph, thread: Dict[str, Any], admit: Callable[[], AsyncContextManager] | None = None
+) -> Dict[str, Any]:
+    """Run a thread's user turns in order, carrying the generated history between them.
+
+    `admit`, if given, is entered around each turn (e.g. the API's admission slot).
+    """
+    history = []
+    turns = []
+    result = {"thread_id": thread["thread_id"], "turns": turns, "error": None}
+    try:
+        for user_message, expected in thread["turns"]:
+            history.append(HumanMessage(content=user_message))
+            state = AgentState(
+                messages=history[-settings.history_max_messages - 1:],
+                user_id=thread["user_id"],
+                thread_id=thread["thread_id"],
+                trace_id=new_trace_id(),
+            )
+            start = time.perf_counter()
+            async with admit() if admit else nullcontext():
+                output = await graph.ainvoke(state)
+            reply = output["messages"][-1].content
+            history.append(AIMessage(content=reply))
+            turn = {
+                "user": user_message,
+                "response": reply,
+                "lead_data": normalize_lead(parse_lead_block(reply)),
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            if expected is not None:
+                turn["changed"] = reply != expected
+            turns.append(turn)
+    except Exception as e:
+        log.error(f"Replay of thread {thread['thread_id']} failed: {str(e)}")
+        result["error"] = str(e)
+    return result
+
+async def replay(
+    graph,
+    lines: Iterable[str],
+    concurrency: int,
+    stats: ReplayStats,
+    admit: Callable[[], AsyncContextManager] | None = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Replay threads with at most `concurrency` in flight, yielding results as they finish.
+
+    Lines are read lazily, so memory stays bounded by the window rather than the file.
+    Malformed lines are yielded as {"error": ..., "line": n} and counted as errors.
+    """
+    start = time.perf_counter()
+    pending = set()
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            thread = parse_thread(line)
+        except (ValueError, AttributeError) as e:
+            stats.errors += 1
+            yield {"line": number, "error": f"invalid thread: {str(e)}"}
+            continue
+        pending.add(asyncio.create_task(replay_thread(graph, thread, admit)))
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stats.add(task.result())
+                yield task.result()
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            stats.add(task.result())
+            yield task.result()
+    stats.seconds = time.perf_counter() - start
+
+async def _replay_lines(
+    lines: Iterable[str], concurrency: int, emit: Callable[[Dict[str, Any]], Any]
+) -> ReplayStats:
+    from .build_graph import create_brax_chat_graph
+    from ..services.redis_cache import close_redis, init_redis
+
+    init_redis()
+    try:
+        stats = ReplayStats()
+        graph = create_brax_chat_graph()
+        async for result in replay(graph, lines, concurrency, stats):
+            emit(result)
+        return stats
+    finally:
+        await close_redis()
+
+def _replay_chunk(lines: List[str], concurrency: int) -> tuple[List[Dict[str, Any]], ReplayStats]:
+    """Process-pool entry point: one event loop and graph per worker process."""
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+    stats = asyncio.run(_replay_lines(lines, concurrency, results.append))
+    return results, stats
+
+def _chunks(lines: Iterable[str], size: int) -> Iterable[List[str]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of threads, or - for stdin")
+    parser.add_argument("-o", "--output", help="results JSONL (default stdout)")
+    parser.add_argument("--concurrency", type=int, default=16, help="threads in flight per process")
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (0 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="threads per process-pool task")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    stats = ReplayStats()
+    start = time.perf_counter()
+    with source, out:
+        if args.processes:
+            with ProcessPoolExecutor(args.processes) as pool:
+                chunks = _chunks(source, args.chunk_size)
+                jobs = [pool.submit(_replay_chunk, chunk, args.concurrency) for chunk in chunks]
+                for job in jobs:
+                    results, chunk_stats = job.result()
+                    stats.merge(chunk_stats)
+                    out.writelines(codec.dumps(r) + "\n" for r in results)
+        else:
+            emit = lambda result: out.write(codec.dumps(result) + "\n")
+            stats = asyncio.run(_replay_lines(source, args.concurrency, emit))
+    stats.seconds = time.perf_counter() - start
+    print(codec.dumps(stats.summary()), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
-from typing import List, TypedDict, NotRequired
+from typing import Annotated, List, TypedDict, NotRequired
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
 
 class AgentState(TypedDict):
-    messages: List[BaseMessage]
+    # Reducer: nodes return only new messages (or RemoveMessage) and they are merged in place
+    messages: Annotated[List[BaseMessage], add_messages]
     user_id: str
     thread_id: str
-    trace_id: NotRequired[str]
\ No newline at end of file
+    trace_id: NotRequired[str]
+    # Set by the router node: "templated" or "agent", and the matched intent if any
+    route: NotRequired[str]
+    intent: NotRequired[str | None]
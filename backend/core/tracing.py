@@ -0,0 +1,129 @@
+"""Per-request tracing: a trace_id context variable, timed spans and JSON logs.
+
+Spans feed the `brax_stage_seconds` Prometheus histogram (served at /metrics) and,
+when SPAN_LOGS is on, emit one JSON log line each on the `brax.trace` logger.
+"""
+import json, logging, time, uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from prometheus_client import Counter, Gauge, Histogram
+
+trace_log = logging.getLogger("brax.trace")
+
+trace_id_var: ContextVar[str | None] = ContextVar("trace_id", default=None)
+
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "brax_stage_seconds", "Time spent per hot-path stage", ["stage"], buckets=_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "brax_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=_BUCKETS
+)
+CACHE_EVENTS = Counter("brax_cache_events_total", "Cache lookups by outcome", ["cache", "result"])
+DB_POOL_CHECKED_OUT = Gauge("brax_db_pool_checked_out", "DB connections currently checked out")
+DB_POOL_SIZE = Gauge("brax_db_pool_size", "DB connections currently held by the pool")
+STARTUP_SECONDS = Gauge(
+    "brax_startup_seconds", "Worker startup time until ready to serve", multiprocess_mode="max"
+)
+INFLIGHT_CHATS = Gauge(
+    "brax_inflight_chats", "Chat turns currently being processed", multiprocess_mode="livesum"
+)
+
+span_logs_enabled = True
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+def current_trace_id() -> str | None:
+    return trace_id_var.get()
+
+def set_trace_id(trace_id: str | None):
+    """Adopt a trace_id carried in state or a job payload (no-op when missing)."""
+    if trace_id:
+        trace_id_var.set(trace_id)
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time a block as `stage`; extra keyword attributes go into the span log line."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if span_logs_enabled and trace_log.isEnabledFor(logging.INFO):
+            record = {"stage": stage, "duration_ms": round(elapsed * 1000, 3), **attrs}
+            if error:
+                record["error"] = error
+            trace_log.info("span", extra={"span": record})
+
+class TraceMiddleware:
+    """ASGI middleware: one trace_id per request (X-Request-ID if sent), echoed as X-Trace-ID,
+    plus the request latency histogram labelled by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        trace_id = incoming[:64] if incoming.isprintable() and incoming else new_trace_id()
+        token = trace_id_var.set(trace_id)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - start
+            )
+            trace_id_var.reset(token)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per log line, tagged with the active trace_id."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace_id = current_trace_id()
+        if trace_id:
+            payload["trace_id"] = trace_id
+        if hasattr(record, "span"):
+            payload.update(record.span)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+def configure_logging(fmt: str = "json", level: int = logging.INFO, span_logs: bool = True):
+    global span_logs_enabled
+    span_logs_enabled = span_logs
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
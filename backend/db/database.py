@@ -1,8 +1,42 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-import os
-
-DB_URL = os.getenv("POSTGRES_URL")
-engine = create_engine(DB_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
-Base = declarative_base()
\ No newline at end of file
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+from ..config.settings import settings
+
+def _async_url(url: str) -> str:
+    """Route plain postgres URLs through psycopg's async driver."""
+    for prefix in ("postgresql://", "postgres://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+def _pool_options(url: str) -> dict:
+    """Pool sizing for server databases; SQLite stand-ins use their dialect default."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+DB_URL = _async_url(settings.postgres_url)
+engine = create_async_engine(DB_URL, pool_pre_ping=True, **_pool_options(DB_URL))
+SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+# Read-only work goes through backend.db.read_routing, which falls back to the primary
+REPLICA_URL = _async_url(settings.postgres_replica_url) if settings.postgres_replica_url else None
+replica_engine = (
+    create_async_engine(REPLICA_URL, pool_pre_ping=True, **_pool_options(REPLICA_URL))
+    if REPLICA_URL
+    else None
+)
+ReplicaSessionLocal = (
+    async_sessionmaker(bind=replica_engine, expire_on_commit=False) if replica_engine else None
+)
+Base = declarative_base()
+
+async def get_db():
+    """FastAPI dependency yielding an AsyncSession per request."""
+    async with SessionLocal() as db:
+        yield db
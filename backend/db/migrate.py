@@ -0,0 +1,55 @@
+"""Apply backend/db/migrations/*.sql in filename order, each exactly once.
+
+    python -m backend.db.migrate
+
+Applied files are recorded in schema_migrations. Files whose first line is
+`-- migrate: no-transaction` run statement by statement in autocommit mode
+(needed for CREATE INDEX CONCURRENTLY); all others run in one transaction.
+"""
+import logging
+from pathlib import Path
+import psycopg
+from ..config.settings import settings
+
+log = logging.getLogger("migrate")
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+def _libpq_url(url: str) -> str:
+    """Strip the SQLAlchemy driver suffix (postgresql+psycopg://) for psycopg.connect."""
+    scheme, sep, rest = url.partition("://")
+    return scheme.split("+")[0] + sep + rest
+
+def _statements(sql: str) -> list[str]:
+    return [stmt.strip() for stmt in sql.split(";") if stmt.strip()]
+
+def migrate(url: str | None = None) -> list[str]:
+    """Apply pending migrations and return the names applied."""
+    applied = []
+    with psycopg.connect(_libpq_url(url or settings.postgres_url), autocommit=True) as conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "name TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        done = {row[0] for row in conn.execute("SELECT name FROM schema_migrations")}
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            if path.name in done:
+                continue
+            sql = path.read_text(encoding="utf-8")
+            log.info(f"Applying migration {path.name}")
+            if sql.startswith(NO_TRANSACTION):
+                for stmt in _statements(sql):
+                    conn.execute(stmt)
+                conn.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (path.name,))
+            else:
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (path.name,))
+            applied.append(path.name)
+    return applied
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    names = migrate()
+    print(f"DB migrated ({len(names)} applied: {', '.join(names) or 'none pending'}).")
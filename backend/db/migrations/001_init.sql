@@ -0,0 +1,34 @@
+-- Base schema (matches backend/db/models.py). Safe on databases created by create_all.
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id BIGSERIAL PRIMARY KEY,
+    thread_id TEXT REFERENCES threads(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS msg_embeddings (
+    msg_id BIGINT PRIMARY KEY REFERENCES messages(id) ON DELETE CASCADE,
+    embedding VECTOR(1536)
+);
+
+CREATE TABLE IF NOT EXISTS leads (
+    id BIGSERIAL PRIMARY KEY,
+    thread_id TEXT,
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+    intent TEXT,
+    notes TEXT,
+    raw TEXT,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- Keyset index for per-turn history windows and /thread/{id}/history pages.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_thread_created_id
+    ON messages (thread_id, created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_leads_thread_id
+    ON leads (thread_id);
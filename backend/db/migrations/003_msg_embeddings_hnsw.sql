@@ -0,0 +1,4 @@
+-- migrate: no-transaction
+-- Approximate nearest-neighbour index for recall() and the response cache similarity match.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_msg_embeddings_hnsw
+    ON msg_embeddings USING hnsw (embedding vector_cosine_ops);
@@ -0,0 +1,59 @@
+-- Range-partition messages by month of created_at, so retention can drop whole months and
+-- vacuum works per partition. Existing rows are copied into the new table inside this
+-- transaction; on a large database run it in a quiet window.
+--
+-- The primary key becomes (id, created_at) (a partitioned table's keys must include the
+-- partition column); id stays unique through its sequence. msg_embeddings loses its
+-- foreign key to messages, and the retention job deletes embeddings explicitly.
+
+ALTER TABLE msg_embeddings DROP CONSTRAINT IF EXISTS msg_embeddings_msg_id_fkey;
+
+ALTER TABLE messages RENAME TO messages_unpartitioned;
+ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey;
+ALTER INDEX IF EXISTS ix_messages_thread_created_id RENAME TO ix_messages_unpartitioned_thread_created_id;
+
+CREATE TABLE messages (
+    id BIGINT NOT NULL DEFAULT nextval('messages_id_seq'),
+    thread_id TEXT REFERENCES threads(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE messages_id_seq OWNED BY messages.id;
+
+CREATE INDEX ix_messages_thread_created_id ON messages (thread_id, created_at, id);
+
+-- Rows outside every monthly partition land here; it should stay empty (a month cannot be
+-- attached while the default partition holds rows for it)
+CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+-- messages_pYYYYMM for the month containing `month`; called ahead of time by the retention job
+CREATE OR REPLACE FUNCTION create_messages_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_at DATE := date_trunc('month', month);
+    name TEXT := 'messages_p' || to_char(start_at, 'YYYYMM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+        name, start_at, (start_at + interval '1 month')::date
+    );
+    RETURN name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_messages_partition(month::date)
+FROM generate_series(
+    date_trunc('month', coalesce((SELECT min(created_at) FROM messages_unpartitioned), now())),
+    date_trunc('month', now()) + interval '3 months',
+    interval '1 month'
+) AS month;
+
+INSERT INTO messages (id, thread_id, role, content, created_at)
+SELECT id, thread_id, role, content, coalesce(created_at, now()) FROM messages_unpartitioned;
+
+DROP TABLE messages_unpartitioned;
+
+-- Retention finds idle threads by updated_at (now bumped on every turn)
+CREATE INDEX IF NOT EXISTS ix_threads_updated_at ON threads (updated_at);
@@ -0,0 +1,41 @@
+-- create_messages_partition also works when the month's rows already sit in messages_default
+-- (e.g. retention did not run for longer than PARTITION_MONTHS_AHEAD). Postgres refuses to
+-- create a partition whose range the default partition holds rows for, so the default
+-- partition is detached, the month is created, its rows are moved over, and the default
+-- partition is attached again. Writes to messages wait on the lock for that one transaction.
+
+CREATE OR REPLACE FUNCTION create_messages_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_at DATE := date_trunc('month', month);
+    end_at DATE := (start_at + interval '1 month')::date;
+    name TEXT := 'messages_p' || to_char(start_at, 'YYYYMM');
+BEGIN
+    IF to_regclass(name) IS NOT NULL THEN
+        RETURN name;
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM messages_default WHERE created_at >= start_at AND created_at < end_at
+    ) THEN
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+            name, start_at, end_at
+        );
+        RETURN name;
+    END IF;
+
+    RAISE NOTICE 'Moving rows for % out of messages_default', name;
+    ALTER TABLE messages DETACH PARTITION messages_default;
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)', name, start_at, end_at
+    );
+    EXECUTE format(
+        'INSERT INTO %I (id, thread_id, role, content, created_at) '
+        'SELECT id, thread_id, role, content, created_at FROM messages_default '
+        'WHERE created_at >= %L AND created_at < %L',
+        name, start_at, end_at
+    );
+    DELETE FROM messages_default WHERE created_at >= start_at AND created_at < end_at;
+    ALTER TABLE messages ATTACH PARTITION messages_default DEFAULT;
+    RETURN name;
+END;
+$$ LANGUAGE plpgsql;
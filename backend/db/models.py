@@ -1,36 +1,54 @@
-from sqlalchemy import Column, BigInteger, Text, TIMESTAMP, func, ForeignKey
+from sqlalchemy import Column, BigInteger, Integer, Text, TIMESTAMP, func, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 from .database import Base
 
+# BIGSERIAL on Postgres; SQLite only autoincrements INTEGER PRIMARY KEY (local stand-ins)
+BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+
 class Thread(Base):
     __tablename__ = "threads"
     id = Column(Text, primary_key=True)
     user_id = Column(Text, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Bumped by every persisted turn; the retention job archives threads idle past a cutoff
+    updated_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), index=True
+    )
     messages = relationship("Message", back_populates="thread", cascade="all, delete-orphan")
 
 class Message(Base):
+    # On Postgres this is range-partitioned by month of created_at with PRIMARY KEY
+    # (id, created_at) (migration 004); id alone is unique through its sequence
     __tablename__ = "messages"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntPK, primary_key=True)
     thread_id = Column(Text, ForeignKey("threads.id", ondelete="CASCADE"))
     role = Column(Text, nullable=False)
     content = Column(Text, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     thread = relationship("Thread", back_populates="messages")
-    embedding = relationship("MsgEmbedding", uselist=False, back_populates="message", cascade="all, delete-orphan")
+    embedding = relationship(
+        "MsgEmbedding",
+        primaryjoin="Message.id == foreign(MsgEmbedding.msg_id)",
+        uselist=False,
+        back_populates="message",
+        cascade="all, delete-orphan",
+    )
+    __table_args__ = (Index("ix_messages_thread_created_id", "thread_id", "created_at", "id"),)
 
 class MsgEmbedding(Base):
     __tablename__ = "msg_embeddings"
-    msg_id = Column(BigInteger, ForeignKey("messages.id", ondelete="CASCADE"), primary_key=True)
+    # No foreign key: messages is partitioned; retention deletes embeddings with their messages
+    msg_id = Column(BigInteger, primary_key=True)
     embedding = Column(Vector(1536))
-    message = relationship("Message", back_populates="embedding")
+    message = relationship(
+        "Message", primaryjoin="Message.id == foreign(MsgEmbedding.msg_id)", back_populates="embedding"
+    )
 
 class Lead(Base):
     __tablename__ = "leads"
-    id = Column(BigInteger, primary_key=True)
-    thread_id = Column(Text, nullable=True)
+    id = Column(BigIntPK, primary_key=True)
+    thread_id = Column(Text, nullable=True, index=True)
     name = Column(Text)
     email = Column(Text)
     phone = Column(Text)
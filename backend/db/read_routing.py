@@ -0,0 +1,163 @@
+"""Route read-only sessions to the replica (POSTGRES_REPLICA_URL) when it is safe.
+
+A read goes to the primary instead when:
+- no replica is configured;
+- the replica failed its last health check, or lags more than
+  REPLICA_READ_YOUR_WRITES_SECONDS;
+- the thread was written within that window (read-your-writes). Writes are recorded in
+  Redis so every worker sees them. When Redis is configured but down, a thread not
+  written by this worker is read from the primary as well;
+- the replica refuses a connection. It is then marked down until the next health check.
+"""
+import asyncio, logging, time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+from prometheus_client import Counter, Gauge
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import ReplicaSessionLocal, SessionLocal, replica_engine
+from ..config.settings import settings
+from ..services.redis_cache import redis_call
+
+log = logging.getLogger("read_routing")
+
+DB_READS = Counter("brax_db_reads_total", "Read-only sessions by target and reason", ["target", "reason"])
+REPLICA_HEALTHY = Gauge(
+    "brax_db_replica_healthy", "1 if the read replica passed its last check", multiprocess_mode="min"
+)
+REPLICA_LAG_SECONDS = Gauge(
+    "brax_db_replica_lag_seconds", "Replay lag of the read replica", multiprocess_mode="max"
+)
+
+# Seconds since the replica last replayed WAL, or 0 when it has replayed all it received
+# (pg_last_xact_replay_timestamp alone grows while the primary is idle)
+_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+LOCAL_WRITES_MAX = 10000
+
+def _written_key(thread_id: str) -> str:
+    return f"thread:{thread_id}:written"
+
+async def _replica_lag(conn) -> float:
+    if conn.dialect.name == "postgresql":
+        return float(await conn.scalar(_LAG_SQL) or 0)
+    await conn.execute(text("SELECT 1"))
+    return 0.0
+
+class ReplicaHealth:
+    """Polls the replica every REPLICA_HEALTH_INTERVAL seconds for reachability and lag."""
+
+    def __init__(self):
+        self.healthy = False
+        self.lag: float | None = None
+        self._task: asyncio.Task | None = None
+
+    async def check(self) -> bool:
+        try:
+            async with replica_engine.connect() as conn:
+                lag = await _replica_lag(conn)
+        except Exception as e:
+            self.mark_down(str(e) or type(e).__name__)
+            return False
+        self.lag = lag
+        REPLICA_LAG_SECONDS.set(lag)
+        healthy = lag <= settings.replica_read_your_writes_seconds
+        if healthy != self.healthy:
+            log.info(f"Read replica {'healthy' if healthy else f'lagging {lag:.1f}s'}")
+        self.healthy = healthy
+        REPLICA_HEALTHY.set(int(healthy))
+        return healthy
+
+    def mark_down(self, reason: str):
+        if self.healthy:
+            log.warning(f"Read replica unavailable, reading from the primary: {reason}")
+        self.healthy = False
+        REPLICA_HEALTHY.set(0)
+
+    async def check_in_time(self) -> bool:
+        """check(), marking the replica down if it does not answer within the interval."""
+        try:
+            return await asyncio.wait_for(self.check(), settings.replica_health_interval)
+        except asyncio.TimeoutError:
+            self.mark_down("health check timed out")
+            return False
+
+    async def _run(self):
+        while True:
+            await self.check_in_time()
+            await asyncio.sleep(settings.replica_health_interval)
+
+    def start(self):
+        if replica_engine is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if replica_engine is not None:
+            await replica_engine.dispose()
+
+replica_health = ReplicaHealth()
+
+# thread_id -> monotonic time of this worker's last write
+_local_writes: Dict[str, float] = {}
+
+async def mark_written(thread_id: str):
+    """Record a committed write so reads of the thread stay on the primary for a while."""
+    if replica_engine is None:
+        return
+    window = settings.replica_read_your_writes_seconds
+    now = time.monotonic()
+    _local_writes[thread_id] = now
+    if len(_local_writes) > LOCAL_WRITES_MAX:
+        for key, at in list(_local_writes.items()):
+            if now - at > window:
+                del _local_writes[key]
+    await redis_call(lambda r: r.set(_written_key(thread_id), 1, px=int(window * 1000)))
+
+async def _read_target(thread_id: str | None) -> tuple[str, str]:
+    if not replica_health.healthy:
+        return "primary", "replica_down"
+    if thread_id is None:
+        return "replica", "replica"
+    at = _local_writes.get(thread_id)
+    if at is not None and time.monotonic() - at < settings.replica_read_your_writes_seconds:
+        return "primary", "recent_write"
+    written = await redis_call(lambda r: r.exists(_written_key(thread_id)))
+    if written is None:
+        # Without Redis configured this worker's own writes are all there is to know
+        return ("replica", "replica") if not settings.redis_url else ("primary", "write_state_unknown")
+    return ("primary", "recent_write") if written else ("replica", "replica")
+
+@asynccontextmanager
+async def read_session(thread_id: str | None = None) -> AsyncIterator[AsyncSession]:
+    """A session for read-only work on `thread_id`: the replica when safe, else the primary."""
+    if replica_engine is not None:
+        target, reason = await _read_target(thread_id)
+        if target == "replica":
+            session = ReplicaSessionLocal()
+            try:
+                await session.connection()
+            except Exception as e:
+                await session.close()
+                replica_health.mark_down(str(e) or type(e).__name__)
+                reason = "failover"
+            else:
+                DB_READS.labels("replica", reason).inc()
+                try:
+                    yield session
+                finally:
+                    await session.close()
+                return
+        DB_READS.labels("primary", reason).inc()
+    async with SessionLocal() as session:
+        yield session
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import json
+from sqlalchemy import insert, select, func, tuple_, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import Thread, Message, Lead
+
+@dataclass
+class Turn:
+    """One /chat exchange waiting to be written."""
+    thread_id: str
+    user_id: str
+    user_content: str
+    ai_content: str
+    lead_data: Dict[str, Any] | None = None
+
+def upsert_threads(db: AsyncSession):
+    """INSERT threads, bumping updated_at on conflict so it tracks the last activity."""
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        module = postgresql if dialect == "postgresql" else sqlite
+        stmt = module.insert(Thread)
+        return stmt.on_conflict_do_update(index_elements=[Thread.id], set_={"updated_at": func.now()})
+    return insert(Thread).prefix_with("IGNORE")
+
+def insert_ignore(db: AsyncSession, model):
+    """INSERT ... ON CONFLICT DO NOTHING for the session's dialect."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with("IGNORE")
+
+async def persist_turns(db: AsyncSession, turns: List[Turn]) -> List[Tuple[int, datetime]]:
+    """Write threads, messages and leads for a batch of turns in a single transaction.
+
+    Returns the (id, created_at) of each turn's assistant message, in input order.
+    """
+    threads = {t.thread_id: {"id": t.thread_id, "user_id": t.user_id} for t in turns}
+    await db.execute(upsert_threads(db), list(threads.values()))
+
+    rows = []
+    for t in turns:
+        rows.append({"thread_id": t.thread_id, "role": "user", "content": t.user_content})
+        rows.append({"thread_id": t.thread_id, "role": "assistant", "content": t.ai_content})
+    result = await db.execute(
+        insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True),
+        rows,
+    )
+    inserted = result.all()
+
+    leads = [
+        {
+            "thread_id": t.thread_id,
+            "name": t.lead_data.get("name"),
+            "email": t.lead_data.get("email"),
+            "phone": t.lead_data.get("phone"),
+            "intent": t.lead_data.get("intent"),
+            "notes": t.lead_data.get("notes"),
+            "raw": json.dumps(t.lead_data),
+        }
+        for t in turns
+        if t.lead_data
+    ]
+    if leads:
+        await db.execute(insert(Lead), leads)
+
+    await db.commit()
+    return [(row.id, row.created_at) for row in inserted[1::2]]
+
+async def persist_turn(db: AsyncSession, turn: Turn) -> Tuple[int, datetime]:
+    """Write a single turn; see persist_turns."""
+    return (await persist_turns(db, [turn]))[0]
+
+def thread_messages(thread_id: str):
+    """WHERE clauses selecting one thread's messages.
+
+    A thread's messages are never older than the thread row (both default to now() and
+    are written in one transaction), so created_at >= threads.created_at loses nothing.
+    On the partitioned messages table the bound lets Postgres skip, at executor startup,
+    every monthly partition from before the thread began instead of probing all of them.
+    """
+    started = select(Thread.created_at).where(Thread.id == thread_id).scalar_subquery()
+    return Message.thread_id == thread_id, Message.created_at >= started
+
+async def load_recent_messages(db: AsyncSession, thread_id: str, limit: int) -> List[Message]:
+    """Newest `limit` messages of a thread, returned oldest first."""
+    rows = (
+        await db.scalars(
+            select(Message)
+            .where(*thread_messages(thread_id))
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(limit)
+        )
+    ).all()
+    return list(reversed(rows))
+
+async def latest_message(db: AsyncSession, thread_id: str) -> Tuple[int, datetime] | None:
+    """(id, created_at) of the thread's newest message, or None if it has none."""
+    row = (
+        await db.execute(
+            select(Message.id, Message.created_at)
+            .where(*thread_messages(thread_id))
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(1)
+        )
+    ).first()
+    return (row.id, row.created_at) if row else None
+
+def history_page(thread_id: str, before: int | None, after: int | None, limit: int):
+    """Keyset-paginated page of a thread, oldest first, walking (created_at, id).
+
+    Without a cursor, or with `before`, this is the newest `limit` messages older than
+    the cursor; with `after` it is the oldest `limit` messages newer than it. One extra
+    row is fetched and every row carries the page's row count as `total`, so callers can
+    report has_more while streaming.
+    """
+    cursor_id = after if after is not None else before
+    bounds = thread_messages(thread_id)
+    page = select(Message.id, Message.role, Message.content, Message.created_at).where(*bounds)
+    if cursor_id is not None:
+        cursor_at = (
+            select(Message.created_at).where(Message.id == cursor_id, *bounds).scalar_subquery()
+        )
+        key = tuple_(Message.created_at, Message.id)
+        cursor = tuple_(cursor_at, literal(cursor_id))
+        page = page.where(key > cursor if after is not None else key < cursor)
+    if after is not None:
+        page = page.order_by(Message.created_at, Message.id)
+    else:
+        page = page.order_by(Message.created_at.desc(), Message.id.desc())
+    sub = page.limit(limit + 1).subquery()
+    return select(sub, func.count().over().label("total")).order_by(sub.c.created_at, sub.c.id)
@@ -0,0 +1,224 @@
+"""Archive and delete threads idle for longer than RETENTION_IDLE_DAYS.
+
+    python -m backend.db.retention [--idle-days 90] [--batch-size 500] [--dry-run]
+
+Each batch of idle threads (by threads.updated_at) is written with its messages and
+leads to a file in RETENTION_ARCHIVE_DIR: gzip JSONL, one thread per line, or Parquet
+with RETENTION_FORMAT=parquet when pyarrow is installed. The file is fsynced before the
+batch is deleted in one transaction, so a crash can leave a duplicate archive but never
+lose rows. The same transaction deletes the threads' LangGraph checkpoints when the
+Postgres checkpointer tables exist; the threads' Redis state (history window, merged
+lead, history version) is dropped after the commit. On Postgres the job also creates
+the next PARTITION_MONTHS_AHEAD monthly partitions of messages and drops past
+partitions that retention has emptied.
+"""
+import argparse, asyncio, gzip, json, logging, os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from sqlalchemy import bindparam, delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config.settings import settings
+from ..core import codec
+from ..services.lead_state import forget_thread_leads
+from ..services.redis_cache import close_redis
+from ..services.thread_cache import forget_windows
+from ..services.thread_versions import forget_versions
+from .database import SessionLocal, engine
+from .models import Lead, Message, MsgEmbedding, Thread
+
+log = logging.getLogger("retention")
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+async def _load_batch(db: AsyncSession, cutoff: datetime, batch_size: int) -> List[Dict[str, Any]]:
+    """Idle threads (oldest activity first) with their messages and leads.
+
+    The thread rows stay locked until the batch is deleted, so a turn arriving meanwhile
+    waits and then starts the thread afresh instead of writing into rows being removed.
+    """
+    threads = (
+        await db.scalars(
+            select(Thread)
+            .where(Thread.updated_at < cutoff)
+            .order_by(Thread.updated_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+    ).all()
+    if not threads:
+        return []
+    ids = [t.id for t in threads]
+    records = {
+        t.id: {
+            "thread_id": t.id,
+            "user_id": t.user_id,
+            "created_at": _iso(t.created_at),
+            "updated_at": _iso(t.updated_at),
+            "messages": [],
+            "leads": [],
+        }
+        for t in threads
+    }
+    messages = await db.execute(
+        select(Message.id, Message.thread_id, Message.role, Message.content, Message.created_at)
+        .where(Message.thread_id.in_(ids))
+        .order_by(Message.thread_id, Message.created_at, Message.id)
+    )
+    for m in messages:
+        records[m.thread_id]["messages"].append(
+            {"id": m.id, "role": m.role, "content": m.content, "created_at": _iso(m.created_at)}
+        )
+    for lead in await db.scalars(select(Lead).where(Lead.thread_id.in_(ids))):
+        records[lead.thread_id]["leads"].append(
+            {"id": lead.id, "raw": lead.raw, "intent": lead.intent, "created_at": _iso(lead.created_at)}
+        )
+    return list(records.values())
+
+def _write_jsonl(path: str, records: List[Dict[str, Any]]):
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for record in records:
+                f.write(codec.dumpb(record) + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+def _write_parquet(path: str, records: List[Dict[str, Any]]):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pylist(records)
+    pq.write_table(table, path, compression="zstd")
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+def archive_batch(records: List[Dict[str, Any]], archive_dir: str, fmt: str) -> str:
+    """Durably write one batch; returns the file path."""
+    os.makedirs(archive_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    if fmt == "parquet":
+        path = os.path.join(archive_dir, f"threads-{stamp}.parquet")
+        _write_parquet(path, records)
+    else:
+        path = os.path.join(archive_dir, f"threads-{stamp}.jsonl.gz")
+        _write_jsonl(path, records)
+    return path
+
+# Tables of langgraph-checkpoint-postgres (see AsyncPostgresSaver.adelete_thread)
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+
+async def _has_checkpoint_tables() -> bool:
+    async with engine.connect() as conn:
+        return await conn.scalar(text("SELECT to_regclass('checkpoints') IS NOT NULL"))
+
+async def _delete_batch(db: AsyncSession, ids: List[str], checkpoints: bool = False):
+    message_ids = select(Message.id).where(Message.thread_id.in_(ids))
+    await db.execute(delete(MsgEmbedding).where(MsgEmbedding.msg_id.in_(message_ids)))
+    await db.execute(delete(Message).where(Message.thread_id.in_(ids)))
+    await db.execute(delete(Lead).where(Lead.thread_id.in_(ids)))
+    await db.execute(delete(Thread).where(Thread.id.in_(ids)))
+    if checkpoints:
+        for table in CHECKPOINT_TABLES:
+            stmt = text(f"DELETE FROM {table} WHERE thread_id IN :ids")
+            await db.execute(stmt.bindparams(bindparam("ids", expanding=True)), {"ids": ids})
+    await db.commit()
+
+async def _forget_thread_state(ids: List[str]):
+    """Drop the Redis state of deleted threads so none of it outlives their rows."""
+    await forget_windows(ids)
+    await forget_thread_leads(ids)
+    await forget_versions(ids)
+
+async def ensure_partitions(months_ahead: int):
+    """Create the current and next `months_ahead` monthly partitions of messages (Postgres)."""
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "SELECT create_messages_partition(month::date) FROM generate_series("
+                "date_trunc('month', now()), date_trunc('month', now()) + make_interval(months => :n), "
+                "interval '1 month') AS month"
+            ),
+            {"n": months_ahead},
+        )
+
+async def drop_empty_partitions(cutoff: datetime) -> List[str]:
+    """Drop monthly partitions that end before the cutoff and hold no rows."""
+    dropped = []
+    async with engine.begin() as conn:
+        names = (
+            await conn.scalars(
+                text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = 'messages'::regclass AND c.relname ~ '^messages_p[0-9]{6}$' "
+                    "ORDER BY c.relname"
+                )
+            )
+        ).all()
+        for name in names:
+            month_end = datetime.strptime(name[-6:], "%Y%m").replace(tzinfo=timezone.utc)
+            month_end = (month_end + timedelta(days=32)).replace(day=1)
+            if month_end > cutoff:
+                break
+            if (await conn.scalar(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")'))):
+                continue
+            await conn.execute(text(f'ALTER TABLE messages DETACH PARTITION "{name}"'))
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
+
+async def run_retention(
+    idle_days: int, batch_size: int, archive_dir: str, fmt: str, dry_run: bool = False
+) -> Dict[str, Any]:
+    """Archive and delete idle threads batch by batch; returns counts for the run."""
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            log.warning("pyarrow is not installed; archiving as gzip JSONL instead")
+            fmt = "jsonl"
+    cutoff = datetime.now(timezone.utc) - timedelta(days=idle_days)
+    postgres = engine.dialect.name == "postgresql"
+    report = {"threads": 0, "messages": 0, "leads": 0, "files": [], "dropped_partitions": []}
+    checkpoints = postgres and await _has_checkpoint_tables()
+    if postgres and not dry_run:
+        await ensure_partitions(settings.partition_months_ahead)
+
+    while True:
+        async with SessionLocal() as db:
+            records = await _load_batch(db, cutoff, batch_size)
+            if not records:
+                break
+            report["threads"] += len(records)
+            report["messages"] += sum(len(r["messages"]) for r in records)
+            report["leads"] += sum(len(r["leads"]) for r in records)
+            if dry_run:
+                break
+            report["files"].append(archive_batch(records, archive_dir, fmt))
+            ids = [r["thread_id"] for r in records]
+            await _delete_batch(db, ids, checkpoints)
+            await _forget_thread_state(ids)
+            log.info(f"Archived and deleted {len(records)} idle threads")
+
+    if postgres and not dry_run:
+        report["dropped_partitions"] = await drop_empty_partitions(cutoff)
+    return report
+
+async def main(args):
+    try:
+        return await run_retention(
+            args.idle_days, args.batch_size, args.archive_dir, args.format, args.dry_run
+        )
+    finally:
+        await engine.dispose()
+        await close_redis()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--idle-days", type=int, default=settings.retention_idle_days)
+    parser.add_argument("--batch-size", type=int, default=settings.retention_batch_size)
+    parser.add_argument("--archive-dir", default=settings.retention_archive_dir)
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=settings.retention_format)
+    parser.add_argument("--dry-run", action="store_true", help="count the first batch only")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,87 @@
+import asyncio, logging
+from datetime import datetime
+from typing import List, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from .repository import Turn, persist_turns
+
+log = logging.getLogger("write_behind")
+
+class TurnWriter:
+    """Write-behind queue that group-commits turns from concurrent requests.
+
+    Each submit() waits for the batch containing its turn to be flushed, so callers
+    still get real message ids, but N concurrent turns share one transaction and
+    one multi-row INSERT per table instead of N. If a batch fails, its turns are retried
+    one at a time, so only the caller whose turn cannot be written sees the error.
+    """
+
+    def __init__(
+        self, session_factory: async_sessionmaker, max_batch: int = 100, max_delay: float = 0.01
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything already queued, then stop the flusher."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, turn: Turn) -> Tuple[int, datetime]:
+        if self._task is None:
+            raise RuntimeError("TurnWriter is not running")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((turn, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                try:
+                    if timeout <= 0:
+                        item = self._queue.get_nowait()
+                    else:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]):
+        try:
+            async with self.session_factory() as db:
+                results = await persist_turns(db, [turn for turn, _ in batch])
+        except Exception as e:
+            log.error(f"Write-behind flush of {len(batch)} turns failed: {str(e)}")
+            if len(batch) > 1:
+                # The transaction rolled back; retry turn by turn so only the bad one fails
+                for item in batch:
+                    await self._flush([item])
+                return
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,277 @@
+import asyncio, hashlib, logging, math, re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Protocol
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from .ghl import get_http_client
+from ..config.settings import settings
+from ..db.database import SessionLocal
+from ..db.models import Message, MsgEmbedding, Thread
+from ..db.repository import insert_ignore, thread_messages
+
+log = logging.getLogger("embeddings")
+
+EMBEDDING_DIM = 1536  # matches MsgEmbedding.embedding
+
+class Embedder(Protocol):
+    name: str
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        ...
+
+_TOKEN_RE = re.compile(r"\w+")
+
+class HashingEmbedder:
+    """Deterministic local embedder (feature-hashed word unigrams/bigrams, L2-normalised).
+
+    No network or model download; good enough for tests, benchmarks and near-duplicate
+    matching, not for real semantic recall.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed_one(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        tokens = _TOKEN_RE.findall(text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+class OpenAIEmbedder:
+    """OpenAI embeddings API over the shared pooled HTTP client."""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small"):
+        self.api_key = api_key
+        self.model = model
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        res = await get_http_client().post(
+            "https://api.openai.com/v1/embeddings",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model, "input": texts, "dimensions": EMBEDDING_DIM},
+        )
+        res.raise_for_status()
+        data = sorted(res.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+_embedder: Embedder | None = None
+
+def get_embedder() -> Embedder | None:
+    """The configured embedder (EMBEDDER=hashing|openai), or None when disabled."""
+    global _embedder
+    if _embedder is None:
+        if settings.embedder == "hashing":
+            _embedder = HashingEmbedder()
+        elif settings.embedder == "openai" and settings.openai_api_key:
+            _embedder = OpenAIEmbedder(settings.openai_api_key, settings.openai_embedding_model)
+    return _embedder
+
+def is_transient(error: Exception) -> bool:
+    """Network errors, 429 and 5xx are worth retrying; anything else rejected the input."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+class EmbeddingPipeline:
+    """Background worker that embeds new messages into msg_embeddings in batches.
+
+    Runs off the request path: it polls for messages that have no embedding yet, embeds
+    a batch and bulk-inserts it. The first poll scans the whole table. After that, polls
+    only look at messages created since the oldest unembedded one seen, less
+    EMBEDDING_LOOKBACK_SECONDS. That window covers messages whose id was handed out
+    before a later one but committed after it, and on Postgres it prunes old partitions.
+    On Postgres the batch is claimed with FOR UPDATE SKIP LOCKED, so pipelines running
+    in several workers embed disjoint batches.
+
+    A batch that fails transiently (network, 429, 5xx) is retried on the next poll. A
+    batch the embedder rejects is retried message by message. A message rejected
+    EMBEDDING_MAX_ATTEMPTS times gets a NULL embedding, which takes it out of the queue
+    and out of recall.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        session_factory: async_sessionmaker = SessionLocal,
+        batch_size: int = 64,
+        interval: float = 5.0,
+    ):
+        self.embedder = embedder
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self._since: datetime | None = None
+        self._rejections: Dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> int:
+        """Embed one batch; returns the number of messages taken off the queue."""
+        lookback = timedelta(seconds=settings.embedding_lookback_seconds)
+        async with self.session_factory() as db:
+            query = (
+                select(Message.id, Message.content, Message.created_at)
+                .outerjoin(MsgEmbedding, MsgEmbedding.msg_id == Message.id)
+                .where(MsgEmbedding.msg_id.is_(None))
+            )
+            if self._since is not None:
+                query = query.where(Message.created_at >= self._since)
+            polled_at = datetime.now(timezone.utc)
+            rows = (
+                await db.execute(
+                    query.order_by(Message.id)
+                    .limit(self.batch_size)
+                    # Held until the commit; other workers skip to the next batch
+                    .with_for_update(of=Message, skip_locked=True)
+                )
+            ).all()
+            if not rows:
+                self._since = polled_at - lookback
+                return 0
+            since = min(_utc(row.created_at) for row in rows) - lookback
+            self._since = since if self._since is None else max(self._since, since)
+            embeddings = await self._embed(rows)
+            if embeddings:
+                await db.execute(insert_ignore(db, MsgEmbedding), embeddings)
+                await db.commit()
+        return len(embeddings)
+
+    async def _embed(self, rows) -> List[Dict[str, Any]]:
+        """msg_embeddings rows for a batch; a rejected batch is retried one message at a time."""
+        texts = [row.content[: settings.embedding_max_chars] for row in rows]
+        try:
+            vectors = await self.embedder.embed(texts)
+        except Exception as e:
+            if is_transient(e):
+                raise
+            log.warning(f"Embedding batch of {len(rows)} rejected, retrying one by one: {str(e)}")
+        else:
+            return [{"msg_id": row.id, "embedding": vec} for row, vec in zip(rows, vectors)]
+        embeddings = []
+        for row, text in zip(rows, texts):
+            try:
+                vector = (await self.embedder.embed([text]))[0]
+            except Exception as e:
+                if is_transient(e):
+                    break
+                if not self._reject(row.id, e):
+                    continue
+                vector = None
+            embeddings.append({"msg_id": row.id, "embedding": vector})
+        return embeddings
+
+    def _reject(self, msg_id: int, error: Exception) -> bool:
+        """Count a rejection; True once the message should be skipped for good."""
+        attempts = self._rejections.get(msg_id, 0) + 1
+        if attempts < settings.embedding_max_attempts:
+            self._rejections[msg_id] = attempts
+            log.warning(f"Embedder rejected message {msg_id} (attempt {attempts}): {str(error)}")
+            return False
+        self._rejections.pop(msg_id, None)
+        log.error(f"Skipping message {msg_id} after {attempts} rejected embeddings: {str(error)}")
+        return True
+
+    async def run_forever(self):
+        while True:
+            try:
+                embedded = await self.run_once()
+            except Exception as e:
+                log.error(f"Embedding batch failed: {str(e)}")
+                embedded = 0
+            if embedded < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+def _utc(value: datetime) -> datetime:
+    # SQLite returns naive timestamps; they are stored in UTC
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _cosine_distance(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return 1 - dot / norm if norm else 1.0
+
+async def recall(
+    query: str,
+    k: int = 5,
+    thread_id: str | None = None,
+    user_id: str | None = None,
+    embedder: Embedder | None = None,
+) -> List[Dict[str, Any]]:
+    """Past messages most similar to `query`, optionally scoped to a thread or user.
+
+    Uses the pgvector cosine operator (served by the HNSW index) on Postgres; other
+    dialects (local stand-ins) rank candidates in Python.
+    """
+    embedder = embedder or get_embedder()
+    if embedder is None:
+        return []
+    vector = (await embedder.embed([query]))[0]
+    distance = MsgEmbedding.embedding.cosine_distance(vector)
+    stmt = (
+        select(Message.id, Message.thread_id, Message.role, Message.content)
+        .join(MsgEmbedding, MsgEmbedding.msg_id == Message.id)
+        .where(MsgEmbedding.embedding.is_not(None))
+    )
+    if thread_id is not None:
+        stmt = stmt.where(*thread_messages(thread_id))
+    if user_id is not None:
+        stmt = stmt.join(Thread, Thread.id == Message.thread_id).where(Thread.user_id == user_id)
+
+    async with SessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            stmt = stmt.add_columns(distance.label("distance")).order_by(distance).limit(k)
+            rows = (await db.execute(stmt)).all()
+            scored = [(row, row.distance) for row in rows]
+        else:
+            rows = (await db.execute(stmt.add_columns(MsgEmbedding.embedding))).all()
+            scored = sorted(
+                ((row, _cosine_distance(vector, list(row.embedding))) for row in rows),
+                key=lambda item: item[1],
+            )[:k]
+    return [
+        {
+            "id": row.id,
+            "thread_id": row.thread_id,
+            "role": row.role,
+            "content": row.content,
+            "score": round(float(1 - dist), 4),
+        }
+        for row, dist in scored
+    ]
+
+if __name__ == "__main__":
+    # Run the pipeline as its own process: python -m backend.services.embeddings
+    logging.basicConfig(level=logging.INFO)
+    embedder = get_embedder()
+    if embedder is None:
+        raise SystemExit("Set EMBEDDER=hashing or EMBEDDER=openai (with OPENAI_API_KEY)")
+    pipeline = EmbeddingPipeline(
+        embedder,
+        batch_size=settings.embedding_batch_size,
+        interval=settings.embedding_poll_interval,
+    )
+    asyncio.run(pipeline.run_forever())
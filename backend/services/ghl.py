@@ -2,13 +2,36 @@ import json, httpx, os
 from .redis_cache import cache_setex
 from ..config.settings import settings
 
+_client: httpx.AsyncClient | None = None
+
+def init_http_client() -> httpx.AsyncClient:
+    """Create the process-wide pooled client (called from the FastAPI lifespan)."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=settings.http_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+            ),
+        )
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    return _client or init_http_client()
+
 async def forward_lead_webhook(lead: dict) -> dict:
     """Primary path: post to GHL Inbound Webhook."""
     if not settings.ghl_webhook_url:
         return {"status": "skipped", "reason": "no_webhook"}
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(settings.ghl_webhook_url, json=lead)
-        return {"status": "ok", "code": r.status_code}
+    r = await get_http_client().post(settings.ghl_webhook_url, json=lead)
+    return {"status": "ok", "code": r.status_code}
 
 async def upsert_contact_rest(lead: dict) -> dict:
     """Optional REST path if API key is provided."""
@@ -28,22 +51,23 @@ async def upsert_contact_rest(lead: dict) -> dict:
         "country": "US",
         "customField": [{"id":"intent","value": lead.get("intent","")}],
     }
-    async with httpx.AsyncClient(timeout=10, base_url=settings.ghl_api_base, headers=headers) as client:
-        res = await client.post("/contacts/", json=payload)
-        if settings.ghl_location_id and settings.ghl_pipeline_id and settings.ghl_stage_id:
-            try:
-                data = res.json()
-                contact_id = data.get("contact", {}).get("id")
-                if contact_id:
-                    opp = {
-                        "name": f"Brax Lead - {lead.get('intent','general')}",
-                        "contactId": contact_id,
-                        "locationId": settings.ghl_location_id,
-                        "pipelineId": settings.ghl_pipeline_id,
-                        "pipelineStageId": settings.ghl_stage_id,
-                        "status": "open",
-                    }
-                    await client.post("/opportunities/", json=opp)
-            except Exception:
-                pass
-        return {"status": "ok", "code": res.status_code}
\ No newline at end of file
+    client = get_http_client()
+    base = settings.ghl_api_base.rstrip("/")
+    res = await client.post(f"{base}/contacts/", json=payload, headers=headers)
+    if res.is_success and settings.ghl_location_id and settings.ghl_pipeline_id and settings.ghl_stage_id:
+        try:
+            data = res.json()
+            contact_id = data.get("contact", {}).get("id")
+            if contact_id:
+                opp = {
+                    "name": f"Brax Lead - {lead.get('intent','general')}",
+                    "contactId": contact_id,
+                    "locationId": settings.ghl_location_id,
+                    "pipelineId": settings.ghl_pipeline_id,
+                    "pipelineStageId": settings.ghl_stage_id,
+                    "status": "open",
+                }
+                await client.post(f"{base}/opportunities/", json=opp, headers=headers)
+        except Exception:
+            pass
+    return {"status": "ok", "code": res.status_code}
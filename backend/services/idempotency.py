@@ -0,0 +1,102 @@
+"""Idempotent /chat turns: retries return the in-flight or completed response.
+
+Keys are scoped by user and thread, and each completed response is stored with a hash
+of the request that produced it: a key reused with a different request raises
+IdempotencyConflict instead of replaying someone else's answer. Completed responses are
+kept in Redis for IDEMPOTENCY_TTL seconds; concurrent duplicates in this worker await
+the first request's future. Duplicates on other workers queue on the thread lock and
+find the completed response once they get it.
+"""
+import asyncio, hashlib, logging
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type, TypeVar
+from prometheus_client import Counter
+from pydantic import BaseModel
+from .redis_cache import cache_get, cache_setex
+from .thread_locks import thread_lock
+from ..config.settings import settings
+from ..core import codec
+
+log = logging.getLogger("idempotency")
+
+COALESCED = Counter(
+    "brax_chat_coalesced_total", "Duplicate /chat requests answered without re-running", ["kind"]
+)
+
+T = TypeVar("T", bound=BaseModel)
+
+_inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+class IdempotencyConflict(Exception):
+    """The idempotency key was already used for a different request."""
+
+def scoped_key(idempotency_key: str, user_id: str | None, thread_id: str | None) -> str:
+    return f"{user_id or 'anonymous'}:{thread_id or 'new'}:{idempotency_key}"
+
+def request_hash(request: Dict[str, Any]) -> str:
+    """Digest of the request fields a replayed response must match."""
+    return hashlib.sha256(codec.dumpb(request)).hexdigest()
+
+def _redis_key(key: str) -> str:
+    return "idem:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+async def get_completed(key: str, request: str, model: Type[T]) -> T | None:
+    """The response stored for `key`; IdempotencyConflict if it answered another request."""
+    raw = await cache_get(_redis_key(key))
+    if not raw:
+        return None
+    stored = codec.loads(raw)
+    if stored["request"] != request:
+        raise IdempotencyConflict()
+    return model.model_validate(stored["response"])
+
+async def store_completed(key: str, request: str, response: BaseModel):
+    value = codec.dumps({"request": request, "response": response.model_dump(mode="json")})
+    await cache_setex(_redis_key(key), settings.idempotency_ttl, value)
+
+async def run_turn(
+    key: str | None,
+    request: str,
+    lock_name: str,
+    model: Type[T],
+    run: Callable[[], Awaitable[T]],
+) -> T:
+    """Run a turn under the thread lock, at most once per idempotency key."""
+    if not key:
+        async with thread_lock(lock_name):
+            return await run()
+
+    completed = await get_completed(key, request, model)
+    if completed:
+        COALESCED.labels("completed").inc()
+        return completed
+    if key in _inflight:
+        inflight_request, inflight = _inflight[key]
+        if inflight_request != request:
+            raise IdempotencyConflict()
+        COALESCED.labels("inflight").inc()
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = (request, future)
+    try:
+        async with thread_lock(lock_name):
+            # Another worker may have finished this key while we waited for the lock
+            result = await get_completed(key, request, model)
+            if result:
+                COALESCED.labels("after_lock").inc()
+            else:
+                result = await run()
+                await store_completed(key, request, result)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        if not future.done():
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark retrieved so a failure nobody else awaited is not reported as unhandled
+                future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
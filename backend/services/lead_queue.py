@@ -0,0 +1,279 @@
+"""Durable outbound queue for forwarding leads to GoHighLevel.
+
+Leads are enqueued in Redis, and a background worker sends them in batches over the
+pooled HTTP client. Failures are retried with exponential backoff. Queued leads
+are deduplicated by thread/email so only the newest payload is sent. Layout:
+
+    leads:pending             hash  dedupe key -> newest job JSON
+    leads:outbound            list  dedupe keys ready to send (LPUSH / LMOVE)
+    leads:retry               zset  dedupe keys scored by next attempt time
+    leads:processing:<worker> list  dedupe keys a worker has claimed and not yet acked
+    leads:workers             zset  worker ids scored by their last heartbeat
+    leads:dead                list  jobs that exhausted their attempts
+
+A claim moves keys into the worker's processing list; the payload stays in leads:pending
+until the delivery is acked (sent, scheduled for retry or dead-lettered). Keys claimed
+by a worker that stopped, or stopped checking in, go back to leads:outbound.
+"""
+import asyncio, logging, os, random, socket, time, uuid
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from .ghl import forward_lead_webhook, upsert_contact_rest
+from .redis_cache import redis_call
+from ..config.settings import settings
+from ..core import codec
+from ..core.tracing import current_trace_id, set_trace_id, span
+
+log = logging.getLogger("lead_queue")
+
+PENDING_KEY = "leads:pending"
+OUTBOUND_KEY = "leads:outbound"
+RETRY_KEY = "leads:retry"
+WORKERS_KEY = "leads:workers"
+DEAD_KEY = "leads:dead"
+
+# KEYS: outbound, retry, processing; ARGV: batch size, now.
+# Moves due retries, then ready keys, into the processing list; returns the keys.
+_CLAIM = """
+local limit = tonumber(ARGV[1])
+local claimed = {}
+for _, key in ipairs(redis.call("ZRANGEBYSCORE", KEYS[2], "-inf", ARGV[2], "LIMIT", 0, limit)) do
+    redis.call("ZREM", KEYS[2], key)
+    redis.call("LPUSH", KEYS[3], key)
+    claimed[#claimed + 1] = key
+end
+while #claimed < limit do
+    local key = redis.call("LMOVE", KEYS[1], KEYS[3], "RIGHT", "LEFT")
+    if not key then
+        break
+    end
+    claimed[#claimed + 1] = key
+end
+return claimed
+"""
+
+# KEYS: pending, processing, outbound, retry, dead
+# ARGV: dedupe key, claimed payload, outcome (done|retry|dead), job JSON, retry time.
+# Drops the claim; the payload is deleted (or replaced for a retry) only if no newer one
+# was enqueued meanwhile, in which case the key is queued again instead.
+_ACK = """
+redis.call("LREM", KEYS[2], 1, ARGV[1])
+local current = redis.call("HGET", KEYS[1], ARGV[1])
+if current ~= ARGV[2] then
+    if current then
+        redis.call("LPUSH", KEYS[3], ARGV[1])
+    end
+    return 0
+end
+if ARGV[3] == "retry" then
+    redis.call("HSET", KEYS[1], ARGV[1], ARGV[4])
+    redis.call("ZADD", KEYS[4], ARGV[5], ARGV[1])
+else
+    redis.call("HDEL", KEYS[1], ARGV[1])
+    if ARGV[3] == "dead" then
+        redis.call("LPUSH", KEYS[5], ARGV[4])
+    end
+end
+return 1
+"""
+
+# KEYS: processing, outbound, workers; ARGV: worker id.
+# Puts a worker's unacked claims back at the sending end of the outbound list.
+_REQUEUE = """
+local moved = 0
+while redis.call("LMOVE", KEYS[1], KEYS[2], "LEFT", "RIGHT") do
+    moved = moved + 1
+end
+redis.call("ZREM", KEYS[3], ARGV[1])
+return moved
+"""
+
+def _processing_key(worker_id: str) -> str:
+    return f"leads:processing:{worker_id}"
+
+class RetryableError(Exception):
+    pass
+
+def _dedupe_key(lead: Dict[str, Any], thread_id: str) -> str:
+    return f"{thread_id}:{(lead.get('email') or '').strip().lower()}"
+
+def _backoff(attempt: int) -> float:
+    delay = min(settings.lead_queue_backoff_max, settings.lead_queue_backoff_base * 2 ** attempt)
+    return delay * random.uniform(0.8, 1.2)
+
+async def forward_to_ghl(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one job to each configured GHL channel it has not yet reached.
+
+    Channels that succeed are recorded in job["done"] so a retry does not repeat them.
+    Raises RetryableError on network errors, 429 and 5xx responses.
+    """
+    lead = job["lead"]
+    done = job.setdefault("done", [])
+    channels = [("webhook", forward_lead_webhook)]
+    if settings.ghl_api_key:
+        channels.append(("rest", upsert_contact_rest))
+    failed = []
+    for name, send in channels:
+        if name in done:
+            continue
+        try:
+            result = await send(lead)
+        except Exception as e:
+            failed.append(f"{name}: {str(e) or type(e).__name__}")
+            continue
+        code = result.get("code", 200)
+        if code == 429 or code >= 500:
+            failed.append(f"{name}: HTTP {code}")
+            continue
+        log.info(f"GHL {name} result for thread {job['thread_id']}: {result}")
+        done.append(name)
+    if failed:
+        raise RetryableError("; ".join(failed))
+    return job
+
+class LeadQueue:
+    """Redis-backed lead queue plus its background delivery worker."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._processing = _processing_key(self.worker_id)
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._heartbeat_at = 0.0
+        # Used only when Redis is unreachable at enqueue time
+        self._local: set[asyncio.Task] = set()
+
+    async def enqueue(self, lead_data: Dict[str, Any], thread_id: str):
+        """Queue a committed lead for delivery."""
+        job = {
+            "key": _dedupe_key(lead_data, thread_id),
+            "thread_id": thread_id,
+            "trace_id": current_trace_id(),
+            "attempt": 0,
+            "lead": {
+                **lead_data,
+                "source": "Brax AI Concierge",
+                "thread_id": thread_id,
+                "timestamp": datetime.utcnow().isoformat(),
+            },
+        }
+        async def op(r):
+            # A key already queued or in flight just gets the newer payload; one waiting
+            # on backoff is sent again right away
+            if await r.hset(PENDING_KEY, job["key"], codec.dumps(job)) or await r.zrem(
+                RETRY_KEY, job["key"]
+            ):
+                await r.lpush(OUTBOUND_KEY, job["key"])
+            return True
+
+        if not await redis_call(op, default=False):
+            if settings.redis_url:
+                log.warning("Lead queue unavailable, sending directly")
+            task = asyncio.create_task(self._deliver(job, durable=False))
+            self._local.add(task)
+            task.add_done_callback(self._local.discard)
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._heartbeat_at = 0.0
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float | None = None):
+        """Stop taking new work, drain what is ready to send, then exit.
+
+        Deliveries still running after the timeout are cancelled and their leads put back
+        on the queue; jobs waiting on backoff stay in Redis for the next worker.
+        """
+        self._stopping = True
+        timeout = settings.lead_queue_drain_timeout if timeout is None else timeout
+        pending = [t for t in [self._task, *self._local] if t]
+        if pending:
+            _, not_done = await asyncio.wait(pending, timeout=timeout)
+            for task in not_done:
+                task.cancel()
+            if not_done:
+                await asyncio.wait(not_done)
+        self._task = None
+        requeued = await redis_call(
+            lambda r: r.eval(_REQUEUE, 3, self._processing, OUTBOUND_KEY, WORKERS_KEY, self.worker_id)
+        )
+        if requeued:
+            log.warning(f"Requeued {requeued} lead deliveries cut short by shutdown")
+
+    async def _run(self):
+        while True:
+            if time.monotonic() - self._heartbeat_at >= settings.lead_queue_worker_timeout / 6:
+                await redis_call(self._heartbeat)
+                self._heartbeat_at = time.monotonic()
+            claims = await redis_call(self._claim, default=[])
+            if claims:
+                await asyncio.gather(*(self._deliver(job, raw=raw) for raw, job in claims))
+                continue
+            if self._stopping:
+                return
+            await asyncio.sleep(settings.lead_queue_poll_interval)
+
+    async def _heartbeat(self, r):
+        """Check in, and requeue the claims of workers that stopped checking in."""
+        now = time.time()
+        await r.zadd(WORKERS_KEY, {self.worker_id: now})
+        stale = await r.zrangebyscore(WORKERS_KEY, "-inf", now - settings.lead_queue_worker_timeout)
+        for worker_id in stale:
+            moved = await r.eval(
+                _REQUEUE, 3, _processing_key(worker_id), OUTBOUND_KEY, WORKERS_KEY, worker_id
+            )
+            log.warning(f"Requeued {moved} leads claimed by unresponsive worker {worker_id}")
+
+    async def _claim(self, r) -> List[Tuple[str, Dict[str, Any]]]:
+        """(payload, job) for claimed keys; the payloads stay in leads:pending until acked."""
+        keys = await r.eval(
+            _CLAIM, 3, OUTBOUND_KEY, RETRY_KEY, self._processing,
+            settings.lead_queue_batch_size, time.time(),
+        )
+        if not keys:
+            return []
+        claims = []
+        for key, raw in zip(keys, await r.hmget(PENDING_KEY, keys)):
+            if raw:
+                claims.append((raw, codec.loads(raw)))
+            else:
+                await self._ack(r, key, "", "done")
+        return claims
+
+    async def _ack(self, r, key: str, raw: str, outcome: str, job: str = "", retry_at: float = 0):
+        keys = (PENDING_KEY, self._processing, OUTBOUND_KEY, RETRY_KEY, DEAD_KEY)
+        return await r.eval(_ACK, len(keys), *keys, key, raw, outcome, job, retry_at)
+
+    async def _deliver(self, job: Dict[str, Any], durable: bool = True, raw: str | None = None):
+        set_trace_id(job.get("trace_id"))
+        try:
+            with span("ghl.forward", attempt=job["attempt"]):
+                await forward_to_ghl(job)
+            outcome, error = "done", None
+        except RetryableError as e:
+            outcome, error = "retry", str(e)
+        except Exception as e:
+            log.error(f"GHL forwarding error: {str(e)}")
+            outcome, error = "done", None
+        retry_at = 0.0
+        if outcome == "retry":
+            job["attempt"] += 1
+            if not durable:
+                log.error(f"GHL forwarding failed for thread {job['thread_id']}: {error}")
+                return
+            if job["attempt"] >= settings.lead_queue_max_attempts:
+                log.error(f"Lead for thread {job['thread_id']} dead-lettered: {error}")
+                outcome = "dead"
+            else:
+                delay = _backoff(job["attempt"])
+                log.warning(f"Retrying lead for thread {job['thread_id']} in {delay:.1f}s: {error}")
+                retry_at = time.time() + delay
+        if not durable:
+            return
+        ok = await redis_call(lambda r: self._ack(r, job["key"], raw, outcome, codec.dumps(job), retry_at))
+        if ok is None:
+            # Still claimed: requeued when this worker stops or is seen as unresponsive
+            log.error(f"Could not ack lead for thread {job['thread_id']}")
+
+lead_queue = LeadQueue()
@@ -0,0 +1,67 @@
+"""Per-thread merged lead, used to persist and forward a lead only when it changes.
+
+The agent repeats its lead block on most turns, usually with the same or fewer fields.
+Each thread's merged lead (newest non-empty value per field) is kept in Redis for
+LEAD_STATE_TTL seconds, with a bounded in-process copy for when Redis is unavailable.
+Turns on a thread are serialized by the thread lock, so read-merge-write is safe.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List
+from prometheus_client import Counter
+from .redis_cache import cache_get, cache_setex, redis_call
+from ..config.settings import settings
+from ..core import codec
+from ..core.lead_parser import normalize_lead
+
+log = logging.getLogger("lead_state")
+
+LOCAL_MAX_THREADS = 10000
+
+LEAD_EVENTS = Counter("brax_lead_events_total", "Parsed lead blocks by outcome", ["result"])
+
+_local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def _key(thread_id: str) -> str:
+    return f"thread:{thread_id}:lead"
+
+def merge_leads(previous: Dict[str, Any] | None, lead: Dict[str, Any]) -> Dict[str, Any]:
+    """Newest value per field; fields missing from `lead` keep their previous value."""
+    return {**(previous or {}), **lead}
+
+async def load_thread_lead(thread_id: str) -> Dict[str, Any] | None:
+    raw = await cache_get(_key(thread_id))
+    if raw:
+        return codec.loads(raw)
+    return _local.get(thread_id)
+
+async def save_thread_lead(thread_id: str, lead: Dict[str, Any]):
+    _local[thread_id] = lead
+    _local.move_to_end(thread_id)
+    while len(_local) > LOCAL_MAX_THREADS:
+        _local.popitem(last=False)
+    await cache_setex(_key(thread_id), settings.lead_state_ttl, codec.dumps(lead))
+
+async def merge_thread_lead(thread_id: str, lead: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    """The thread's merged lead if this turn's (normalized) lead changes it, else None.
+
+    The caller saves the result with save_thread_lead once the turn is committed.
+    """
+    if not lead:
+        LEAD_EVENTS.labels("empty").inc()
+        return None
+    # Re-validated, so placeholder values saved by older releases are not carried forward
+    previous = normalize_lead(await load_thread_lead(thread_id))
+    merged = merge_leads(previous, lead)
+    if merged == previous:
+        LEAD_EVENTS.labels("unchanged").inc()
+        return None
+    LEAD_EVENTS.labels("changed").inc()
+    return merged
+
+async def forget_thread_leads(thread_ids: List[str]):
+    """Drop the merged leads of deleted threads."""
+    for thread_id in thread_ids:
+        _local.pop(thread_id, None)
+    if thread_ids:
+        await redis_call(lambda r: r.delete(*[_key(t) for t in thread_ids]))
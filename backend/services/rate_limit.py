@@ -0,0 +1,174 @@
+"""Admission control for chat turns: Redis token buckets and a per-worker concurrency gate.
+
+Token buckets (per client IP and per user_id, plus a per-IP bucket for /chat/batch threads)
+live in Redis and are checked and charged atomically by one Lua script, so limits hold
+across workers. If Redis is unavailable the
+buckets fail open. The concurrency gate bounds turns running in this worker; callers
+beyond it wait in a bounded queue for up to ADMISSION_QUEUE_TIMEOUT, and anything past
+the queue is shed immediately with 503.
+"""
+import asyncio, logging, time
+from contextlib import asynccontextmanager
+from typing import List, Tuple
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+from .redis_cache import redis_call
+from ..config.settings import settings
+
+log = logging.getLogger("rate_limit")
+
+LIMIT_DECISIONS = Counter(
+    "brax_rate_limit_total", "Admission decisions by limit and result", ["limit", "result"]
+)
+ADMISSION_QUEUED = Gauge(
+    "brax_admission_queued", "Chat turns waiting for a concurrency slot", multiprocess_mode="livesum"
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "brax_admission_wait_seconds", "Time spent waiting for a concurrency slot"
+)
+
+# KEYS: bucket keys; ARGV: cost, then (tokens per ms, burst) per key.
+# Charges every bucket only if all of them have `cost` tokens; returns {blocked index, wait ms}.
+_TOKEN_BUCKET = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local tokens = {}
+local blocked, wait = 0, 0
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local state = redis.call("HMGET", key, "tokens", "ts")
+    local level = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    level = math.min(burst, level + math.max(0, now - ts) * rate)
+    tokens[i] = level
+    if level < cost then
+        local needed = math.ceil((cost - level) / rate)
+        if needed > wait then
+            blocked, wait = i, needed
+        end
+    end
+end
+if blocked == 0 then
+    for i, key in ipairs(KEYS) do
+        local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+        redis.call("HSET", key, "tokens", tokens[i] - cost, "ts", now)
+        redis.call("PEXPIRE", key, math.ceil(burst / rate) + 1000)
+    end
+end
+return {blocked, wait}
+"""
+
+class RateLimited(HTTPException):
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=429,
+            detail="Too many messages, please slow down",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+class Overloaded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503, detail="Server is busy, please retry", headers={"Retry-After": "1"}
+        )
+
+_token_bucket = None
+
+def _token_bucket_script(client):
+    """The Script (SHA computed once; EVALSHA, loading it on NOSCRIPT) for the bucket Lua."""
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = client.register_script(_TOKEN_BUCKET)
+    return _token_bucket
+
+async def check_rate_limits(ip: str | None, user_id: str | None):
+    """Charge the IP and user buckets one token; raise RateLimited if either is empty."""
+    if not settings.rate_limit_enabled:
+        return
+    buckets: List[Tuple[str, str, int, int]] = []
+    if ip and settings.rate_limit_ip_per_minute:
+        buckets.append(("ip", ip, settings.rate_limit_ip_per_minute, settings.rate_limit_ip_burst))
+    if user_id and settings.rate_limit_user_per_minute:
+        buckets.append(
+            ("user", user_id, settings.rate_limit_user_per_minute, settings.rate_limit_user_burst)
+        )
+    await _charge(buckets, 1)
+
+async def check_batch_rate_limit(ip: str | None, threads: int):
+    """Charge the IP's batch bucket one token per thread; 413 if the burst can never cover it."""
+    per_minute, burst = settings.rate_limit_batch_per_minute, settings.rate_limit_batch_burst
+    if not settings.rate_limit_enabled or not ip or not per_minute or not threads:
+        return
+    if threads > burst:
+        LIMIT_DECISIONS.labels("batch", "limited").inc()
+        raise HTTPException(
+            status_code=413, detail=f"At most {burst} threads per batch under the rate limit"
+        )
+    await _charge([("batch", ip, per_minute, burst)], threads)
+
+async def _charge(buckets: List[Tuple[str, str, int, int]], cost: int):
+    if not buckets:
+        return
+    keys = [f"rl:{name}:{ident}" for name, ident, _, _ in buckets]
+    args = [cost]
+    for _, _, per_minute, burst in buckets:
+        args += [per_minute / 60000, burst]
+    result = await redis_call(
+        lambda r: _token_bucket_script(r)(keys=keys, args=args, client=r)
+    )
+    if result is None:
+        for name, *_ in buckets:
+            LIMIT_DECISIONS.labels(name, "unavailable").inc()
+        return
+
+    blocked, wait_ms = int(result[0]), int(result[1])
+    for i, (name, *_) in enumerate(buckets, 1):
+        LIMIT_DECISIONS.labels(name, "limited" if i == blocked else "allowed").inc()
+    if blocked:
+        raise RateLimited(wait_ms / 1000)
+
+class AdmissionGate:
+    """At most `limit` turns at once in this worker; at most `max_queue` waiting for a slot."""
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self.limit:
+            yield
+            return
+        if not self._slots.locked():
+            # A free slot is taken without suspending, so the check above stays accurate
+            await self._slots.acquire()
+            ADMISSION_WAIT_SECONDS.observe(0)
+        elif self.waiting >= self.max_queue:
+            LIMIT_DECISIONS.labels("concurrency", "shed").inc()
+            raise Overloaded()
+        else:
+            start = time.perf_counter()
+            self.waiting += 1
+            ADMISSION_QUEUED.inc()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                LIMIT_DECISIONS.labels("concurrency", "timeout").inc()
+                raise Overloaded()
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUED.dec()
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+        LIMIT_DECISIONS.labels("concurrency", "allowed").inc()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+admission = AdmissionGate(
+    settings.max_concurrent_turns, settings.admission_queue_size, settings.admission_queue_timeout
+)
@@ -1,14 +1,138 @@
-import os, redis
+"""Async Redis access with a shared connection pool and a circuit breaker.
 
-_redis = None
-def get_redis():
+Every helper goes through redis_call(), which skips Redis while the breaker is open
+and turns timeouts/errors into a default value, so a slow or unavailable Redis
+degrades caching instead of failing requests.
+"""
+import asyncio, logging, time
+from typing import Any, Awaitable, Callable, Dict, List
+import redis.asyncio as redis
+from ..config.settings import settings
+
+log = logging.getLogger("redis_cache")
+
+class CircuitBreaker:
+    """Open after `threshold` consecutive failures; allow one probe every `cooldown` seconds."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            # Half-open: let this call probe, keep everyone else out for another cooldown
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            log.info("Redis circuit closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                log.warning(f"Redis circuit opened for {self.cooldown}s after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+breaker = CircuitBreaker(settings.redis_breaker_threshold, settings.redis_breaker_cooldown)
+
+_redis: redis.Redis | None = None
+
+def init_redis() -> redis.Redis | None:
+    """Create the pooled client (called from the FastAPI lifespan); None if REDIS_URL is unset."""
     global _redis
-    if _redis is None:
-        _redis = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+    if _redis is None and settings.redis_url:
+        pool = redis.ConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            health_check_interval=settings.redis_health_check_interval,
+            decode_responses=True,
+        )
+        _redis = redis.Redis(connection_pool=pool)
     return _redis
 
-def cache_get(key: str) -> str | None:
-    return get_redis().get(key)
+async def close_redis():
+    global _redis
+    if _redis is not None:
+        await _redis.aclose(close_connection_pool=True)
+        _redis = None
+
+def get_redis() -> redis.Redis | None:
+    return _redis or init_redis()
+
+async def redis_call(op: Callable[[redis.Redis], Awaitable[Any]], default: Any = None) -> Any:
+    """Run op(client) under the circuit breaker and op timeout; `default` if skipped or failed."""
+    client = get_redis()
+    if client is None or not breaker.allow():
+        return default
+    try:
+        result = await asyncio.wait_for(op(client), settings.redis_op_timeout)
+    except Exception as e:
+        breaker.record_failure()
+        log.warning(f"Redis call failed: {str(e) or type(e).__name__}")
+        return default
+    breaker.record_success()
+    return result
+
+async def ping() -> bool:
+    return bool(await redis_call(lambda r: r.ping(), default=False))
+
+async def cache_get(key: str) -> str | None:
+    return await redis_call(lambda r: r.get(key))
+
+async def cache_setex(key: str, ttl: int, value: str) -> bool:
+    return bool(await redis_call(lambda r: r.setex(key, ttl, value), default=False))
+
+async def cache_mget(keys: List[str]) -> List[str | None]:
+    """Values for several keys in one round-trip (None for misses or when Redis is down)."""
+    if not keys:
+        return []
+    return await redis_call(lambda r: r.mget(keys), default=[None] * len(keys))
+
+async def cache_msetex(mapping: Dict[str, str], ttl: int) -> bool:
+    """SETEX several keys in one pipelined round-trip."""
+    async def op(r: redis.Redis):
+        pipe = r.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.setex(key, ttl, value)
+        return await pipe.execute()
+    return bool(mapping) and await redis_call(op, default=None) is not None
+
+async def cache_lrange(key: str, start: int = 0, end: int = -1) -> List[str] | None:
+    """List contents; [] when the key is missing, None when Redis is unavailable."""
+    return await redis_call(lambda r: r.lrange(key, start, end))
+
+async def cache_list_replace(key: str, values: List[str], ttl: int) -> bool:
+    """Atomically replace a list and set its TTL."""
+    async def op(r: redis.Redis):
+        pipe = r.pipeline()
+        pipe.delete(key)
+        if values:
+            pipe.rpush(key, *values)
+            pipe.expire(key, ttl)
+        return await pipe.execute()
+    return await redis_call(op) is not None
 
-def cache_setex(key: str, ttl: int, value: str):
-    get_redis().setex(key, ttl, value)
\ No newline at end of file
+async def cache_list_append(key: str, values: List[str], maxlen: int, ttl: int) -> bool:
+    """Append to an existing list only, keep its newest maxlen items and refresh the TTL."""
+    async def op(r: redis.Redis):
+        pipe = r.pipeline()
+        pipe.rpushx(key, *values)
+        pipe.ltrim(key, -maxlen, -1)
+        pipe.expire(key, ttl)
+        return await pipe.execute()
+    return await redis_call(op) is not None
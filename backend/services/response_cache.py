@@ -0,0 +1,108 @@
+"""Cache of agent responses for repeated, intent-level questions.
+
+Keys are the normalized user message plus a version covering every prompt (the system
+prompt and the intent_* templates) and the intent router's keyword table, so editing any
+of them invalidates the answers. Turns that follow earlier messages in their thread
+depend on that conversation and are neither looked up nor stored. Exact matches are
+tried first. Optionally, a new message is mapped to its nearest previously embedded
+user message (pgvector cosine distance), and that message's cache entry is used.
+Messages containing contact details, and responses carrying a lead with a name or
+contact fields, are never cached.
+"""
+import hashlib, logging, re
+from typing import Dict
+from sqlalchemy import select
+from .embeddings import get_embedder
+from .redis_cache import cache_get, cache_setex
+from ..config.settings import settings
+from ..core.lead_parser import has_personal_data, normalize_lead, parse_lead_block
+from ..core.tracing import CACHE_EVENTS
+from ..db.database import SessionLocal
+from ..db.models import Message, MsgEmbedding
+
+log = logging.getLogger("response_cache")
+
+_stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0}
+_LABELS = {"hits": "hit", "semantic_hits": "semantic_hit", "misses": "miss", "bypassed": "bypass"}
+
+def _record(outcome: str):
+    _stats[outcome] += 1
+    CACHE_EVENTS.labels("response", _LABELS[outcome]).inc()
+
+_PII_RE = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.-]+"  # email
+    r"|\+?\d[\d\s().-]{6,}\d"  # phone-like digit runs
+)
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize(message: str) -> str:
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", message.lower())).strip()
+
+def contains_pii(text: str) -> bool:
+    return _PII_RE.search(text) is not None
+
+def _key(message: str, prompt_version: str | None) -> str:
+    digest = hashlib.sha256(normalize(message).encode("utf-8")).hexdigest()[:32]
+    return f"resp:{prompt_version or 'none'}:{digest}"
+
+async def _nearest_user_message(message: str) -> str | None:
+    """Text of the most similar embedded user message within the similarity threshold."""
+    embedder = get_embedder()
+    if embedder is None:
+        return None
+    vector = (await embedder.embed([message]))[0]
+    distance = MsgEmbedding.embedding.cosine_distance(vector)
+    async with SessionLocal() as db:
+        if db.bind.dialect.name != "postgresql":
+            return None
+        row = (
+            await db.execute(
+                select(Message.content, distance.label("distance"))
+                .join(MsgEmbedding, MsgEmbedding.msg_id == Message.id)
+                .where(Message.role == "user", MsgEmbedding.embedding.is_not(None))
+                .order_by(distance)
+                .limit(1)
+            )
+        ).first()
+    if row and row.distance <= 1 - settings.response_cache_similarity:
+        return row.content
+    return None
+
+async def lookup(message: str, prompt_version: str | None, contextual: bool = False) -> str | None:
+    """Cached response for a message, or None (miss, bypass or cache unavailable)."""
+    if not settings.response_cache_enabled:
+        return None
+    if contextual or contains_pii(message):
+        _record("bypassed")
+        return None
+    cached = await cache_get(_key(message, prompt_version))
+    if cached is not None:
+        _record("hits")
+        return cached
+    if settings.response_cache_similarity:
+        try:
+            similar = await _nearest_user_message(message)
+        except Exception as e:
+            log.warning(f"Response cache similarity lookup failed: {str(e)}")
+            similar = None
+        if similar and not contains_pii(similar):
+            cached = await cache_get(_key(similar, prompt_version))
+            if cached is not None:
+                _record("semantic_hits")
+                return cached
+    _record("misses")
+    return None
+
+async def store(message: str, prompt_version: str | None, response: str, contextual: bool = False):
+    """Cache a response unless it depends on the conversation or carries personal data."""
+    if not settings.response_cache_enabled or contextual or contains_pii(message):
+        return
+    if has_personal_data(normalize_lead(parse_lead_block(response))):
+        return
+    await cache_setex(_key(message, prompt_version), settings.response_cache_ttl, response)
+
+def stats() -> Dict[str, float]:
+    lookups = _stats["hits"] + _stats["semantic_hits"] + _stats["misses"]
+    hit_rate = (_stats["hits"] + _stats["semantic_hits"]) / lookups if lookups else 0.0
+    return {**_stats, "hit_rate": round(hit_rate, 4)}
@@ -0,0 +1,64 @@
+import logging
+from typing import Dict, List
+from .redis_cache import cache_lrange, cache_list_replace, cache_list_append, redis_call
+from ..config.settings import settings
+from ..core import codec
+from ..core.tracing import CACHE_EVENTS
+from ..db.read_routing import read_session
+from ..db.repository import load_recent_messages
+
+log = logging.getLogger("thread_cache")
+
+def _key(thread_id: str) -> str:
+    return f"thread:{thread_id}:window"
+
+def _trim_to_budget(window: List[Dict[str, str]], budget: int | None) -> List[Dict[str, str]]:
+    """Drop the oldest messages until the window fits a rough token budget (~4 chars/token)."""
+    if not budget:
+        return window
+    total = 0
+    for i in range(len(window) - 1, -1, -1):
+        total += len(window[i]["content"]) // 4 + 1
+        if total > budget:
+            return window[i + 1:]
+    return window
+
+async def load_window(thread_id: str) -> tuple[List[Dict[str, str]], bool]:
+    """Recent history for a thread as role/content dicts, oldest first.
+
+    Reads the Redis window first and falls back to a LIMITed Postgres query (also when
+    Redis is down or its circuit breaker is open), on the read replica when it is safe.
+    Returns (window, cached) where cached says whether Redis held the thread.
+    """
+    raw = await cache_lrange(_key(thread_id))
+    CACHE_EVENTS.labels("thread_window", "hit" if raw else "miss").inc()
+    if raw:
+        window = [codec.loads(item) for item in raw]
+        return _trim_to_budget(window, settings.history_token_budget), True
+
+    async with read_session(thread_id) as db:
+        rows = await load_recent_messages(db, thread_id, settings.history_max_messages)
+    window = [{"role": m.role, "content": m.content} for m in rows]
+    return _trim_to_budget(window, settings.history_token_budget), False
+
+async def record_turn(
+    thread_id: str, window: List[Dict[str, str]], cached: bool, new: List[Dict[str, str]]
+):
+    """Append a persisted turn to the thread's Redis window.
+
+    On a cache hit only the new messages are pushed (RPUSHX, so an entry that expired
+    meanwhile is not resurrected as a partial window); on a miss the whole window is
+    written so the next turn can skip Postgres.
+    """
+    key = _key(thread_id)
+    values = [codec.dumps(m) for m in new]
+    if cached:
+        await cache_list_append(key, values, settings.history_max_messages, settings.thread_cache_ttl)
+    else:
+        full = [codec.dumps(m) for m in window] + values
+        await cache_list_replace(key, full[-settings.history_max_messages:], settings.thread_cache_ttl)
+
+async def forget_windows(thread_ids: List[str]):
+    """Drop the cached windows of deleted threads."""
+    if thread_ids:
+        await redis_call(lambda r: r.delete(*[_key(t) for t in thread_ids]))
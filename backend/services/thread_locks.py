@@ -0,0 +1,121 @@
+"""Per-thread serialization of /chat turns.
+
+A local asyncio.Lock orders turns within this process; a Redis lock (SET NX PX with a
+random token, released by compare-and-delete) orders them across workers. The Redis lock
+is renewed every third of THREAD_LOCK_TTL_MS while the turn runs, and released in a
+shielded task so a cancelled turn (e.g. a client dropping a stream) still frees it. If
+Redis is unavailable the local lock still applies.
+"""
+import asyncio, logging, time, uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Set
+from prometheus_client import Histogram
+from .redis_cache import redis_call
+from ..config.settings import settings
+
+log = logging.getLogger("thread_locks")
+
+LOCK_WAIT_SECONDS = Histogram(
+    "brax_thread_lock_wait_seconds", "Time spent waiting for a per-thread lock", ["scope"]
+)
+
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+_RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+_UNAVAILABLE = object()
+
+class ThreadBusy(Exception):
+    """Another worker held the thread's lock for longer than the wait timeout."""
+
+class _LocalLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+_local: Dict[str, _LocalLock] = {}
+# Releases still running after their turn was cancelled (kept so they are not collected)
+_releasing: Set[asyncio.Task] = set()
+
+def _key(name: str) -> str:
+    return f"lock:thread:{name}"
+
+async def _acquire_redis(name: str, deadline: float) -> str | None:
+    """Take the cross-worker lock; returns its token, or None if Redis is unavailable."""
+    token = uuid.uuid4().hex
+    delay = 0.01
+    while True:
+        acquired = await redis_call(
+            lambda r: r.set(_key(name), token, nx=True, px=settings.thread_lock_ttl_ms),
+            default=_UNAVAILABLE,
+        )
+        if acquired is _UNAVAILABLE:
+            return None
+        if acquired:
+            return token
+        if time.monotonic() >= deadline:
+            raise ThreadBusy(name)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.2)
+
+async def _renew_redis(name: str, token: str):
+    """Push the lock's expiry out every third of its TTL until cancelled."""
+    ttl_ms = settings.thread_lock_ttl_ms
+    while True:
+        await asyncio.sleep(ttl_ms / 3000)
+        renewed = await redis_call(
+            lambda r: r.eval(_RENEW_SCRIPT, 1, _key(name), token, ttl_ms), default=_UNAVAILABLE
+        )
+        if renewed == 0:
+            log.warning(f"Lock for {name} expired while its turn was running")
+            return
+
+async def _release_redis(name: str, token: str):
+    """Compare-and-delete; survives cancellation of the caller."""
+    task = asyncio.ensure_future(
+        redis_call(lambda r: r.eval(_RELEASE_SCRIPT, 1, _key(name), token))
+    )
+    _releasing.add(task)
+    task.add_done_callback(_releasing.discard)
+    await asyncio.shield(task)
+
+@asynccontextmanager
+async def thread_lock(name: str):
+    """Hold the turn lock for a thread (or any other serialization name)."""
+    start = time.monotonic()
+    deadline = start + settings.thread_lock_wait_timeout
+    entry = _local.setdefault(name, _LocalLock())
+    entry.users += 1
+    try:
+        try:
+            await asyncio.wait_for(entry.lock.acquire(), settings.thread_lock_wait_timeout)
+        except asyncio.TimeoutError:
+            raise ThreadBusy(name)
+        try:
+            LOCK_WAIT_SECONDS.labels("local").observe(time.monotonic() - start)
+            redis_start = time.monotonic()
+            token = await _acquire_redis(name, deadline)
+            LOCK_WAIT_SECONDS.labels("redis").observe(time.monotonic() - redis_start)
+            renewer = asyncio.create_task(_renew_redis(name, token)) if token else None
+            try:
+                yield
+            finally:
+                if renewer:
+                    renewer.cancel()
+                    await _release_redis(name, token)
+        finally:
+            entry.lock.release()
+    finally:
+        entry.users -= 1
+        if entry.users == 0:
+            _local.pop(name, None)
@@ -0,0 +1,129 @@
+"""Per-thread history version for conditional GETs of /thread/{id}/history.
+
+A thread's version is the id and timestamp of its newest message. It is deleted from
+Redis before a turn is written and set again after the commit, so a revalidation whose
+ETag still matches is answered with 304 from Redis alone. On a miss the version is read
+from the database (one indexed row) and cached. Writes never replace a newer version
+(message ids only grow).
+
+Redis calls can fail or be skipped while the breaker is open. Until a worker has
+confirmed the post-turn write, it answers that thread from the database and writes that
+version back, which replaces the older one; a stale ETag does not outlive a failed write.
+"""
+import logging, time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+from .redis_cache import cache_get, redis_call
+from ..config.settings import settings
+from ..core import codec
+from ..db.read_routing import read_session
+from ..db.repository import latest_message
+
+log = logging.getLogger("thread_versions")
+
+@dataclass(frozen=True)
+class ThreadVersion:
+    message_id: int
+    updated_at: datetime
+
+    def etag(self, *params) -> str:
+        """Strong ETag for one view of the thread (page parameters included)."""
+        return '"' + "-".join(str(p if p is not None else "") for p in (self.message_id, *params)) + '"'
+
+    @property
+    def last_modified(self) -> str:
+        return format_datetime(_utc(self.updated_at), usegmt=True)
+
+    def not_modified(self, etag: str, if_none_match: str | None, if_modified_since: str | None) -> bool:
+        """RFC 9110 revalidation: If-None-Match (weak comparison) wins over If-Modified-Since."""
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return _utc(self.updated_at).replace(microsecond=0) <= _utc(since)
+        return False
+
+def _utc(value: datetime) -> datetime:
+    # SQLite returns naive timestamps; they are stored in UTC
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _key(thread_id: str) -> str:
+    return f"thread:{thread_id}:version"
+
+# SET unless the cached version is at least as new; values are "[message_id, timestamp]"
+_SET_NEWER = """
+local current = redis.call('GET', KEYS[1])
+if current and tonumber(string.match(current, '^%[(%d+)')) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+_set_newer = None
+
+def _set_newer_script(client):
+    global _set_newer
+    if _set_newer is None:
+        _set_newer = client.register_script(_SET_NEWER)
+    return _set_newer
+
+# Threads whose post-turn version write is not confirmed -> monotonic time it stops mattering;
+# bounded so a long Redis outage cannot grow it without limit (oldest entries go first)
+UNCONFIRMED_MAX_THREADS = 100_000
+_unconfirmed: "OrderedDict[str, float]" = OrderedDict()
+
+async def _store(thread_id: str, message_id: int, created_at: datetime) -> bool:
+    """Cache a version; True once Redis holds it or a newer one."""
+    key, value = _key(thread_id), codec.dumps([message_id, created_at])
+    args = [value, message_id, settings.thread_version_ttl]
+    result = await redis_call(lambda r: _set_newer_script(r)(keys=[key], args=args, client=r))
+    return result is not None
+
+async def invalidate_version(thread_id: str):
+    """Called before a turn is written, so no ETag of the old state is confirmed meanwhile."""
+    _unconfirmed[thread_id] = time.monotonic() + settings.thread_version_ttl
+    _unconfirmed.move_to_end(thread_id)
+    while len(_unconfirmed) > UNCONFIRMED_MAX_THREADS:
+        _unconfirmed.popitem(last=False)
+    await redis_call(lambda r: r.delete(_key(thread_id)))
+
+async def record_version(thread_id: str, message_id: int, created_at: datetime):
+    """Called after a turn is committed; the thread's ETag changes with it."""
+    if await _store(thread_id, message_id, created_at):
+        _unconfirmed.pop(thread_id, None)
+
+def _confirmed(thread_id: str) -> bool:
+    deadline = _unconfirmed.get(thread_id)
+    if deadline is not None and deadline < time.monotonic():
+        _unconfirmed.pop(thread_id, None)
+        deadline = None
+    return deadline is None
+
+async def get_version(thread_id: str) -> ThreadVersion | None:
+    """The thread's version, or None if it has no messages."""
+    confirmed = _confirmed(thread_id)
+    if confirmed:
+        raw = await cache_get(_key(thread_id))
+        if raw:
+            message_id, updated_at = codec.loads(raw)
+            return ThreadVersion(message_id, datetime.fromisoformat(updated_at))
+    async with read_session(thread_id) as db:
+        latest = await latest_message(db, thread_id)
+    if latest is None:
+        return None
+    # Also replaces an older version a failed write left behind; then Redis is trusted again
+    if await _store(thread_id, *latest) and not confirmed:
+        _unconfirmed.pop(thread_id, None)
+    return ThreadVersion(*latest)
+
+async def forget_versions(thread_ids: list[str]):
+    """Drop versions of deleted threads so stale ETags stop matching."""
+    if thread_ids:
+        await redis_call(lambda r: r.delete(*[_key(t) for t in thread_ids]))
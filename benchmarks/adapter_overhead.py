@@ -0,0 +1,85 @@
+"""Per-turn overhead of AgenticCoreAdapter.process_message, by intent branch.
+
+Also times the old per-turn work (reading system_prompt.md from disk and
+compiling the lead regex on every call) for comparison, the old linear keyword
+scans against the compiled intent router, and a full graph turn per route.
+
+    python -m benchmarks.adapter_overhead --iterations 2000
+"""
+import argparse, asyncio, json, re, time
+from langchain_core.messages import HumanMessage
+from backend.core.agent_adapter import AgenticCoreAdapter
+from backend.core.build_graph import create_brax_chat_graph
+from backend.core.intent_router import intent_router
+from backend.core.lead_parser import parse_lead_block
+from backend.core.prompts import PROMPTS_DIR
+
+MESSAGES = {
+    "engagement": "I'm looking for an engagement ring",
+    "repair": "My necklace clasp is broken, can you fix it?",
+    "watch": "Do you carry Omega watches?",
+    "fallback": "What are your opening hours?",
+    "greeting": "Hello there!",
+}
+
+def legacy_intent(message: str) -> str | None:
+    """The adapter's old classification: one any() substring scan per intent."""
+    message_lower = message.lower()
+    if any(word in message_lower for word in ["engagement", "ring", "proposal", "diamond"]):
+        return "engagement_ring"
+    elif any(word in message_lower for word in ["repair", "fix", "broken", "maintenance"]):
+        return "jewelry_repair"
+    elif any(word in message_lower for word in ["watch", "timepiece", "rolex", "omega"]):
+        return "luxury_watches"
+    return None
+
+def legacy_per_turn(response: str):
+    """What each fallback turn used to do before the registry and shared parser."""
+    with open(PROMPTS_DIR / "system_prompt.md", "r", encoding="utf-8") as f:
+        f.read().strip()
+    match = re.search(r"```lead\s*\n(.*?)\n```", response, re.DOTALL)
+    if match:
+        json.loads(match.group(1).strip())
+
+def current_per_turn(adapter: AgenticCoreAdapter, response: str):
+    adapter._load_system_prompt()
+    parse_lead_block(response)
+
+def _per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+async def main(iterations: int):
+    adapter = AgenticCoreAdapter()
+    for name, text in MESSAGES.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await adapter.process_message("bench", text)
+        per_call = (time.perf_counter() - start) / iterations * 1e6
+        print(f"process_message[{name:<10}] {per_call:8.1f} us/turn")
+
+    response = (await adapter.process_message("bench", MESSAGES["engagement"]))["response"]
+    legacy = _per_call_us(lambda: legacy_per_turn(response), iterations)
+    current = _per_call_us(lambda: current_per_turn(adapter, response), iterations)
+    print(f"prompt load + lead parse: legacy {legacy:8.1f} us/turn, current {current:8.1f} us/turn")
+
+    texts = list(MESSAGES.values())
+    legacy = _per_call_us(lambda: [legacy_intent(t) for t in texts], iterations) / len(texts)
+    current = _per_call_us(lambda: [intent_router.match(t) for t in texts], iterations) / len(texts)
+    print(f"intent match:             legacy {legacy:8.1f} us/msg,  current {current:8.1f} us/msg")
+
+    graph = create_brax_chat_graph()
+    for name, text in MESSAGES.items():
+        state = {"messages": [HumanMessage(content=text)], "user_id": "bench", "thread_id": "bench"}
+        start = time.perf_counter()
+        for _ in range(iterations):
+            output = await graph.ainvoke(state)
+        per_call = (time.perf_counter() - start) / iterations * 1e6
+        print(f"graph turn[{name:<10}] {per_call:8.1f} us/turn via {output['route']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -0,0 +1,275 @@
+"""Latency and throughput benchmark for the chat API against local stand-ins.
+
+    python -m benchmarks.chat_load --requests 500 --concurrency 20
+    python -m benchmarks.chat_load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.chat_load --compare benchmarks/baseline.json
+
+The FastAPI app is booted in-process over httpx's ASGI transport. It uses SQLite
+unless --postgres-url is given, and Redis only with --redis-url. GHL forwarding goes
+to an in-process stub server. Each scenario reports p50/p95/p99 latency, RPS, DB
+statements per request and event-loop lag:
+
+    chat        new thread per request
+    chat_long   follow-up turns on threads pre-seeded with --long-thread-messages
+    history     GET /thread/{id}/history on the same long threads
+    history_revalidate
+                the same GET with If-None-Match from an earlier fetch (widget reopen on an
+                unchanged thread); expects 304 and, with Redis, zero DB statements
+
+`--redis-url fake` uses an in-process fakeredis (requirements-dev.txt). With
+--replica-url, db_statements_per_req counts the primary only and
+db_replica_statements_per_req the replica. `--replica-url same` points it at the primary
+database, which is enough to see the routing locally.
+"""
+import argparse, asyncio, json, platform, random, socket, subprocess, sys, time
+from .common import QueryCounter, percentile, use_local_standins
+
+SCENARIOS = ["chat", "chat_long", "history", "history_revalidate"]
+QUESTIONS = [
+    "I'm looking for an engagement ring",
+    "Can you fix a broken clasp?",
+    "Do you carry Rolex or Omega?",
+    "What are your opening hours?",
+]
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=20, help="seeded long threads")
+    parser.add_argument("--long-thread-messages", type=int, default=200)
+    parser.add_argument("--postgres-url", default=None)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--replica-url", default=None, help="POSTGRES_REPLICA_URL for read routing")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    return parser.parse_args()
+
+def _git_commit() -> str | None:
+    """HEAD of the checkout being measured, with "-dirty" if it has local changes."""
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], capture_output=True).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head + ("-dirty" if dirty else "")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes a periodic sleeper."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+async def _drive(send, total: int, concurrency: int) -> tuple[list[float], int, float]:
+    """Run `total` calls of send(i) with `concurrency` workers; returns latencies, errors, wall."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await send(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+async def _seed_long_threads(count: int, messages: int) -> list[str]:
+    from backend.db.database import SessionLocal
+    from backend.db.repository import Turn, persist_turns
+
+    thread_ids = [f"bench-long-{i}" for i in range(count)]
+    async with SessionLocal() as db:
+        turns = [
+            Turn(tid, "bench", random.choice(QUESTIONS), "Thanks for asking! " * 20)
+            for tid in thread_ids
+            for _ in range(messages // 2)
+        ]
+        for i in range(0, len(turns), 500):
+            await persist_turns(db, turns[i:i + 500])
+    return thread_ids
+
+async def run(args) -> dict:
+    import httpx
+    from backend.api.app import app
+    from backend.db.database import engine, replica_engine
+
+    if args.redis_url == "fake":
+        import fakeredis
+        from backend.services import redis_cache
+
+        redis_cache._redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    counter = QueryCounter(engine)
+    replica_counter = QueryCounter(replica_engine) if replica_engine is not None else None
+    lag = LoopLagMonitor()
+    results = {}
+    async with app.router.lifespan_context(app):
+        long_threads = await _seed_long_threads(args.threads, args.long_thread_messages)
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+        async with client:
+
+            async def chat(i):
+                r = await client.post("/chat", json={"message": random.choice(QUESTIONS)})
+                return r.status_code == 200
+
+            async def chat_long(i):
+                payload = {
+                    "message": random.choice(QUESTIONS),
+                    "thread_id": long_threads[i % len(long_threads)],
+                }
+                r = await client.post("/chat", json=payload)
+                return r.status_code == 200
+
+            async def history(i):
+                r = await client.get(f"/thread/{long_threads[i % len(long_threads)]}/history")
+                return r.status_code == 200
+
+            etags = {}
+
+            async def history_revalidate(i):
+                tid = long_threads[i % len(long_threads)]
+                headers = {"If-None-Match": etags[tid]}
+                r = await client.get(f"/thread/{tid}/history", headers=headers)
+                return r.status_code == 304
+
+            senders = {
+                "chat": chat,
+                "chat_long": chat_long,
+                "history": history,
+                "history_revalidate": history_revalidate,
+            }
+            for name in args.scenario or SCENARIOS:
+                if name == "history_revalidate":
+                    for tid in long_threads:
+                        r = await client.get(f"/thread/{tid}/history")
+                        etags[tid] = r.headers.get("ETag", "")
+                await _drive(senders[name], args.warmup, args.concurrency)
+                counter.reset()
+                if replica_counter:
+                    replica_counter.reset()
+                lag.start()
+                latencies, errors, wall = await _drive(
+                    senders[name], args.requests, args.concurrency
+                )
+                await lag.stop()
+                results[name] = {
+                    "requests": args.requests,
+                    "errors": errors,
+                    "rps": round(args.requests / wall, 1),
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                    "db_statements_per_req": round(counter.statements / args.requests, 2),
+                    "db_commits_per_req": round(counter.commits / args.requests, 2),
+                    "loop_lag_p99_ms": round(percentile(lag.samples, 99) * 1000, 2),
+                    "loop_lag_max_ms": round(max(lag.samples, default=0) * 1000, 2),
+                }
+                if replica_counter:
+                    results[name]["db_replica_statements_per_req"] = round(
+                        replica_counter.statements / args.requests, 2
+                    )
+    return results
+
+def _print_results(results: dict, baseline: dict | None):
+    for name, metrics in results.items():
+        print(f"\n[{name}]")
+        base = (baseline or {}).get("results", {}).get(name, {})
+        for metric, value in metrics.items():
+            line = f"  {metric:<24} {value:>10}"
+            if metric in base and base[metric]:
+                delta = (value - base[metric]) / base[metric] * 100
+                line += f"   baseline {base[metric]:>10}  ({delta:+.1f}%)"
+            print(line)
+
+async def main(args):
+    import uvicorn
+    from .stub_ghl import create_stub_app
+
+    config = uvicorn.Config(
+        create_stub_app(), host="127.0.0.1", port=args.stub_port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    stub = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        return await run(args)
+    finally:
+        server.should_exit = True
+        await stub
+
+if __name__ == "__main__":
+    import logging, os
+
+    args = _parse_args()
+    redis_url = None if args.redis_url == "fake" else args.redis_url
+    db_url = use_local_standins(args.postgres_url, redis_url)
+    if args.replica_url:
+        replica_url = db_url if args.replica_url == "same" else args.replica_url
+        os.environ["POSTGRES_REPLICA_URL"] = replica_url
+    args.stub_port = _free_port()
+    os.environ["GHL_WEBHOOK_URL"] = f"http://127.0.0.1:{args.stub_port}/webhook"
+    logging.disable(logging.INFO)
+
+    results = asyncio.run(main(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_results(results, baseline)
+    if args.save_baseline:
+        report = {
+            "environment": {
+                "commit": _git_commit(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "database": db_url.split(":")[0],
+                "redis": "fakeredis" if args.redis_url == "fake" else bool(args.redis_url),
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "threads": args.threads,
+                "long_thread_messages": args.long_thread_messages,
+            },
+            "results": results,
+        }
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
@@ -0,0 +1,92 @@
+"""Startup time, cold-request latency and graceful drain of the multi-worker launcher.
+
+    python -m benchmarks.cold_start --workers 2
+    python -m benchmarks.cold_start --workers 4 --no-warmup
+
+Launches `python -m backend.api.serve` as a subprocess against SQLite (or --postgres-url)
+and reports:
+
+    ready_ms        launch until /health answers (migrate + worker boot)
+    first_chat_ms   first /chat after ready (served by a cold worker)
+    warm_p50_ms     p50 of the following --requests /chat calls
+    drain           streams in flight at SIGTERM that still completed with a `done` event
+"""
+import argparse, asyncio, os, signal, subprocess, sys, time
+from .common import percentile, use_local_standins
+from .chat_load import _free_port
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--streams", type=int, default=4, help="streams in flight at shutdown")
+    parser.add_argument("--no-warmup", action="store_true", help="set GRAPH_WARMUP=false")
+    parser.add_argument("--postgres-url")
+    return parser.parse_args()
+
+async def _wait_ready(client, proc, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.05)
+    raise TimeoutError("server did not become ready")
+
+async def _stream(client) -> bool:
+    async with client.stream("POST", "/chat/stream", json={"message": "Tell me about engagement rings"}) as r:
+        body = "".join([chunk async for chunk in r.aiter_text()])
+    return "event: done" in body
+
+async def run(args) -> dict:
+    import httpx
+
+    port = _free_port()
+    env = dict(os.environ, GRAPH_WARMUP="false" if args.no_warmup else "true", LOG_FORMAT="text")
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    cmd = [sys.executable, "-m", "backend.api.serve", "--workers", str(args.workers), "--port", str(port)]
+    started = time.perf_counter()
+    # A new process group lets CTRL_BREAK stand in for SIGTERM on Windows
+    flags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0
+    proc = subprocess.Popen(
+        cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=flags
+    )
+    results = {"workers": args.workers, "warmup": not args.no_warmup}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            await _wait_ready(client, proc)
+            results["ready_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+            t = time.perf_counter()
+            await client.post("/chat", json={"message": "Hello"})
+            results["first_chat_ms"] = round((time.perf_counter() - t) * 1000, 2)
+
+            latencies = []
+            for _ in range(args.requests):
+                t = time.perf_counter()
+                await client.post("/chat", json={"message": "Hello"})
+                latencies.append(time.perf_counter() - t)
+            results["warm_p50_ms"] = round(percentile(latencies, 50) * 1000, 2)
+
+            # SIGTERM while streams are open; they should all still finish
+            streams = [asyncio.create_task(_stream(client)) for _ in range(args.streams)]
+            await asyncio.sleep(0.05)
+            proc.send_signal(signal.CTRL_BREAK_EVENT if os.name == "nt" else signal.SIGTERM)
+            done = await asyncio.gather(*streams, return_exceptions=True)
+            results["drain"] = f"{sum(d is True for d in done)}/{args.streams} streams completed"
+        proc.wait(timeout=60)
+        results["exit_code"] = proc.returncode
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return results
+
+if __name__ == "__main__":
+    args = _parse_args()
+    use_local_standins(args.postgres_url)
+    for name, value in asyncio.run(run(args)).items():
+        print(f"  {name:<16} {str(value):>12}")
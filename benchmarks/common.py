@@ -0,0 +1,47 @@
+"""Shared helpers for the benchmarks. Nothing here imports `backend` at module level,
+so callers can point the environment at local stand-ins before the app is imported."""
+import os, tempfile
+
+def use_local_standins(postgres_url: str | None = None, redis_url: str | None = None) -> str:
+    """Point POSTGRES_URL/REDIS_URL at the given servers, defaulting to a temp SQLite file.
+
+    Must run before anything under `backend` is imported. Returns the database URL.
+    """
+    if not postgres_url:
+        postgres_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["POSTGRES_URL"] = postgres_url
+    os.environ["DB_AUTO_CREATE"] = "true"
+    # Load generators come from one address; per-IP limits would just measure the limiter
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+    else:
+        os.environ.pop("REDIS_URL", None)
+    return postgres_url
+
+class QueryCounter:
+    """Counts statements and commits issued through an AsyncEngine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
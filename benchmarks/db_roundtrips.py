@@ -0,0 +1,91 @@
+"""Count DB statements and commits per /chat turn, legacy write path vs batched.
+
+Runs against SQLite (aiosqlite) by default so it needs no server; pass
+--postgres-url to measure against a real database.
+
+    python -m benchmarks.db_roundtrips --turns 200
+"""
+import argparse, asyncio, time, uuid
+from .common import QueryCounter, use_local_standins
+
+LEAD = {"name": "", "email": "", "phone": "", "intent": "engagement_ring", "notes": "bench"}
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="turns in flight for write-behind")
+    parser.add_argument("--postgres-url", default=None)
+    return parser.parse_args()
+
+async def legacy_turn(thread_id: str):
+    """The pre-batching write path: thread check + four separate commits."""
+    async with SessionLocal() as db:
+        thread = await db.get(Thread, thread_id)
+        if not thread:
+            db.add(Thread(id=thread_id, user_id="bench"))
+            await db.commit()
+        db.add(Message(thread_id=thread_id, role="user", content="hello"))
+        await db.commit()
+        await db.scalars(select(Message).where(Message.thread_id == thread_id))
+        ai_msg = Message(thread_id=thread_id, role="assistant", content="hi there")
+        db.add(ai_msg)
+        await db.commit()
+        await db.refresh(ai_msg)
+        db.add(Lead(thread_id=thread_id, intent=LEAD["intent"], raw="{}"))
+        await db.commit()
+
+async def batched_turn(thread_id: str):
+    async with SessionLocal() as db:
+        await db.scalars(select(Message).where(Message.thread_id == thread_id))
+        await db.close()
+        await persist_turn(db, Turn(thread_id, "bench", "hello", "hi there", LEAD))
+
+async def run(name, counter, turns, fn):
+    counter.reset()
+    start = time.perf_counter()
+    await fn(turns)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<14} statements/turn={counter.statements / turns:5.2f} "
+        f"commits/turn={counter.commits / turns:5.2f} turns/s={turns / elapsed:8.1f}"
+    )
+
+async def main(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    counter = QueryCounter(engine)
+
+    def sequential(fn):
+        async def go(turns):
+            for _ in range(turns):
+                await fn(str(uuid.uuid4()))
+        return go
+
+    async def write_behind(turns):
+        writer = TurnWriter(SessionLocal, max_batch=args.concurrency)
+        writer.start()
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            async with sem:
+                await writer.submit(Turn(str(uuid.uuid4()), "bench", "hello", "hi there", LEAD))
+
+        await asyncio.gather(*(one() for _ in range(turns)))
+        await writer.stop()
+
+    await run("legacy", counter, args.turns, sequential(legacy_turn))
+    await run("batched", counter, args.turns, sequential(batched_turn))
+    await run("write-behind", counter, args.turns, write_behind)
+    await engine.dispose()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    use_local_standins(args.postgres_url)
+
+    from sqlalchemy import select
+    from backend.db.database import engine, SessionLocal
+    from backend.db.models import Base, Thread, Message, Lead
+    from backend.db.repository import Turn, persist_turn
+    from backend.db.write_behind import TurnWriter
+
+    asyncio.run(main(args))
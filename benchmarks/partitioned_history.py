@@ -0,0 +1,176 @@
+"""Insert and history-query latency on a large messages table, plain vs monthly partitions.
+
+    python -m benchmarks.partitioned_history --postgres-url postgresql://... --rows 20000000
+
+Postgres only. Builds two copies of the messages table in a scratch schema: one plain
+table and one range-partitioned by month, as in migration 004. Both get the same
+(thread_id, created_at, id) index. Each is loaded server-side with generate_series,
+spreading rows over --threads threads and --months months, then measured for:
+
+    insert      single-row INSERT ... RETURNING of a new message (autocommit)
+    history     newest 20 messages of a random thread (the per-turn window query), bounded
+                below by the thread's start as in backend.db.repository.thread_messages
+    unbounded   the same query on thread_id alone, which probes every partition
+    page        the 20 messages before a cursor id (/thread/{id}/history?before=), bounded
+    expire      removing the oldest month: DELETE on the plain table, DROP of a partition
+
+The scratch schema is dropped at the end unless --keep is given.
+"""
+import argparse, random, time
+import psycopg
+from .common import percentile, use_local_standins
+
+SCHEMA = "bench_partitioning"
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--postgres-url", required=True)
+    parser.add_argument("--rows", type=int, default=20_000_000)
+    parser.add_argument("--threads", type=int, default=500_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="rows per load statement")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    return parser.parse_args()
+
+def create_tables(conn, months: int):
+    conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    conn.execute(
+        f"CREATE TABLE {SCHEMA}.plain (id BIGSERIAL PRIMARY KEY, thread_id TEXT, role TEXT NOT NULL, "
+        "content TEXT NOT NULL, created_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    )
+    conn.execute(
+        f"CREATE TABLE {SCHEMA}.part (id BIGSERIAL, thread_id TEXT, role TEXT NOT NULL, "
+        "content TEXT NOT NULL, created_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+        "PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)"
+    )
+    for i in range(-months, 2):
+        month = conn.execute(
+            "SELECT (date_trunc('month', now()) + make_interval(months => %s))::date", (i,)
+        ).fetchone()[0]
+        following = conn.execute("SELECT (%s::date + interval '1 month')::date", (month,)).fetchone()[0]
+        conn.execute(
+            f"CREATE TABLE {SCHEMA}.part_p{month:%Y%m} PARTITION OF {SCHEMA}.part "
+            f"FOR VALUES FROM ('{month}') TO ('{following}')"
+        )
+    conn.execute(f"CREATE TABLE {SCHEMA}.part_default PARTITION OF {SCHEMA}.part DEFAULT")
+    for table in ("plain", "part"):
+        conn.execute(f"CREATE INDEX ON {SCHEMA}.{table} (thread_id, created_at, id)")
+
+def load(conn, table: str, rows: int, threads: int, months: int, chunk: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, rows, chunk):
+        conn.execute(
+            f"INSERT INTO {SCHEMA}.{table} (thread_id, role, content, created_at) "
+            "SELECT 't' || (g %% %(threads)s), CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END, "
+            "repeat('lorem ipsum ', 8), now() - random() * make_interval(days => %(days)s) "
+            "FROM generate_series(%(lo)s, %(hi)s) AS g",
+            {"threads": threads, "days": months * 30, "lo": offset, "hi": min(offset + chunk, rows) - 1},
+        )
+        print(f"  {table}: {min(offset + chunk, rows):,} rows", end="\r")
+    # Stand-in for the threads table: each thread starts with its oldest message
+    conn.execute(
+        f"CREATE TABLE {SCHEMA}.{table}_threads AS "
+        f"SELECT thread_id AS id, min(created_at) AS created_at FROM {SCHEMA}.{table} GROUP BY 1"
+    )
+    conn.execute(f"ALTER TABLE {SCHEMA}.{table}_threads ADD PRIMARY KEY (id)")
+    conn.execute(f"ANALYZE {SCHEMA}.{table}")
+    conn.execute(f"ANALYZE {SCHEMA}.{table}_threads")
+    print()
+    return time.perf_counter() - start
+
+def _timed(conn, samples: int, sql: str, params) -> list[float]:
+    latencies = []
+    for _ in range(samples):
+        args = params()
+        t = time.perf_counter()
+        conn.execute(sql, args).fetchall()
+        latencies.append(time.perf_counter() - t)
+    return latencies
+
+def measure(conn, table: str, threads: int, samples: int) -> dict:
+    thread = lambda: {"t": f"t{random.randrange(threads)}"}
+    sample = f"SELECT id, thread_id FROM {SCHEMA}.{table} TABLESAMPLE SYSTEM (0.1) LIMIT 1000"
+    ids = [tuple(row) for row in conn.execute(sample)]
+    started = f"(SELECT created_at FROM {SCHEMA}.{table}_threads WHERE id = %(t)s)"
+    results = {
+        "insert": _timed(
+            conn,
+            samples,
+            f"INSERT INTO {SCHEMA}.{table} (thread_id, role, content) VALUES (%(t)s, 'user', 'hi') "
+            "RETURNING id, created_at",
+            thread,
+        ),
+        "history": _timed(
+            conn,
+            samples,
+            f"SELECT id, role, content, created_at FROM {SCHEMA}.{table} WHERE thread_id = %(t)s "
+            f"AND created_at >= {started} ORDER BY created_at DESC, id DESC LIMIT 20",
+            thread,
+        ),
+        "unbounded": _timed(
+            conn,
+            samples,
+            f"SELECT id, role, content, created_at FROM {SCHEMA}.{table} WHERE thread_id = %(t)s "
+            "ORDER BY created_at DESC, id DESC LIMIT 20",
+            thread,
+        ),
+        "page": _timed(
+            conn,
+            samples,
+            f"SELECT m.id, m.role, m.content, m.created_at FROM {SCHEMA}.{table} m "
+            f"JOIN {SCHEMA}.{table} c ON c.id = %(id)s AND c.thread_id = %(t)s "
+            f"AND c.created_at >= {started} WHERE m.thread_id = %(t)s AND m.created_at >= {started} "
+            "AND (m.created_at, m.id) < (c.created_at, c.id) ORDER BY m.created_at DESC, m.id DESC LIMIT 20",
+            lambda: dict(zip(("id", "t"), random.choice(ids))),
+        ),
+    }
+    return {
+        name: {p: round(percentile(values, p) * 1000, 3) for p in (50, 95, 99)}
+        for name, values in results.items()
+    }
+
+def expire_oldest_month(conn, months: int) -> dict:
+    oldest = conn.execute(
+        "SELECT date_trunc('month', now()) - make_interval(months => %s)", (months,)
+    ).fetchone()[0]
+    t = time.perf_counter()
+    deleted = conn.execute(
+        f"DELETE FROM {SCHEMA}.plain WHERE created_at >= %s AND created_at < %s + interval '1 month'",
+        (oldest, oldest),
+    ).rowcount
+    plain = time.perf_counter() - t
+    name = f"part_p{oldest:%Y%m}"
+    t = time.perf_counter()
+    conn.execute(f"ALTER TABLE {SCHEMA}.part DETACH PARTITION {SCHEMA}.{name}")
+    conn.execute(f"DROP TABLE {SCHEMA}.{name}")
+    part = time.perf_counter() - t
+    return {"rows": deleted, "plain_delete_s": round(plain, 3), "partition_drop_s": round(part, 3)}
+
+def main(args):
+    from backend.db.migrate import _libpq_url
+
+    with psycopg.connect(_libpq_url(args.postgres_url), autocommit=True) as conn:
+        create_tables(conn, args.months)
+        try:
+            for table in ("plain", "part"):
+                seconds = load(conn, table, args.rows, args.threads, args.months, args.chunk)
+                size = conn.execute(
+                    f"SELECT pg_size_pretty(pg_total_relation_size('{SCHEMA}.{table}'))"
+                    if table == "plain"
+                    else "SELECT pg_size_pretty(sum(pg_total_relation_size(inhrelid))) "
+                    f"FROM pg_inherits WHERE inhparent = '{SCHEMA}.part'::regclass"
+                ).fetchone()[0]
+                print(f"[{table}] loaded {args.rows:,} rows in {seconds:.1f}s ({size})")
+                for name, pct in measure(conn, table, args.threads, args.samples).items():
+                    print(f"  {name:<9} p50 {pct[50]:>8} ms  p95 {pct[95]:>8} ms  p99 {pct[99]:>8} ms")
+            print(f"[expire oldest month] {expire_oldest_month(conn, args.months)}")
+        finally:
+            if not args.keep:
+                conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+if __name__ == "__main__":
+    args = _parse_args()
+    use_local_standins(args.postgres_url)
+    main(args)
@@ -0,0 +1,41 @@
+"""Throughput of offline replay (backend.core.replay) by concurrency and process count.
+
+    python -m benchmarks.replay_throughput --threads 2000 --turns 4
+
+Generates synthetic threads from the chat_load questions, writes them to a temp JSONL
+file and replays it in-process at each --concurrency level, then with --processes.
+"""
+import argparse, json, os, random, subprocess, sys, tempfile
+from .chat_load import QUESTIONS
+from .common import use_local_standins
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--processes", type=int, nargs="+", default=[os.cpu_count() or 2])
+    return parser.parse_args()
+
+def _write_threads(path: str, threads: int, turns: int):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(threads):
+            messages = [random.choice(QUESTIONS) for _ in range(turns)]
+            f.write(json.dumps({"thread_id": f"replay-{i}", "messages": messages}) + "\n")
+
+def _run(path: str, *extra: str) -> dict:
+    cmd = [sys.executable, "-m", "backend.core.replay", path, "-o", os.devnull, *extra]
+    done = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(done.stderr.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    args = _parse_args()
+    use_local_standins()
+    path = os.path.join(tempfile.mkdtemp(), "threads.jsonl")
+    _write_threads(path, args.threads, args.turns)
+    runs = [(f"concurrency={c}", ["--concurrency", str(c)]) for c in args.concurrency]
+    runs += [(f"processes={p}", ["--processes", str(p), "--concurrency", "16"]) for p in args.processes]
+    for label, extra in runs:
+        summary = _run(path, *extra)
+        print(f"  {label:<16} {summary['turns']:>7} turns  {summary['seconds']:>8.2f} s  "
+              f"{summary['turns_per_second']:>9.1f} turns/s  errors {summary['errors']}")
@@ -0,0 +1,93 @@
+"""Payload size and encode/decode time for thread history, stdlib json vs orjson vs msgpack.
+
+    python -m benchmarks.serialization --sizes 100 1000
+
+For each thread size it compares:
+
+    pydantic+json   ThreadHistory model with isoformat() timestamps, dumped with json.dumps
+                    (the old history path)
+    json            stdlib json on plain dicts
+    orjson          backend.core.codec (orjson, native datetimes), what the API now uses
+    msgpack         msgpack with timestamps as strings (if installed, requirements-dev.txt)
+
+plus the Redis window (one encoded string per message, as thread_cache stores it).
+"""
+import argparse, json, time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+from pydantic import BaseModel
+
+class ThreadHistory(BaseModel):
+    thread_id: str
+    messages: List[Dict[str, Any]]
+    has_more: bool = False
+
+def _thread(n: int) -> Dict[str, Any]:
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    messages = [
+        {
+            "id": 1_000_000 + i,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": ("Do you have oval engagement rings under 5k? " * (1 if i % 2 == 0 else 6)).strip(),
+            "timestamp": start + timedelta(seconds=17 * i, microseconds=123 * i),
+        }
+        for i in range(n)
+    ]
+    return {"thread_id": "9b2f6c1e-4a7d-4a55-9f0e-2c1d7e8b3a10", "messages": messages, "has_more": False}
+
+def _isoformat(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {**doc, "messages": [{**m, "timestamp": m["timestamp"].isoformat()} for m in doc["messages"]]}
+
+def _per_call_us(fn: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def codecs(doc: Dict[str, Any]) -> Dict[str, tuple]:
+    from backend.core import codec
+
+    iso = _isoformat(doc)
+    result = {
+        "pydantic+json": (
+            lambda: json.dumps(ThreadHistory(**_isoformat(doc)).model_dump()).encode(),
+            lambda data: ThreadHistory(**json.loads(data)),
+        ),
+        "json": (lambda: json.dumps(iso).encode(), json.loads),
+        "orjson": (lambda: codec.dumpb(doc), codec.loads),
+    }
+    try:
+        import msgpack
+
+        result["msgpack"] = (lambda: msgpack.packb(iso), msgpack.unpackb)
+    except ImportError:
+        pass
+    return result
+
+def window(doc: Dict[str, Any]) -> Dict[str, tuple]:
+    from backend.core import codec
+
+    iso = _isoformat(doc)["messages"]
+    return {
+        "window json": (lambda: [json.dumps(m) for m in iso], lambda items: [json.loads(i) for i in items]),
+        "window orjson": (lambda: [codec.dumps(m) for m in iso], lambda items: [codec.loads(i) for i in items]),
+    }
+
+def main(args):
+    for size in args.sizes:
+        doc = _thread(size)
+        iterations = max(20, args.iterations // size)
+        print(f"\n[{size} messages]  ({iterations} iterations)")
+        print(f"  {'codec':<16} {'bytes':>10} {'encode us':>12} {'decode us':>12}")
+        for name, (encode, decode) in {**codecs(doc), **window(doc)}.items():
+            data = encode()
+            size_bytes = sum(len(i) for i in data) if isinstance(data, list) else len(data)
+            enc = _per_call_us(encode, iterations)
+            dec = _per_call_us(lambda: decode(data), iterations)
+            print(f"  {name:<16} {size_bytes:>10} {enc:>12.1f} {dec:>12.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--iterations", type=int, default=100_000, help="messages encoded per codec")
+    main(parser.parse_args())
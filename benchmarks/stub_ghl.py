@@ -0,0 +1,58 @@
+"""Local stand-in for the GoHighLevel webhook and REST API.
+
+    python -m benchmarks.stub_ghl --port 9009 --fail-rate 0.2 --latency-ms 50
+    python -m benchmarks.stub_ghl --fail-first 3   # 503 for the first three requests
+
+Point the API at it with GHL_WEBHOOK_URL=http://127.0.0.1:9009/webhook and
+GHL_API_BASE=http://127.0.0.1:9009. GET /stats reports what it received.
+"""
+import argparse, asyncio, random
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+def create_stub_app(fail_rate: float = 0.0, latency_ms: float = 0.0, fail_first: int = 0) -> FastAPI:
+    app = FastAPI(title="GHL stub")
+    stats = Counter()
+    received = []
+
+    async def respond(kind: str, request: Request, body: dict):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        stats["requests"] += 1
+        if stats["requests"] <= fail_first or random.random() < fail_rate:
+            stats[f"{kind}_failed"] += 1
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        stats[kind] += 1
+        received.append({"kind": kind, "body": await request.json()})
+        return JSONResponse(body)
+
+    @app.post("/webhook")
+    async def webhook(request: Request):
+        return await respond("webhook", request, {"status": "received"})
+
+    @app.post("/contacts/")
+    async def contacts(request: Request):
+        return await respond("contacts", request, {"contact": {"id": f"stub-{stats['contacts'] + 1}"}})
+
+    @app.post("/opportunities/")
+    async def opportunities(request: Request):
+        return await respond("opportunities", request, {"opportunity": {"id": "stub"}})
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"counts": dict(stats), "received": received[-50:]}
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9009)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+    app = create_stub_app(args.fail_rate, args.latency_ms, args.fail_first)
+    uvicorn.run(app, host=args.host, port=args.port)
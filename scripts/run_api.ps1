@@ -1,5 +1,5 @@
 $ErrorActionPreference = "Stop"
 . .\.venv\Scripts\Activate.ps1
-$host = $env:API_HOST; if(!$host){$host="0.0.0.0"}
-$port = $env:API_PORT; if(!$port){$port="8080"}
-uvicorn backend.api.app:app --host $host --port $port --workers 1
\ No newline at end of file
+# Applies pending migrations once, then starts API_WORKERS uvicorn workers (0 = one per CPU core)
+# on API_HOST:API_PORT
+python -m backend.api.serve
@@ -0,0 +1,71 @@
+"""Tests run against a temp SQLite database and an in-process fakeredis (with Lua).
+
+The environment is set before anything under `backend` is imported; the `redis` fixture
+swaps the shared client for a fresh FakeRedis per test. Tests that need real Postgres
+(partitioning) take the `postgres_url` fixture and are skipped unless TEST_POSTGRES_URL
+points at a server where they may create and drop databases.
+"""
+from benchmarks.common import use_local_standins
+
+use_local_standins()
+
+import fakeredis
+import pytest
+from backend.services import redis_cache
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+async def redis():
+    client = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    redis_cache._redis = client
+    redis_cache.breaker.record_success()
+    yield client
+    redis_cache._redis = None
+    await client.aclose()
+
+@pytest.fixture
+async def db():
+    """Fresh tables in the temp database; yields the engine."""
+    from backend.db.database import Base, engine
+    from backend.db import models  # noqa: F401  (registers the tables)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+@pytest.fixture
+async def api(redis, db):
+    """The app module with its lifespan running (graph, queues, Redis client)."""
+    from backend.api import app as api
+    from backend.api.drain import drain
+
+    drain.draining = False  # left set by the previous test's shutdown
+    async with api.app.router.lifespan_context(api.app):
+        yield api
+
+@pytest.fixture
+def postgres_url():
+    """A fresh, migrated database on TEST_POSTGRES_URL's server; skips when that is unset."""
+    import os, uuid
+    import psycopg
+    from backend.db.migrate import _libpq_url, migrate
+
+    server = os.environ.get("TEST_POSTGRES_URL")
+    if not server:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    server = _libpq_url(server)
+    name = f"brax_test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(server, autocommit=True) as conn:
+        conn.execute(f'CREATE DATABASE "{name}"')
+    url = psycopg.conninfo.make_conninfo(server, dbname=name)
+    try:
+        migrate(url)
+        yield url
+    finally:
+        with psycopg.connect(server, autocommit=True) as conn:
+            conn.execute(f'DROP DATABASE "{name}" WITH (FORCE)')
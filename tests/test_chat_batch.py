@@ -0,0 +1,65 @@
+from contextlib import asynccontextmanager
+import httpx
+import orjson
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+KEY = "batch-secret"
+AUTH = {"Authorization": f"Bearer {KEY}"}
+
+@pytest.fixture
+async def client(api, monkeypatch):
+    monkeypatch.setattr(api.settings, "batch_api_key", KEY)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+def jsonl(threads):
+    return "\n".join(orjson.dumps(t).decode() for t in threads)
+
+THREADS = [{"thread_id": f"t{i}", "messages": ["hello", "what are your hours?"]} for i in range(3)]
+
+async def test_disabled_without_key(client, api, monkeypatch):
+    monkeypatch.setattr(api.settings, "batch_api_key", None)
+    response = await client.post("/chat/batch", content=jsonl(THREADS), headers=AUTH)
+    assert response.status_code == 403
+
+async def test_wrong_key_is_rejected(client):
+    response = await client.post(
+        "/chat/batch", content=jsonl(THREADS), headers={"Authorization": "Bearer nope"}
+    )
+    assert response.status_code == 401
+    response = await client.post("/chat/batch", content=jsonl(THREADS))
+    assert response.status_code == 401
+
+async def test_caps_body_size_and_line_count(client, api, monkeypatch):
+    monkeypatch.setattr(api.settings, "batch_max_threads", 2)
+    response = await client.post("/chat/batch", content=jsonl(THREADS), headers=AUTH)
+    assert response.status_code == 413
+
+    monkeypatch.setattr(api.settings, "batch_max_threads", 200)
+    monkeypatch.setattr(api.settings, "batch_max_bytes", 64)
+    response = await client.post("/chat/batch", content=jsonl(THREADS), headers=AUTH)
+    assert response.status_code == 413
+
+async def test_each_turn_takes_an_admission_slot(client, api, monkeypatch):
+    slots = []
+
+    @asynccontextmanager
+    async def slot():
+        slots.append(1)
+        yield
+
+    monkeypatch.setattr(api.admission, "slot", slot)
+    response = await client.post("/chat/batch", content=jsonl(THREADS), headers=AUTH)
+    assert response.status_code == 200
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["summary"]["turns"] == 6 and lines[-1]["summary"]["errors"] == 0
+    assert len(slots) == 6
+
+async def test_body_that_is_not_utf8_is_rejected(client):
+    body = jsonl(THREADS).encode() + b"\n\xff\xfe{}"
+    response = await client.post("/chat/batch", content=body, headers=AUTH)
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
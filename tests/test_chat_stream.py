@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from starlette.requests import Request
+from backend.db.database import SessionLocal
+from backend.db.repository import load_recent_messages
+
+pytestmark = pytest.mark.anyio
+
+def request():
+    return Request({"type": "http", "client": ("127.0.0.1", 1234), "headers": []})
+
+async def start_stream(api, text: str, thread_id: str):
+    async with SessionLocal() as session:
+        message = api.ChatMessage(message=text, thread_id=thread_id)
+        return await api.chat_stream_endpoint(message, request(), session, None)
+
+async def test_turn_is_persisted_after_client_disconnects(api, redis):
+    response = await start_stream(api, "what are your hours?", "t1")
+    body = response.body_iterator
+    assert (await body.__anext__()).startswith("event: token")
+    await body.aclose()  # the client went away after the first token
+
+    await asyncio.gather(*api._stream_turns)
+    async with SessionLocal() as session:
+        rows = await load_recent_messages(session, "t1", 10)
+    assert [m.role for m in rows] == ["user", "assistant"]
+    assert not await redis.exists("lock:thread:t1")
+
+async def test_stream_ends_with_done_event(api):
+    response = await start_stream(api, "hello", "t1")
+    events = [event async for event in response.body_iterator]
+    assert events[0].startswith("event: token")
+    assert events[-1].startswith("event: done")
+
+async def test_completed_retry_is_replayed_when_rate_limited(api, monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(api.settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(api.settings, "rate_limit_ip_burst", 1)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        body = {"message": "hello", "idempotency_key": "k1"}
+        first = await client.post("/chat", json=body)
+        assert first.status_code == 200
+        # The bucket is empty now, but retries of the finished turn are still answered
+        assert (await client.post("/chat", json=body)).json() == first.json()
+        stream = await client.post("/chat/stream", json=body)
+        assert stream.status_code == 200 and "event: done" in stream.text
+        other = await client.post("/chat", json={"message": "hello", "idempotency_key": "k2"})
+        assert other.status_code == 429
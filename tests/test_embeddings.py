@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from backend.db.database import SessionLocal
+from backend.db.models import Message, MsgEmbedding, Thread
+from backend.config.settings import settings
+from backend.services.embeddings import EmbeddingPipeline, HashingEmbedder, recall
+
+pytestmark = pytest.mark.anyio
+
+async def add_messages(*ids):
+    async with SessionLocal() as db:
+        if not await db.get(Thread, "t1"):
+            db.add(Thread(id="t1"))
+        db.add_all(Message(id=i, thread_id="t1", role="user", content=f"m{i}") for i in ids)
+        await db.commit()
+
+async def embedded_ids():
+    async with SessionLocal() as db:
+        return set((await db.execute(select(MsgEmbedding.msg_id))).scalars())
+
+async def test_message_committed_out_of_order_is_embedded(db):
+    pipeline = EmbeddingPipeline(HashingEmbedder(), batch_size=10)
+    await add_messages(1, 5)
+    assert await pipeline.run_once() == 2
+    # Id 3 was handed out before 5 but committed after it was embedded
+    await add_messages(3)
+    assert await pipeline.run_once() == 1
+    assert await embedded_ids() == {1, 3, 5}
+    assert await pipeline.run_once() == 0
+
+async def test_batches_are_claimed_with_skip_locked(db, monkeypatch):
+    statements = []
+    pipeline = EmbeddingPipeline(HashingEmbedder(), batch_size=10)
+    real_execute = SessionLocal.class_.execute
+
+    async def execute(self, statement, *args, **kwargs):
+        statements.append(statement)
+        return await real_execute(self, statement, *args, **kwargs)
+
+    monkeypatch.setattr(SessionLocal.class_, "execute", execute)
+    await add_messages(1)
+    await pipeline.run_once()
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE OF messages SKIP LOCKED" in sql
+
+class RejectingEmbedder(HashingEmbedder):
+    """Answers 400 for any batch containing "bad", like an API refusing one input."""
+
+    def __init__(self, error=None):
+        super().__init__()
+        self.error = error
+
+    async def embed(self, texts):
+        if self.error:
+            raise self.error
+        if any("bad" in text for text in texts):
+            request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+            response = httpx.Response(400, request=request)
+            raise httpx.HTTPStatusError("400", request=request, response=response)
+        return await super().embed(texts)
+
+async def test_rejected_message_is_skipped_without_blocking_others(db, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_max_attempts", 2)
+    pipeline = EmbeddingPipeline(RejectingEmbedder(), batch_size=10)
+    await add_messages(1, 3)
+    async with SessionLocal() as session:
+        session.add(Message(id=2, thread_id="t1", role="user", content="bad input"))
+        await session.commit()
+
+    assert await pipeline.run_once() == 2  # the others go through one by one
+    assert await embedded_ids() == {1, 3}
+    assert await pipeline.run_once() == 1  # second rejection: skipped with a NULL embedding
+    assert await embedded_ids() == {1, 2, 3}
+    assert await pipeline.run_once() == 0
+    await add_messages(4)
+    assert await pipeline.run_once() == 1
+    results = await recall("bad input", k=10, embedder=HashingEmbedder())
+    assert 2 not in {r["id"] for r in results}
+
+async def test_transient_failure_is_retried_not_skipped(db, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_max_attempts", 1)
+    pipeline = EmbeddingPipeline(RejectingEmbedder(httpx.ConnectError("down")), batch_size=10)
+    await add_messages(1)
+    with pytest.raises(httpx.ConnectError):
+        await pipeline.run_once()
+    pipeline.embedder = HashingEmbedder()
+    assert await pipeline.run_once() == 1
+    assert await embedded_ids() == {1}
+
+async def test_polls_after_the_first_are_bounded_by_lookback(db):
+    pipeline = EmbeddingPipeline(HashingEmbedder(), batch_size=10)
+    await add_messages(1)
+    assert await pipeline.run_once() == 1
+    lookback = timedelta(seconds=settings.embedding_lookback_seconds)
+    async with SessionLocal() as session:
+        old = datetime.now(timezone.utc) - 2 * lookback
+        session.add(Message(id=2, thread_id="t1", role="user", content="m2", created_at=old))
+        await session.commit()
+    assert await pipeline.run_once() == 0
+    # A restarted pipeline scans everything once
+    assert await EmbeddingPipeline(HashingEmbedder(), batch_size=10).run_once() == 1
@@ -0,0 +1,51 @@
+import httpx
+import pytest
+from langchain_core.messages import RemoveMessage
+from backend.config.settings import settings
+from backend.core import build_graph
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def client(monkeypatch, redis, db):
+    """The app with the in-memory checkpointer and a three-message history window."""
+    from backend.api import app as api
+    from backend.api.drain import drain
+
+    monkeypatch.setattr(settings, "graph_checkpointer", "memory")
+    monkeypatch.setattr(settings, "history_max_messages", 3)
+    drain.draining = False
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield api, client
+
+async def test_checkpointed_history_is_trimmed_across_turns(client, monkeypatch):
+    api, http = client
+    removals, original = [], build_graph._trim
+
+    def trim(messages, new):
+        removals.append(original(messages, new))
+        return removals[-1]
+
+    monkeypatch.setattr(build_graph, "_trim", trim)
+
+    first = await http.post("/chat", json={"message": "what are your hours?", "thread_id": "t1"})
+    assert first.status_code == 200
+    state = await api.chat_graph.aget_state(api.graph_config("t1"))
+    assert [m.type for m in state.values["messages"]] == ["human", "ai"]
+    first_message = state.values["messages"][0]
+    assert removals == [[]]
+
+    second = await http.post(
+        "/chat", json={"message": "do you sell gift cards?", "thread_id": "t1"}
+    )
+    assert second.status_code == 200
+    state = await api.chat_graph.aget_state(api.graph_config("t1"))
+    messages = state.values["messages"]
+    # 2 checkpointed + the new message + the reply is one over the window: the oldest goes
+    assert len(removals[-1]) == 1 and isinstance(removals[-1][0], RemoveMessage)
+    assert removals[-1][0].id == first_message.id
+    assert [m.type for m in messages] == ["ai", "human", "ai"]
+    assert messages[1].content == "do you sell gift cards?"
+    assert first_message.id not in {m.id for m in messages}
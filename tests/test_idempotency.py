@@ -0,0 +1,30 @@
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def client(api):
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+async def test_same_key_on_other_threads_is_not_shared(client):
+    first = await client.post("/chat", json={"message": "hello", "thread_id": "a", "idempotency_key": "k"})
+    second = await client.post("/chat", json={"message": "hello", "thread_id": "b", "idempotency_key": "k"})
+    assert first.status_code == second.status_code == 200
+    assert (first.json()["thread_id"], second.json()["thread_id"]) == ("a", "b")
+    assert first.json()["message_id"] != second.json()["message_id"]
+
+async def test_key_reused_with_another_body_is_rejected(client):
+    body = {"message": "hello", "idempotency_key": "k"}
+    first = await client.post("/chat", json=body)
+    assert first.status_code == 200
+    assert (await client.post("/chat", json=body)).json() == first.json()
+
+    other = {"message": "show me your watches", "idempotency_key": "k"}
+    assert (await client.post("/chat", json=other)).status_code == 422
+    assert (await client.post("/chat/stream", json=other)).status_code == 422
+    # The header form of the key is checked the same way
+    headers = {"Idempotency-Key": "k"}
+    assert (await client.post("/chat", json={"message": "bye"}, headers=headers)).status_code == 422
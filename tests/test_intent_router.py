@@ -0,0 +1,85 @@
+import pytest
+from backend.config.settings import settings
+from backend.core import intent_router as router_module
+from backend.core.intent_router import INTENT_EXAMPLES, GREETING_RE, IntentRouter, intent_router
+
+def legacy_intent(message):
+    """The adapter's routing before the router: one any() substring scan per intent."""
+    message_lower = message.lower()
+    if any(word in message_lower for word in ["engagement", "ring", "proposal", "diamond"]):
+        return "engagement_ring"
+    elif any(word in message_lower for word in ["repair", "fix", "broken", "maintenance"]):
+        return "jewelry_repair"
+    elif any(word in message_lower for word in ["watch", "timepiece", "rolex", "omega"]):
+        return "luxury_watches"
+    return None
+
+@pytest.mark.parametrize("message, intent", [
+    ("I'm looking for an engagement ring", "engagement_ring"),
+    ("My necklace clasp is broken, can you fix it?", "jewelry_repair"),
+    ("Do you carry Omega watches?", "luxury_watches"),
+    ("What are your opening hours?", None),
+    ("Can you repair my watch?", "jewelry_repair"),
+    ("Fix the diamond on my Rolex", "engagement_ring"),
+    ("I need repairing", "engagement_ring"),  # "ring" overlaps the "repair" match
+    ("Do you do watch repairing?", "engagement_ring"),
+    ("REPAIRS ON A TIMEPIECE", "jewelry_repair"),
+    ("Hello, do you sell diamonds?", "engagement_ring"),
+    ("Hi there, is my watch fixed?", "jewelry_repair"),
+    ("", None),
+])
+def test_keyword_routing_matches_the_old_scans(message, intent):
+    assert legacy_intent(message) == intent
+    assert intent_router.match(message) == intent
+
+@pytest.mark.parametrize("message, greeting", [
+    ("Hello", True),
+    ("hey there!", True),
+    ("  Good   morning :)", True),
+    ("GREETINGS", True),
+    ("Hello, I need a ring resized", False),
+    ("hi, can you fix my watch?", False),
+    ("Hiking boots", False),
+    ("good morning, do you sell watches", False),
+])
+def test_only_message_only_greetings_are_greetings(message, greeting):
+    assert bool(GREETING_RE.match(message)) == greeting
+    assert (intent_router.match(message) == "greeting") == greeting
+
+class ExampleEmbedder:
+    """Embeds each intent's examples on its own axis; anything else as given in `vectors`."""
+
+    name = "examples"
+
+    def __init__(self, vectors, fail=False):
+        self.axes = {text: i for i, texts in enumerate(INTENT_EXAMPLES.values()) for text in texts}
+        self.vectors = vectors
+        self.fail = fail
+
+    async def embed(self, texts):
+        if self.fail:
+            raise RuntimeError("embedder down")
+        return [self._vector(text) for text in texts]
+
+    def _vector(self, text):
+        if text in self.axes:
+            return [float(i == self.axes[text]) for i in range(len(INTENT_EXAMPLES))]
+        return self.vectors[text]
+
+@pytest.mark.parametrize("similarity, embedder, expected", [
+    (None, ExampleEmbedder({}), (None, "keyword")),
+    (0.8, ExampleEmbedder({"I'd like to propose": [0.9, 0.1, 0.0]}), ("engagement_ring", "classifier")),
+    (0.8, ExampleEmbedder({"I'd like to propose": [0.6, 0.6, 0.0]}), (None, "classifier")),
+    (0.8, None, (None, "classifier")),
+    (0.8, ExampleEmbedder({}, fail=True), (None, "keyword")),
+])
+@pytest.mark.anyio
+async def test_classifier_only_handles_messages_without_keywords(
+    monkeypatch, similarity, embedder, expected
+):
+    monkeypatch.setattr(settings, "router_classifier_similarity", similarity)
+    monkeypatch.setattr(router_module, "get_embedder", lambda: embedder)
+    router = IntentRouter()
+    assert await router.classify("I'd like to propose") == expected
+    # A keyword match never reaches the embedder
+    assert await router.classify("My watch is broken") == ("jewelry_repair", "keyword")
@@ -0,0 +1,41 @@
+import pytest
+from backend.core.lead_parser import has_contact, normalize_lead, parse_lead_block
+from backend.core.prompts import prompt_registry
+from backend.services import lead_state
+
+def test_prompt_example_block_is_not_a_lead():
+    assert parse_lead_block(prompt_registry.get("system_prompt"))  # the example is there
+    assert normalize_lead(parse_lead_block(prompt_registry.get("system_prompt"))) is None
+
+@pytest.mark.parametrize("value", ["customer name if provided", "<name>", "[name]", "N/A", "unknown"])
+def test_placeholders_are_dropped(value):
+    lead = normalize_lead({"name": value, "email": "Ann@Example.com"})
+    assert lead == {"email": "ann@example.com"}
+
+def test_intent_choices_are_dropped():
+    assert normalize_lead({"intent": "engagement_ring|luxury_watches", "phone": "555 010 1234"}) == {
+        "phone": "+15550101234"
+    }
+
+def test_contact_needs_valid_email_or_phone():
+    assert not has_contact(normalize_lead({"name": "Ann"}))
+    assert not has_contact(normalize_lead({"name": "Ann", "email": "not an email"}))
+    assert has_contact(normalize_lead({"name": "Ann", "email": "ann@example.com"}))
+    assert has_contact(normalize_lead({"phone": "+44 20 7946 0018"}))
+
+@pytest.mark.anyio
+async def test_saved_placeholders_are_not_carried_forward():
+    await lead_state.save_thread_lead("t-old", {"name": "customer name if provided"})
+    merged = await lead_state.merge_thread_lead("t-old", {"email": "ann@example.com"})
+    assert merged == {"email": "ann@example.com"}
+
+@pytest.mark.anyio
+async def test_fallback_reply_captures_no_lead(api):
+    import httpx
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/chat", json={"message": "what are your hours?"})
+    assert response.status_code == 200
+    assert "```lead" in response.json()["response"]
+    assert response.json()["lead_captured"] is False
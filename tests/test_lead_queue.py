@@ -0,0 +1,146 @@
+import asyncio, time
+import httpx
+import pytest
+import uvicorn
+from benchmarks.stub_ghl import create_stub_app
+from backend.config.settings import settings
+from backend.core import codec
+from backend.services import ghl
+from backend.services.lead_queue import (
+    DEAD_KEY, OUTBOUND_KEY, PENDING_KEY, RETRY_KEY, WORKERS_KEY, LeadQueue,
+)
+
+pytestmark = pytest.mark.anyio
+
+LEAD = {"name": "Ann", "email": "ann@example.com", "intent": "engagement_ring"}
+
+@pytest.fixture(autouse=True)
+def fast_queue(monkeypatch):
+    monkeypatch.setattr(settings, "ghl_api_key", None)
+    monkeypatch.setattr(settings, "lead_queue_poll_interval", 0.01)
+    monkeypatch.setattr(settings, "lead_queue_backoff_base", 0.01)
+    monkeypatch.setattr(settings, "lead_queue_backoff_max", 0.02)
+    monkeypatch.setattr(settings, "lead_queue_max_attempts", 3)
+
+@pytest.fixture
+async def stub_ghl(monkeypatch):
+    """Starts benchmarks.stub_ghl on a free local port; returns a function reading its /stats."""
+    servers = []
+
+    async def start(**options):
+        config = uvicorn.Config(
+            create_stub_app(**options), host="127.0.0.1", port=0, log_level="warning", lifespan="off", ws="none"
+        )
+        server = uvicorn.Server(config)
+        servers.append((server, asyncio.create_task(server.serve())))
+        while not server.started:
+            await asyncio.sleep(0.01)
+        base = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+        monkeypatch.setattr(settings, "ghl_webhook_url", f"{base}/webhook")
+
+        async def stats():
+            async with httpx.AsyncClient() as client:
+                return (await client.get(f"{base}/stats")).json()
+
+        return stats
+
+    yield start
+    await ghl.close_http_client()
+    for server, task in servers:
+        server.should_exit = True
+        await task
+
+async def eventually(check, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not await check():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+async def queue_is_empty(redis, queue: LeadQueue) -> bool:
+    return not any([
+        await redis.hlen(PENDING_KEY),
+        await redis.llen(OUTBOUND_KEY),
+        await redis.zcard(RETRY_KEY),
+        await redis.llen(queue._processing),
+    ])
+
+async def test_lead_is_delivered_and_acked(redis, stub_ghl):
+    stats = await stub_ghl()
+    queue = LeadQueue()
+    await queue.enqueue(LEAD, "t1")
+    queue.start()
+    await eventually(lambda: webhooks(stats, 1))
+    await queue.stop()
+    assert await queue_is_empty(redis, queue)
+    assert not await redis.zscore(WORKERS_KEY, queue.worker_id)
+
+async def test_failures_are_retried_with_backoff(redis, stub_ghl):
+    stats = await stub_ghl(fail_first=2)
+    queue = LeadQueue()
+    await queue.enqueue(LEAD, "t1")
+    queue.start()
+    await eventually(lambda: webhooks(stats, 1))
+    await queue.stop()
+    assert (await stats())["counts"]["webhook_failed"] == 2
+    assert await queue_is_empty(redis, queue)
+
+async def test_exhausted_lead_is_dead_lettered(redis, stub_ghl):
+    stats = await stub_ghl(fail_rate=1.0)
+    queue = LeadQueue()
+    await queue.enqueue(LEAD, "t1")
+    queue.start()
+    await eventually(lambda: redis.llen(DEAD_KEY))
+    await queue.stop()
+    job = codec.loads(await redis.lindex(DEAD_KEY, 0))
+    assert job["attempt"] == 3 and job["lead"]["email"] == LEAD["email"]
+    assert (await stats())["counts"]["webhook_failed"] == 3
+    assert await queue_is_empty(redis, queue)
+
+async def test_delivery_cut_short_by_stop_is_requeued(redis, stub_ghl):
+    await stub_ghl(latency_ms=1000)
+    queue = LeadQueue()
+    await queue.enqueue(LEAD, "t1")
+    queue.start()
+    await eventually(lambda: redis.llen(queue._processing))
+    await queue.stop(timeout=0.05)
+    # Nothing was lost: the lead is ready for the next worker
+    assert await redis.llen(OUTBOUND_KEY) == 1
+    assert await redis.hlen(PENDING_KEY) == 1
+    assert not await redis.llen(queue._processing)
+
+    stats = await stub_ghl()
+    successor = LeadQueue()
+    successor.start()
+    await eventually(lambda: webhooks(stats, 1))
+    await successor.stop()
+    assert await queue_is_empty(redis, successor)
+
+async def test_claims_of_unresponsive_worker_are_recovered(redis, stub_ghl):
+    stats = await stub_ghl()
+    crashed = LeadQueue()
+    await crashed.enqueue(LEAD, "t1")
+    await redis.lmove(OUTBOUND_KEY, crashed._processing, "RIGHT", "LEFT")
+    await redis.zadd(WORKERS_KEY, {crashed.worker_id: time.time() - 3600})
+
+    queue = LeadQueue()
+    queue.start()
+    await eventually(lambda: webhooks(stats, 1))
+    await queue.stop()
+    assert await queue_is_empty(redis, queue)
+    assert not await redis.exists(crashed._processing)
+
+async def test_newer_payload_during_delivery_is_sent_after_it(redis, stub_ghl):
+    stats = await stub_ghl(latency_ms=200)
+    queue = LeadQueue()
+    await queue.enqueue(LEAD, "t1")
+    queue.start()
+    await eventually(lambda: redis.llen(queue._processing))
+    await queue.enqueue({**LEAD, "phone": "+15550101234"}, "t1")
+    await eventually(lambda: webhooks(stats, 2))
+    await queue.stop()
+    received = (await stats())["received"]
+    assert received[-1]["body"]["phone"] == "+15550101234"
+    assert await queue_is_empty(redis, queue)
+
+async def webhooks(stats, count: int) -> bool:
+    return (await stats())["counts"].get("webhook", 0) >= count
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+import psycopg
+
+def month_ahead(months: int) -> datetime:
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 15, tzinfo=timezone.utc)
+
+def partition_of(conn, message_id: int) -> str:
+    return conn.execute(
+        "SELECT tableoid::regclass::text FROM messages WHERE id = %s", (message_id,)
+    ).fetchone()[0]
+
+def test_partition_created_for_rows_already_in_default(postgres_url):
+    month = month_ahead(6)  # past the months migration 004 creates
+    with psycopg.connect(postgres_url, autocommit=True) as conn:
+        conn.execute("INSERT INTO threads (id) VALUES ('t1')")
+        ids = [
+            conn.execute(
+                "INSERT INTO messages (thread_id, role, content, created_at) "
+                "VALUES ('t1', 'user', %s, %s) RETURNING id",
+                (content, created_at),
+            ).fetchone()[0]
+            for content, created_at in (("late", month), ("later", month_ahead(7)))
+        ]
+        assert partition_of(conn, ids[0]) == "messages_default"
+
+        name = conn.execute("SELECT create_messages_partition(%s::date)", (month,)).fetchone()[0]
+
+        assert name == f"messages_p{month:%Y%m}"
+        assert partition_of(conn, ids[0]) == name
+        assert partition_of(conn, ids[1]) == "messages_default"
+        attached = conn.execute(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = 'messages'::regclass "
+            "AND inhrelid = 'messages_default'::regclass"
+        ).fetchone()[0]
+        assert attached == 1
+        # Idempotent, and a month without stray rows is a plain CREATE
+        assert conn.execute("SELECT create_messages_partition(%s::date)", (month,)).fetchone()[0] == name
+        conn.execute("SELECT create_messages_partition(%s::date)", (month_ahead(8),))
@@ -0,0 +1,61 @@
+import pytest
+from backend.config.settings import settings
+from fastapi import HTTPException
+from backend.services import rate_limit
+from backend.services.rate_limit import RateLimited, check_batch_rate_limit, check_rate_limits
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "rate_limit_ip_per_minute", 60)
+    monkeypatch.setattr(settings, "rate_limit_ip_burst", 3)
+    monkeypatch.setattr(settings, "rate_limit_user_per_minute", 60)
+    monkeypatch.setattr(settings, "rate_limit_user_burst", 5)
+
+async def test_burst_then_limited_with_retry_after(redis):
+    for _ in range(3):
+        await check_rate_limits("1.2.3.4", None)
+    with pytest.raises(RateLimited) as err:
+        await check_rate_limits("1.2.3.4", None)
+    assert err.value.status_code == 429
+    assert int(err.value.headers["Retry-After"]) >= 1
+    # Other clients have their own bucket
+    await check_rate_limits("5.6.7.8", None)
+
+async def test_blocked_request_charges_no_bucket(redis):
+    for _ in range(3):
+        await check_rate_limits("1.2.3.4", "u1")
+    with pytest.raises(RateLimited):
+        await check_rate_limits("1.2.3.4", "u1")
+    # The user bucket kept the tokens the IP bucket refused
+    assert float(await redis.hget("rl:user:u1", "tokens")) >= 1.9
+    assert await redis.pttl("rl:user:u1") > 0
+
+async def test_batch_is_charged_per_thread(redis, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_batch_burst", 10)
+    await check_batch_rate_limit("1.2.3.4", 6)
+    with pytest.raises(RateLimited):
+        await check_batch_rate_limit("1.2.3.4", 6)
+    # The chat buckets are separate
+    await check_rate_limits("1.2.3.4", None)
+
+async def test_batch_larger_than_burst_is_rejected(redis, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_batch_burst", 10)
+    with pytest.raises(HTTPException) as err:
+        await check_batch_rate_limit("1.2.3.4", 11)
+    assert err.value.status_code == 413
+    assert not await redis.exists("rl:batch:1.2.3.4")
+
+async def test_script_is_registered_once(redis, monkeypatch):
+    await check_rate_limits("1.2.3.4", None)
+    script = rate_limit._token_bucket
+    monkeypatch.setattr(redis, "register_script", None)  # would fail if called again
+    await check_rate_limits("1.2.3.4", None)
+    assert rate_limit._token_bucket is script
+    assert float(await redis.hget("rl:ip:1.2.3.4", "tokens")) < 2
+
+async def test_fails_open_without_redis():
+    for _ in range(10):
+        await check_rate_limits("1.2.3.4", "u1")
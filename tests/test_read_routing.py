@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from backend.config.settings import settings
+from backend.db import read_routing
+from backend.db.database import engine
+from backend.db.read_routing import mark_written, read_session, replica_health
+from backend.services import redis_cache
+
+pytestmark = pytest.mark.anyio
+
+def use_replica(monkeypatch, url):
+    replica = create_async_engine(url)
+    monkeypatch.setattr(read_routing, "replica_engine", replica)
+    monkeypatch.setattr(read_routing, "ReplicaSessionLocal", async_sessionmaker(replica))
+    monkeypatch.setattr(read_routing, "_local_writes", {})
+    monkeypatch.setattr(replica_health, "healthy", False)
+    return replica
+
+@pytest.fixture
+async def replica(redis, db, monkeypatch, tmp_path):
+    replica = use_replica(monkeypatch, f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    yield replica
+    await replica.dispose()
+
+async def read_target(thread_id=None):
+    async with read_session(thread_id) as session:
+        return "replica" if session.bind is read_routing.replica_engine else "primary"
+
+async def test_reads_return_to_the_primary_after_a_write(replica, redis, monkeypatch):
+    assert await read_target("t1") == "primary"  # not checked yet
+    assert await replica_health.check()
+    assert await read_target("t1") == "replica"
+
+    await mark_written("t1")
+    assert await read_target("t1") == "primary"
+    assert await read_target("t2") == "replica"
+    assert await read_target() == "replica"
+
+    # Another worker sees the write through Redis
+    monkeypatch.setattr(read_routing, "_local_writes", {})
+    assert await read_target("t1") == "primary"
+    await redis.delete("thread:t1:written")
+    assert await read_target("t1") == "replica"
+
+    # With Redis configured but unreachable, the write state is unknown
+    monkeypatch.setattr(settings, "redis_url", "redis://cache:6379/0")
+    monkeypatch.setattr(redis_cache.breaker, "allow", lambda: False)
+    assert await read_target("t1") == "primary"
+
+async def test_a_lagging_replica_is_not_read(replica, monkeypatch):
+    lag = settings.replica_read_your_writes_seconds + 1
+
+    async def lagging(conn):
+        return lag
+
+    monkeypatch.setattr(read_routing, "_replica_lag", lagging)
+    assert not await replica_health.check()
+    assert replica_health.lag == lag
+    assert await read_target("t1") == "primary"
+
+    lag = 0.0
+    assert await replica_health.check()
+    assert await read_target("t1") == "replica"
+
+async def test_reads_fail_over_when_the_replica_is_down(redis, db, monkeypatch, tmp_path):
+    replica = use_replica(monkeypatch, f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    monkeypatch.setattr(replica_health, "healthy", True)  # went down since the last check
+    try:
+        assert await read_target("t1") == "primary"
+        assert not replica_health.healthy
+        assert not await replica_health.check()
+        assert await read_target("t1") == "primary"
+    finally:
+        await replica.dispose()
+
+async def test_startup_does_not_wait_for_a_hanging_replica(replica, monkeypatch):
+    from backend.api import app as api
+    from backend.api.drain import drain
+
+    async def hang():
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(api, "replica_engine", replica)
+    monkeypatch.setattr(replica_health, "check", hang)
+    monkeypatch.setattr(settings, "replica_health_interval", 0.05)
+    drain.draining = False
+    async with asyncio.timeout(5):
+        async with api.app.router.lifespan_context(api.app):
+            assert not replica_health.healthy
+            async with read_session("t1") as session:
+                assert session.bind is engine
@@ -0,0 +1,50 @@
+import os
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from backend.core.agent_adapter import AgenticCoreAdapter
+from backend.core.prompts import PromptRegistry, prompt_registry
+from backend.services import response_cache
+
+pytestmark = pytest.mark.anyio
+
+QUESTION = "What are your store hours?"
+
+async def ask(message, context=None):
+    return "".join([c async for c in AgenticCoreAdapter().astream_message("t1", message, context)])
+
+def test_fingerprint_covers_intent_templates(tmp_path):
+    (tmp_path / "system_prompt.md").write_text("system")
+    (tmp_path / "intent_greeting.md").write_text("Hello!")
+    registry = PromptRegistry(tmp_path)
+    before = registry.fingerprint
+    system_version = registry.version("system_prompt")
+    template = tmp_path / "intent_greeting.md"
+    template.write_text("Welcome!")
+    os.utime(template, (0, 0))
+    assert registry.reload() and registry.fingerprint != before
+    assert registry.version("system_prompt") == system_version
+
+async def test_first_message_is_cached_under_registry_version(redis, monkeypatch):
+    await ask(QUESTION)
+    assert len(await redis.keys("resp:*")) == 1
+    hits = response_cache.stats()["hits"]
+    await ask(QUESTION)
+    assert response_cache.stats()["hits"] == hits + 1
+
+    # Editing any prompt, e.g. an intent template, moves answers to a new key
+    monkeypatch.setattr(prompt_registry, "fingerprint", "edited")
+    misses = response_cache.stats()["misses"]
+    await ask(QUESTION)
+    assert response_cache.stats()["misses"] == misses + 1
+    assert len(await redis.keys("resp:*")) == 2
+
+async def test_turns_with_history_bypass_the_cache(redis):
+    await ask(QUESTION)
+    history = [HumanMessage(content="Do you resize rings?"), AIMessage(content="Yes.")]
+    stats = response_cache.stats()
+    await ask(QUESTION, {"history": history})
+    await ask("And on Sundays?", {"history": history})
+    after = response_cache.stats()
+    assert after["hits"] == stats["hits"]
+    assert after["bypassed"] == stats["bypassed"] + 2
+    assert len(await redis.keys("resp:*")) == 1
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import func, select, update
+from backend.db.database import SessionLocal
+from backend.db.models import Message, Thread
+from backend.db.repository import Turn, history_page, latest_message, load_recent_messages, persist_turn
+from backend.db.retention import run_retention
+from backend.services import lead_state, thread_cache, thread_versions
+
+pytestmark = pytest.mark.anyio
+
+async def add_turns(thread_id, n):
+    async with SessionLocal() as db:
+        for i in range(n):
+            message_id, created_at = await persist_turn(db, Turn(thread_id, "u1", f"q{i}", f"a{i}"))
+    return message_id, created_at
+
+async def test_thread_queries_are_bounded_by_thread_start(db):
+    await add_turns("t1", 3)
+    await add_turns("t2", 1)
+    async with SessionLocal() as db:
+        recent = await load_recent_messages(db, "t1", 4)
+        assert [m.content for m in recent] == ["q1", "a1", "q2", "a2"]
+        latest = await latest_message(db, "t1")
+        assert latest == (recent[-1].id, recent[-1].created_at)
+        page = (await db.execute(history_page("t1", recent[0].id, None, 10))).all()
+        assert [row.content for row in page] == ["q0", "a0"]
+        # A cursor from another thread matches nothing
+        other = await latest_message(db, "t2")
+        assert (await db.execute(history_page("t1", other[0], None, 10))).all() == []
+
+async def test_retention_deletes_rows_and_redis_state(redis, db, tmp_path):
+    message_id, created_at = await add_turns("old", 1)
+    await add_turns("new", 1)
+    async with SessionLocal() as db:
+        await db.execute(
+            update(Thread).where(Thread.id == "old").values(updated_at=func.datetime("now", "-30 days"))
+        )
+        await db.commit()
+    for thread_id in ("old", "new"):
+        await thread_cache.record_turn(thread_id, [], False, [{"role": "user", "content": "q"}])
+        await lead_state.save_thread_lead(thread_id, {"email": "a@example.com"})
+        await thread_versions.record_version(thread_id, message_id, created_at)
+
+    report = await run_retention(7, 100, str(tmp_path), "jsonl")
+
+    assert (report["threads"], report["messages"]) == (1, 2)
+    assert not await redis.exists("thread:old:window", "thread:old:lead")
+    assert await lead_state.load_thread_lead("old") is None
+    assert await thread_versions.get_version("old") is None
+    assert await redis.exists("thread:new:window") and await lead_state.load_thread_lead("new")
+    async with SessionLocal() as db:
+        remaining = await db.scalars(select(Message.thread_id).distinct())
+        assert remaining.all() == ["new"]
@@ -0,0 +1,34 @@
+import pytest
+from backend.api import serve
+from backend.config.settings import settings
+from backend.core import checkpointer
+from backend.db import migrate, retention
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def memory_checkpointer(monkeypatch):
+    monkeypatch.setattr(settings, "graph_checkpointer", "memory")
+    monkeypatch.setattr(settings, "graph_warmup", True)
+
+async def test_warmup_leaves_no_checkpoint(memory_checkpointer, api):
+    assert api.checkpointer is not None
+    assert await api.checkpointer.aget_tuple(api.graph_config(api.WARMUP_THREAD_ID)) is None
+    assert [c async for c in api.checkpointer.alist(None)] == []
+
+@pytest.mark.parametrize("url", ["postgresql://u@db/app", "postgres://u@db/app"])
+def test_prepare_schema_migrates_both_postgres_schemes(monkeypatch, url):
+    calls = []
+    monkeypatch.setattr(settings, "postgres_url", url)
+    monkeypatch.setattr(migrate, "migrate", lambda: calls.append("migrate") or [])
+
+    async def setup():
+        calls.append("checkpointer")
+
+    async def partitions(months):
+        calls.append(f"partitions:{months}")
+
+    monkeypatch.setattr(checkpointer, "setup_checkpointer", setup)
+    monkeypatch.setattr(retention, "ensure_partitions", partitions)
+    serve.prepare_schema()
+    assert calls == ["migrate", "checkpointer", f"partitions:{settings.partition_months_ahead}"]
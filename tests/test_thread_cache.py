@@ -0,0 +1,36 @@
+import pytest
+from backend.config.settings import settings
+from backend.services import thread_cache
+
+pytestmark = pytest.mark.anyio
+
+def turn(n):
+    return [{"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}]
+
+async def test_miss_writes_whole_window_then_hits(redis, db):
+    window, cached = await thread_cache.load_window("t1")
+    assert (window, cached) == ([], False)
+
+    await thread_cache.record_turn("t1", window, cached, turn(1))
+    window, cached = await thread_cache.load_window("t1")
+    assert cached and window == turn(1)
+    assert 0 < await redis.ttl("thread:t1:window") <= settings.thread_cache_ttl
+
+async def test_hit_appends_and_keeps_newest(redis, monkeypatch):
+    monkeypatch.setattr(settings, "history_max_messages", 4)
+    await thread_cache.record_turn("t1", [], False, turn(1))
+    for n in (2, 3):
+        window, cached = await thread_cache.load_window("t1")
+        await thread_cache.record_turn("t1", window, cached, turn(n))
+    window, cached = await thread_cache.load_window("t1")
+    assert cached and window == turn(2) + turn(3)
+
+async def test_append_does_not_resurrect_expired_window(redis):
+    await thread_cache.record_turn("t1", turn(1), True, turn(2))
+    assert not await redis.exists("thread:t1:window")
+
+async def test_token_budget_trims_oldest(redis, monkeypatch):
+    await thread_cache.record_turn("t1", [], False, turn(1) + turn(2))
+    monkeypatch.setattr(settings, "history_token_budget", 2)
+    window, _ = await thread_cache.load_window("t1")
+    assert window == turn(2)
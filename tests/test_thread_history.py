@@ -0,0 +1,128 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def client(api):
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+async def chat(client, text, thread_id=None):
+    response = await client.post("/chat", json={"message": text, "thread_id": thread_id})
+    assert response.status_code == 200
+    return response.json()
+
+async def test_history_pages_in_order(client):
+    thread_id = (await chat(client, "hello"))["thread_id"]
+    await chat(client, "what are your hours?", thread_id)
+    response = await client.get(f"/thread/{thread_id}/history", params={"limit": 3})
+    assert response.status_code == 200
+    page = response.json()
+    assert [m["role"] for m in page["messages"]] == ["assistant", "user", "assistant"]
+    assert page["has_more"] is True
+
+async def test_failed_read_is_a_server_error(client, api, monkeypatch):
+    thread_id = (await chat(client, "hello"))["thread_id"]
+
+    def broken(*args):
+        raise RuntimeError("database is gone")
+
+    monkeypatch.setattr(api, "history_page", broken)
+    response = await client.get(f"/thread/{thread_id}/history")
+    assert response.status_code == 500
+
+async def test_error_mid_stream_aborts_the_response(client, api, monkeypatch):
+    monkeypatch.setattr(api, "HISTORY_CHUNK_BYTES", 1)
+
+    class Rows:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if getattr(self, "sent", False):
+                raise RuntimeError("connection lost")
+            self.sent = True
+            return SimpleNamespace(id=1, role="user", content="hi", created_at=None, total=2)
+
+    class Session:
+        async def stream(self, query):
+            return Rows()
+
+    @asynccontextmanager
+    async def read_session(thread_id):
+        yield Session()
+
+    monkeypatch.setattr(api, "read_session", read_session)
+    # Never a well-formed (and cacheable) truncated page
+    with pytest.raises((RuntimeError, ExceptionGroup)):
+        await client.get("/thread/t1/history")
+
+async def test_unchanged_thread_revalidates_without_db_queries(client, api):
+    from benchmarks.common import QueryCounter
+
+    thread_id = (await chat(client, "hello"))["thread_id"]
+    first = await client.get(f"/thread/{thread_id}/history")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == api.settings.history_cache_control
+
+    queries = QueryCounter(api.engine)
+    again = await client.get(f"/thread/{thread_id}/history", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert queries.statements == 0
+
+    # A new turn changes the ETag
+    await chat(client, "what are your hours?", thread_id)
+    changed = await client.get(f"/thread/{thread_id}/history", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+async def test_failed_read_carries_no_validators(client, api, monkeypatch):
+    thread_id = (await chat(client, "hello"))["thread_id"]
+
+    def broken(*args):
+        raise RuntimeError("database is gone")
+
+    monkeypatch.setattr(api, "history_page", broken)
+    response = await client.get(f"/thread/{thread_id}/history")
+    assert response.status_code == 500
+    assert "etag" not in response.headers and "last-modified" not in response.headers
+    assert response.headers["cache-control"] == "no-store"
+
+    # The version was known, but nothing got cached under it: the next read is a full 200
+    monkeypatch.undo()
+    response = await client.get(f"/thread/{thread_id}/history")
+    assert response.status_code == 200 and response.json()["messages"]
+
+async def test_failed_version_write_does_not_confirm_stale_etag(client, api, redis, monkeypatch):
+    from backend.services import redis_cache
+
+    thread_id = (await chat(client, "hello"))["thread_id"]
+    etag = (await client.get(f"/thread/{thread_id}/history")).headers["etag"]
+
+    # Redis is skipped for the whole next turn: neither the delete nor the new version lands
+    monkeypatch.setattr(redis_cache.breaker, "allow", lambda: False)
+    await chat(client, "what are your hours?", thread_id)
+    monkeypatch.undo()
+    assert await redis.exists(f"thread:{thread_id}:version")
+
+    stale = await client.get(f"/thread/{thread_id}/history", headers={"If-None-Match": etag})
+    assert stale.status_code == 200 and stale.headers["etag"] != etag
+    # The database version was written back over the stale one
+    again = await client.get(
+        f"/thread/{thread_id}/history", headers={"If-None-Match": stale.headers["etag"]}
+    )
+    assert again.status_code == 304
+
+async def test_version_never_goes_backwards(redis, db):
+    from datetime import datetime, timezone
+    from backend.services import thread_versions
+
+    now = datetime.now(timezone.utc)
+    await thread_versions.record_version("t1", 5, now)
+    await thread_versions.record_version("t1", 3, now)
+    assert (await thread_versions.get_version("t1")).message_id == 5
@@ -0,0 +1,71 @@
+import asyncio
+import anyio
+import pytest
+from backend.config.settings import settings
+from backend.services import thread_locks
+from backend.services.thread_locks import ThreadBusy, thread_lock
+
+pytestmark = pytest.mark.anyio
+
+async def test_lock_is_held_in_redis_and_released(redis):
+    async with thread_lock("t1"):
+        token = await redis.get("lock:thread:t1")
+        assert token
+        assert 0 < await redis.pttl("lock:thread:t1") <= settings.thread_lock_ttl_ms
+    assert not await redis.exists("lock:thread:t1")
+    assert "t1" not in thread_locks._local
+
+async def test_turns_on_one_thread_are_serialized(redis):
+    order = []
+
+    async def turn(n):
+        async with thread_lock("t1"):
+            order.append(("start", n))
+            await asyncio.sleep(0.01)
+            order.append(("end", n))
+
+    await asyncio.gather(turn(1), turn(2), turn(3))
+    assert [event for event, _ in order] == ["start", "end"] * 3
+
+async def test_other_worker_holding_lock_times_out(redis, monkeypatch):
+    monkeypatch.setattr(settings, "thread_lock_wait_timeout", 0.05)
+    await redis.set("lock:thread:t1", "other-worker", px=10000)
+    with pytest.raises(ThreadBusy):
+        async with thread_lock("t1"):
+            pass
+    # Someone else's lock is never deleted
+    assert await redis.get("lock:thread:t1") == "other-worker"
+
+async def test_release_script_only_deletes_own_token(redis):
+    async with thread_lock("t1"):
+        await redis.set("lock:thread:t1", "stolen")
+    assert await redis.get("lock:thread:t1") == "stolen"
+
+async def test_redis_down_falls_back_to_local_lock():
+    async with thread_lock("t1"):
+        assert thread_locks._local["t1"].lock.locked()
+
+async def test_lock_is_renewed_while_the_turn_runs(redis, monkeypatch):
+    monkeypatch.setattr(settings, "thread_lock_ttl_ms", 150)
+    async with thread_lock("t1"):
+        token = await redis.get("lock:thread:t1")
+        await asyncio.sleep(0.4)
+        assert await redis.get("lock:thread:t1") == token
+    assert not await redis.exists("lock:thread:t1")
+
+async def test_cancelled_turn_still_releases_redis_lock(redis, monkeypatch):
+    real_eval = redis.eval
+
+    async def slow_eval(*args):
+        await asyncio.sleep(0.01)  # a network round-trip, where cancellation can land
+        return await real_eval(*args)
+
+    monkeypatch.setattr(redis, "eval", slow_eval)
+    # Level cancellation, as Starlette applies to a stream whose client went away:
+    # every await inside the scope raises again, including the one in the lock's finally
+    with anyio.move_on_after(0.05):
+        async with thread_lock("t1"):
+            await asyncio.sleep(10)
+    await asyncio.sleep(0.05)
+    assert not await redis.exists("lock:thread:t1")
+    assert "t1" not in thread_locks._local
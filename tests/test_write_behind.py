@@ -0,0 +1,29 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from backend.db.database import SessionLocal
+from backend.db.models import Message
+from backend.db.repository import Turn
+from backend.db.write_behind import TurnWriter
+
+pytestmark = pytest.mark.anyio
+
+async def test_batch_failure_only_fails_the_bad_turn(db):
+    writer = TurnWriter(SessionLocal, max_delay=0.05)
+    writer.start()
+    try:
+        results = await asyncio.gather(
+            writer.submit(Turn("t1", "u1", "q1", "a1")),
+            writer.submit(Turn("t2", "u1", None, "a2")),  # content is NOT NULL
+            writer.submit(Turn("t3", "u1", "q3", "a3")),
+            return_exceptions=True,
+        )
+    finally:
+        await writer.stop()
+
+    assert isinstance(results[1], IntegrityError)
+    assert all(isinstance(r, tuple) for r in (results[0], results[2]))
+    async with SessionLocal() as session:
+        threads = (await session.scalars(select(Message.thread_id).distinct())).all()
+    assert sorted(threads) == ["t1", "t3"]